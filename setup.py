@@ -10,5 +10,6 @@ setup(name='scikit-mechanics',
       license='GPLv3',
       author='The scikit-mechanics contributors',
       packages=['skmech'],
-      install_requires=["numpy", "matplotlib"]
+      install_requires=["numpy", "scipy>=1.12", "matplotlib"],
+      extras_require={"amg": ["pyamg"]}
       )
@@ -9,6 +9,7 @@ from .solvers import statics
 from .solvers import incremental
 # from .postprocess import plotter
 from .constructor import constructor
+from . import assembly
 from .neumann import neumann
 from .dirichlet import dirichlet
 from . import postprocess
@@ -0,0 +1,224 @@
+"""Assemble global sparse matrices from element contributions
+
+The element matrices are gathered as COO triplets (row, column, value), one
+block per element, and converted to CSR format. The conversion sums the
+entries of dofs shared by more than one element, so memory scales with the
+number of elements instead of num_dof**2.
+
+For repeated assemblies with the same mesh (Newton iterations) the
+ScatterPlan stores the CSR sparsity pattern and the CSR slot of each element
+block entry, so assembling is reduced to summing values into the slots.
+
+"""
+import numpy as np
+from scipy import sparse
+from .constructor import constructor
+from .elements.quad4 import constitutive_matrix, batch_stiffness_matrix
+
+
+def sparse_stiffness(model, t=1):
+    """Assemble the global stiffness matrix in sparse format
+
+    Parameters
+    ----------
+    model : Model object
+        object with mesh, material, dofs, etc
+    t : float, default 1
+        time
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix shape (num_dof, num_dof)
+
+    Note
+    ----
+    Without xfem all element matrices are integrated at once with the model
+    geometry cache, see skmech.elements.quad4.batch_stiffness_matrix.
+    Enriched models build each element object because the enriched gradient
+    operator depends on the level sets.
+
+    """
+    rows, cols, values = [], [], []
+    if model.xfem is None:
+        geo = model.geometry
+        C = constitutive_matrix(geo.material(model.material.E),
+                                geo.material(model.material.nu),
+                                model.material.case)
+        # all element matrices at once, shape (num_ele, 8, 8)
+        k = batch_stiffness_matrix(geo.B, C, geo.dV)
+        num_ele_dof = geo.dof.shape[1]
+        rows.append(np.repeat(geo.dof, num_ele_dof, axis=1).ravel())
+        cols.append(np.tile(geo.dof, num_ele_dof).ravel())
+        values.append(k.ravel())
+    else:
+        for eid, [etype, *edata] in model.elements.items():
+            element = constructor(eid, etype, model)
+            k = element.local_stiffness_matrix(t)
+            dof = element.id_v
+            rows.append(np.repeat(dof, len(dof)))
+            cols.append(np.tile(dof, len(dof)))
+            values.append(k.ravel())
+    return coo_to_csr(rows, cols, values, model.num_dof)
+
+
+def coo_to_csr(rows, cols, values, num_dof):
+    """Build a CSR matrix from lists of element COO triplets
+
+    Parameters
+    ----------
+    rows, cols, values : list of ndarray
+        row index, column index and value of each element block entry
+    num_dof : int
+        size of the square global matrix
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix shape (num_dof, num_dof)
+        duplicated (row, column) entries are summed
+
+    """
+    if len(values) == 0:
+        return sparse.csr_matrix((num_dof, num_dof))
+    K = sparse.coo_matrix((np.concatenate(values),
+                           (np.concatenate(rows), np.concatenate(cols))),
+                          shape=(num_dof, num_dof))
+    return K.tocsr()
+
+
+def assemble_vector(dof, f_ele, num_dof):
+    """Sum element vectors into a global vector
+
+    Parameters
+    ----------
+    dof : ndarray shape (num_ele, num_ele_dof)
+        dofs (starting at 0) of each element
+    f_ele : ndarray shape (num_ele, num_ele_dof)
+        element vectors
+    num_dof : int
+        size of the global vector
+
+    Returns
+    -------
+    ndarray shape (num_dof,)
+        entries of dofs shared by more than one element are summed
+
+    """
+    return np.bincount(np.ravel(dof), weights=np.ravel(f_ele),
+                       minlength=num_dof)
+
+
+def element_dofs(model):
+    """Get the dofs (starting at 0) of each element in model.elements order
+
+    Returns
+    -------
+    list of ndarray
+        one array with the element dofs for each element
+
+    """
+    return [np.asarray(constructor(eid, etype, model).dof) - 1
+            for eid, [etype, *edata] in model.elements.items()]
+
+
+class ScatterPlan(object):
+    """Sparsity pattern of the global matrix and element scatter map
+
+    Parameters
+    ----------
+    element_dofs : list of ndarray
+        dofs (starting at 0) of each element
+    num_dof : int
+        size of the square global matrix
+
+    Attributes
+    ----------
+    indptr, indices : ndarray
+        CSR structure of the global matrix
+    nnz : int
+        number of stored entries of the global matrix
+    slots : ndarray shape (sum(len(dof)**2),)
+        position in the CSR data array for each entry of the element blocks.
+        Element blocks are flattened in row major order and concatenated
+        following the element order.
+    offsets : ndarray shape (num_ele + 1,)
+        start of each element block in slots and values
+    values : ndarray shape (sum(len(dof)**2),)
+        preallocated buffer where the element blocks are written before
+        calling assemble()
+    data : ndarray shape (nnz,)
+        preallocated CSR data array filled in place by assemble()
+    matrix : scipy.sparse.csr_matrix shape (num_dof, num_dof)
+        global matrix built on the data, indices and indptr arrays
+
+    Example
+    -------
+    >>> plan = ScatterPlan([np.array([0, 1]), np.array([1, 2])], 3)
+    >>> plan.values[:] = 1
+    >>> plan.assemble().toarray()
+    array([[1., 1., 0.],
+           [1., 2., 1.],
+           [0., 1., 1.]])
+
+    """
+    def __init__(self, element_dofs, num_dof):
+        self.num_dof = num_dof
+        sizes = np.array([len(dof) for dof in element_dofs], dtype=int)
+        self.offsets = np.zeros(len(sizes) + 1, dtype=int)
+        np.cumsum(sizes**2, out=self.offsets[1:])
+
+        empty = [np.zeros(0, dtype=np.int64)]
+        rows = np.concatenate(empty + [np.repeat(dof, len(dof))
+                                       for dof in element_dofs])
+        cols = np.concatenate(empty + [np.tile(dof, len(dof))
+                                       for dof in element_dofs])
+        # unique (row, col) keys sorted by row then by column
+        keys = rows.astype(np.int64) * num_dof + cols.astype(np.int64)
+        unique, self.slots = np.unique(keys, return_inverse=True)
+        self.slots = self.slots.ravel()
+        self.nnz = len(unique)
+
+        # same index type scipy would choose, so the arrays are not copied
+        if max(self.nnz, num_dof) < np.iinfo(np.int32).max:
+            idx_dtype = np.int32
+        else:
+            idx_dtype = np.int64
+        self.indices = (unique % num_dof).astype(idx_dtype)
+        self.indptr = np.searchsorted(unique // num_dof,
+                                      np.arange(num_dof + 1)).astype(idx_dtype)
+        self.values = np.zeros(self.offsets[-1])
+        self.data = np.zeros(self.nnz)
+        self.matrix = sparse.csr_matrix((self.data, self.indices,
+                                         self.indptr),
+                                        shape=(num_dof, num_dof), copy=False)
+
+    def set_element(self, index, k):
+        """Write the block of the element at position index into values"""
+        self.values[self.offsets[index]:self.offsets[index + 1]] = k.ravel()
+
+    def assemble(self, values=None):
+        """Sum the element blocks into a CSR matrix
+
+        Parameters
+        ----------
+        values : ndarray shape (sum(len(dof)**2),), optional
+            element blocks flattened and concatenated, if None the values
+            buffer is used
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix shape (num_dof, num_dof)
+            the plan matrix, its data array is overwritten in place
+
+        Note
+        ----
+        No array is allocated, so the matrix of a previous assembly is
+        overwritten by the next one, copy it to keep it. The incremental
+        solver only assembles a new tangent when the previous one is no
+        longer used.
+
+        """
+        if values is None:
+            values = self.values
+        self.data[:] = 0
+        np.add.at(self.data, self.slots, np.ravel(values))
+        return self.matrix
@@ -1,6 +1,9 @@
 """Apply the boundary conditions to matrices and vectors"""
 import numpy as np
-from .constructor import constructor
+from scipy import sparse
+from .elements.quad4 import (constitutive_matrix, batch_strain,
+                             batch_internal_force)
+from .assembly import assemble_vector
 
 
 def dirichlet(K, F, model):
@@ -8,76 +11,178 @@ def dirichlet(K, F, model):
 
     Parameters
     ----------
-    K : ndarray shape((num_dof, num_dof))
+    K : ndarray or scipy.sparse matrix shape((num_dof, num_dof))
     F : ndarray shape((num_dof,))
     model : Model object
 
     Returns
     -------
-    K : numpy array
+    K : numpy array or scipy.sparse.csr_matrix
         Modified array to ensure boundary condition
     F : numpy array
         Modified array
 
+    Note
+    ----
+    The restrained dofs columns times the prescribed values are moved to the
+    right hand side, then their lines and columns are zeroed with 1 in the
+    diagonal. All dofs are modified at once, sparse matrices are modified in
+    the CSR data array and are never densified.
+
     """
     # make a copy of arrays to not modify the original ones
-    K = np.copy(K)
-    F = np.copy(F)
+    F = np.array(F, dtype=float)
+    if model.displacement_bc is None:
+        return K.copy(), F
+    dof, value = prescribed_displacement(model)
+    restrained = np.zeros(model.num_dof, dtype=bool)
+    restrained[dof] = True
+
+    if sparse.issparse(K):
+        K = sparse.csr_matrix(K, dtype=float, copy=True)
+        K.sum_duplicates()
+        F -= K[:, dof] @ value
+        rows = np.repeat(np.arange(K.shape[0]), np.diff(K.indptr))
+        cols = K.indices
+        K.data[restrained[rows] | restrained[cols]] = 0
+        diagonal = restrained[rows] & (rows == cols)
+        K.data[diagonal] = 1
+        # restrained dofs without a stored diagonal entry
+        missing = np.setdiff1d(dof, rows[diagonal])
+        if len(missing) > 0:
+            K = K + sparse.csr_matrix(
+                (np.ones(len(missing)), (missing, missing)), shape=K.shape)
+    else:
+        K = np.array(K, dtype=float)
+        F -= K[:, dof] @ value
+        K[dof, :] = 0  # zero lines
+        K[:, dof] = 0  # zero column
+        K[dof, dof] = 1  # diagonal equal 1
+    F[dof] = value
+    return K, F
+
+
+def prescribed_displacement(model):
+    """Collect the restrained dofs and their prescribed displacement
+
+    Parameters
+    ----------
+    model : Model object
+        uses the items in the displacement_bc dictionary
+
+    Returns
+    -------
+    dof : ndarray shape (num_restrained,)
+        sorted restrained dofs (starting at 0)
+    value : ndarray shape (num_restrained,)
+        displacement prescribed at each restrained dof
+
+    """
     if model.displacement_bc is not None:
-        for d_location, d_vector in model.displacement_bc.items():
-            physical_element = model.get_physical_element(d_location)
-            if len(physical_element) == 0:
+        for d_location in model.displacement_bc.keys():
+            if d_location not in model.physical_index:
                 raise Exception('Check if the physical element {} '
-                                'was defined in gmsh'.format(physical_element))
-            for eid, [etype, *edata] in physical_element.items():
-                # physical points
-                if etype == 15:
-                    node = edata[-1]  # last entry
-                    dof = np.array(model.nodes_dof[node]) - 1
-                    if d_vector[0] is not None:
-                        F -= K[:, dof[0]] * d_vector[0]
-                        F[dof[0]] = d_vector[0]
-                        K[dof[0], :] = 0  # zero lines
-                        K[:, dof[0]] = 0  # zero column
-                        K[dof[0], dof[0]] = 1  # diagonal equal 1
-                    if d_vector[1] is not None:
-                        F -= K[:, dof[1]] * d_vector[1]
-                        K[dof[1], :] = 0
-                        K[:, dof[1]] = 0
-                        K[dof[1], dof[1]] = 1  # diagonal equal 1
-                        F[dof[1]] = d_vector[1]
-                # physical lines
-                if etype == 1:
-                    node_1, node_2 = edata[-2], edata[-1]
-                    dof_n1 = np.array(model.nodes_dof[node_1]) - 1
-                    dof_n2 = np.array(model.nodes_dof[node_2]) - 1
-                    if d_vector[0] is not None:
-                        # modify dof in x for node 1
-                        F -= K[:, dof_n1[0]] * d_vector[0]
-                        F[dof_n1[0]] = d_vector[0]
-                        K[dof_n1[0], :] = 0  # zero lines
-                        K[:, dof_n1[0]] = 0  # zero column
-                        K[dof_n1[0], dof_n1[0]] = 1  # diagonal equal 1
-                        # modify dof in x for node 2
-                        F -= K[:, dof_n2[0]] * d_vector[0]
-                        F[dof_n2[0]] = d_vector[0]
-                        K[dof_n2[0], :] = 0  # zero lines
-                        K[:, dof_n2[0]] = 0  # zero column
-                        K[dof_n2[0], dof_n2[0]] = 1  # diagonal equal 1
-                    if d_vector[1] is not None:
-                        # modify dof in y for node 1
-                        F -= K[:, dof_n1[1]] * d_vector[1]
-                        K[dof_n1[1], :] = 0
-                        K[:, dof_n1[1]] = 0
-                        K[dof_n1[1], dof_n1[1]] = 1  # diagonal equal 1
-                        F[dof_n1[1]] = d_vector[1]
-                        # modify dof in y for node 2
-                        F -= K[:, dof_n2[1]] * d_vector[1]
-                        K[dof_n2[1], :] = 0
-                        K[:, dof_n2[1]] = 0
-                        K[dof_n2[1], dof_n2[1]] = 1  # diagonal equal 1
-                        F[dof_n2[1]] = d_vector[1]
-    return K, F
+                                'was defined in gmsh'.format(d_location))
+    return model.displacement_plan.fixed
+
+
+def compile_displacement(model, displacement):
+    """Compile a displacement dictionary into dof and value arrays
+
+    Parameters
+    ----------
+    model : Model object
+    displacement : dict or None
+        {physical_tag: (u_x, u_y)}, components with None are free. Only
+        nodes of physical points and lines are restrained.
+
+    Returns
+    -------
+    dof : ndarray shape (num_restrained,)
+        sorted restrained dofs (starting at 0)
+    value : ndarray shape (num_restrained,)
+        displacement at each dof, if a node is in more than one physical
+        element the value of the last one is used
+
+    """
+    restrained = np.zeros(model.num_dof, dtype=bool)
+    values = np.zeros(model.num_dof)
+    if displacement is not None:
+        for d_location, d_vector in displacement.items():
+            nodes = model.get_physical_nodes(d_location, etypes=[1, 15])
+            dof = model.get_nodes_dof(nodes)
+            for i, value in zip(range(model.num_dof_node), d_vector):
+                if value is not None:
+                    restrained[dof[:, i]] = True
+                    values[dof[:, i]] = value
+    dof = np.flatnonzero(restrained)
+    return dof, values[dof]
+
+
+class DisplacementPlan(object):
+    """Prescribed displacements compiled into dof and value arrays
+
+    The displacement_bc and the whole imposed_displ schedule are compiled
+    once, so applying them during the analysis is a vectorized scatter.
+
+    Parameters
+    ----------
+    model : Model object
+
+    Attributes
+    ----------
+    fixed : tuple (dof, value)
+        sorted dofs (starting at 0) and values from displacement_bc
+    imposed : list of tuple (dof, value)
+        sorted dofs and values from imposed_displ, one for each increment,
+        compiled on first use
+
+    Note
+    ----
+    The schedule is only used by the incremental solver, where
+    imposed_displ is a list with one {physical_tag: (u_x, u_y)} dictionary
+    for each increment. The single dictionary used by imposed_displacement
+    is not compiled.
+
+    """
+    def __init__(self, model):
+        self.model = model
+        self.fixed = compile_displacement(model, model.displacement_bc)
+        self._imposed = None
+
+    @property
+    def imposed(self):
+        if self._imposed is None:
+            schedule = self.model.imposed_displ
+            if schedule is None:
+                schedule = []
+            elif not isinstance(schedule, (list, tuple)):
+                raise Exception('imposed_displ must be a list with one '
+                                'dictionary for each increment')
+            self._imposed = [compile_displacement(self.model, displacement)
+                             for displacement in schedule]
+        return self._imposed
+
+    def imposed_values(self, increment, dof):
+        """Get the imposed displacement of an increment at some dofs
+
+        Parameters
+        ----------
+        increment : int
+        dof : ndarray
+            sorted dofs (starting at 0) that contain all the imposed dofs of
+            this increment, e.g. the restrained dofs
+
+        Returns
+        -------
+        ndarray shape (len(dof),)
+            imposed displacement, zero for the other dofs
+
+        """
+        values = np.zeros(len(dof))
+        imposed_dof, imposed_value = self.imposed[increment]
+        values[np.searchsorted(dof, imposed_dof)] = imposed_value
+        return values
 
 
 def imposed_displacement(model):
@@ -109,33 +214,19 @@ def imposed_displacement(model):
                 imposed_u[dof_n1[1]] = d_vector[1]
                 imposed_u[dof_n2[1]] = d_vector[1]
 
-    Pd = np.zeros(num_dof)
-
-    # Loop over elements
-    for eid, [etype, *edata] in model.elements.items():
-        # create element object
-        element = constructor(eid, etype, model)
-        # recover element nodal displacement increment,  shape (8,)
-        dof = np.array(element.dof) - 1  # numpy starts at 0
-
-        u_ele = imposed_u[dof]
-
-        Pd_ele = np.zeros(8)
-        # loop over gauss points
-        for gp_id, [w, gp] in enumerate(zip(element.gauss.weights,
-                                            element.gauss.points)):
-            # build element strain-displacement matrix shape (3, 8)
-            N, dN_ei = element.shape_function(xez=gp)
-            dJ, dN_xi, _ = element.jacobian(element.xyz, dN_ei)
-            B = element.gradient_operator(dN_xi)
-
-            D = element.c_matrix(N)
-
-            # interate over element
-            Pd_ele += B.T @ D @ B @ u_ele * (dJ * w * element.thickness)
+    # element geometry and constitutive matrix at the gauss points
+    geo = model.geometry
+    D = constitutive_matrix(geo.material(model.material.E),
+                            geo.material(model.material.nu),
+                            model.material.case)
+    # recover element nodal displacement, shape (num_ele, 8)
+    eps = batch_strain(geo.B, imposed_u[geo.dof])
+    sig = np.einsum('egij,egj->egi', D, eps)
+    # integrate B.T @ D @ B @ u_ele over each element
+    Pd_ele = batch_internal_force(geo.B, sig, geo.dV)
 
-        # += because elements can share same dof
-        Pd[element.id_v] += Pd_ele
+    # elements can share same dof
+    Pd = assemble_vector(geo.dof, Pd_ele, num_dof)
 
     return Pd
 
@@ -29,6 +29,9 @@ class Quad4(Element):
         self.id_m, self.id_v = self._get_incidence()
         self.num_nodes = len(self.conn)
         self.thickness = model.thickness
+        # sides at physical lines, used in load_traction_vector
+        self.side_at_boundary, self.at_boundary_line = (
+            model.topology.get_boundary_sides(eid))
 
     def _get_incidence(self):
         """get matrix and vector incidence arrays to allocate element values"""
@@ -291,16 +294,27 @@ class Quad4(Element):
 
     def stiffness_matrix(self, t=1):
         """Build the element stiffness matrix"""
-        k = np.zeros((8, 8))
         K = np.zeros((self.num_dof, self.num_dof))
+        K[self.id_m] = self.local_stiffness_matrix(t)
+        return K
+
+    def local_stiffness_matrix(self, t=1):
+        """Build the element stiffness matrix in the element dofs
+
+        Returns
+        -------
+        ndarray shape (8, 8)
+            element stiffness matrix ordered as element.dof
+
+        """
+        k = np.zeros((8, 8))
         for w, gp in zip(self.gauss.weights, self.gauss.points):
             N, dN_ei = self.shape_function(xez=gp)
             dJ, dN_xi, _ = self.jacobian(self.xyz, dN_ei)
             C = self.c_matrix(N, t)
             B = self.gradient_operator(dN_xi)
             k += w * (B.T @ C @ B) * dJ
-        K[self.id_m] = k * self.thickness
-        return K
+        return k * self.thickness
 
     def gradient_operator(self, dN_xi):
         """Build the standard gradient operator
@@ -361,20 +375,7 @@ class Quad4(Element):
         else:
             nu = self.nu
 
-        # convert elastic properties
-        if self.case == 'strain':
-            E = E / (1 - nu**2)
-            nu = nu / (1 - nu)
-
-        C = np.zeros((3, 3))
-        C[0, 0] = 1.0
-        C[1, 1] = 1.0
-        C[1, 0] = nu
-        C[0, 1] = nu
-        C[2, 2] = (1.0 - nu) / 2.0
-        C = (E / (1.0 - nu**2.0)) * C
-
-        return C
+        return constitutive_matrix(E, nu, self.case)
 
     def load_body_vector(self, b_force=None, t=1):
         """Build the element vector due body forces b_force
@@ -509,3 +510,105 @@ class Quad4(Element):
                         continue
 
         return pt
+
+
+def constitutive_matrix(E, nu, case='stress'):
+    """Build the plane elastic constitutive matrix
+
+    Parameters
+    ----------
+    E, nu : float or ndarray
+        elastic properties, arrays are broadcast together
+    case : str {'stress', 'strain'}
+        plane stress or plane strain
+
+    Returns
+    -------
+    C : ndarray shape (..., 3, 3)
+        one matrix for each entry of the broadcast E and nu
+
+    """
+    E, nu = np.broadcast_arrays(np.asarray(E, dtype=float),
+                                np.asarray(nu, dtype=float))
+
+    # convert elastic properties
+    if case == 'strain':
+        E = E / (1 - nu**2)
+        nu = nu / (1 - nu)
+
+    C = np.zeros(E.shape + (3, 3))
+    C[..., 0, 0] = 1.0
+    C[..., 1, 1] = 1.0
+    C[..., 1, 0] = nu
+    C[..., 0, 1] = nu
+    C[..., 2, 2] = (1.0 - nu) / 2.0
+    C *= (E / (1.0 - nu**2.0))[..., None, None]
+
+    return C
+
+
+def batch_strain(B, u_ele):
+    """Compute the strain at the gauss points of all elements at once
+
+    Parameters
+    ----------
+    B : ndarray shape (num_ele, num_gp, 3, 8)
+        strain-displacement matrix at each element gauss point
+    u_ele : ndarray shape (num_ele, 8)
+        element nodal displacements
+
+    Returns
+    -------
+    eps : ndarray shape (num_ele, num_gp, 3)
+        [eps_11, eps_22, 2 eps_12] at each element gauss point
+
+    """
+    return np.einsum('egij,ej->egi', B, u_ele)
+
+
+def batch_stiffness_matrix(B, D, dV):
+    """Integrate the stiffness matrix of all elements at once
+
+    Parameters
+    ----------
+    B : ndarray shape (num_ele, num_gp, 3, 8)
+        strain-displacement matrix at each element gauss point
+    D : ndarray shape (num_ele, num_gp, 3, 3)
+        constitutive (or consistent tangent) matrix at each gauss point
+    dV : ndarray shape (num_ele, num_gp)
+        jacobian determinant times gauss weight times thickness
+
+    Returns
+    -------
+    k : ndarray shape (num_ele, 8, 8)
+        sum over the gauss points of B.T @ D @ B * dV
+
+    """
+    BtD = np.matmul(np.swapaxes(B, -1, -2), D)
+    BtD *= dV[..., None, None]
+    return np.einsum('egij,egjk->eik', BtD, B)
+
+
+def batch_internal_force(B, sig, dV):
+    """Integrate the internal force vector of all elements at once
+
+    Parameters
+    ----------
+    B : ndarray shape (num_ele, num_gp, 3, 8)
+        strain-displacement matrix at each element gauss point
+    sig : ndarray shape (num_ele, num_gp, 3)
+        [sig_11, sig_22, sig_12] at each element gauss point
+    dV : ndarray shape (num_ele, num_gp)
+        jacobian determinant times gauss weight times thickness
+
+    Returns
+    -------
+    f_int : ndarray shape (num_ele, 8)
+        sum over the gauss points of B.T @ sig * dV
+
+    Note
+    ----
+    Reference Eq. 4.65 (1) Neto 2008
+
+    """
+    return np.einsum('egji,egj,eg->ei', B, sig, dV)
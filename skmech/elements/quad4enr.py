@@ -135,8 +135,14 @@ class Quad4Enr(Quad4):
                 zerolevelset[zid] = zls
         return zerolevelset
 
-    def stiffness_matrix(self, t=1):
-        """Build the enriched element stiffness matrix
+    def local_stiffness_matrix(self, t=1):
+        """Build the enriched element stiffness matrix in the element dofs
+
+        Returns
+        -------
+        ndarray shape (len(dof), len(dof))
+            element stiffness matrix with standard and enriched blocks,
+            ordered as element.dof
 
         Note
         ----
@@ -147,9 +153,6 @@ class Quad4Enr(Quad4):
         kaa = np.zeros((self.num_enr_dof, self.num_enr_dof))
         kua = np.zeros((self.num_std_dof, self.num_enr_dof))
 
-        # augmented matrix
-        K = np.zeros((self.num_dof, self.num_dof))
-
         for w, gp in zip(self.gauss.weights, self.gauss.points):
             N, dN_ei = self.shape_function(xez=gp)
             dJ, dN_xi, _ = self.jacobian(self.xyz, dN_ei)
@@ -164,8 +167,7 @@ class Quad4Enr(Quad4):
 
         k = np.block([[kuu, kua],
                       [kua.T, kaa]])
-        K[self.id_m] = k * self.thickness
-        return K
+        return k * self.thickness
 
     def enriched_gradient_operator(self, N, dN_xi):
         """Build the enriched gradient operator
@@ -0,0 +1,224 @@
+"""Precomputed element geometry at the quadrature points
+
+The mesh does not change during the analysis, so the shape functions, the
+jacobian determinant and the strain-displacement matrix of every quad element
+at every gauss point are computed once and stored in contiguous arrays with
+shape (num_ele, num_gp, ...). The element order is the same as in
+model.elements.
+
+"""
+import numpy as np
+from scipy import sparse
+from . import quadrature
+from .mesh.mesh import Mesh
+
+# Nodal coordinates in the natural domain following gmsh convention
+XEZ = np.array([[-1.0, -1.0],
+                [1.0, -1.0],
+                [1.0, 1.0],
+                [-1.0, 1.0]])
+
+
+def shape_functions(points):
+    """Evaluate the 4-node quad shape functions at isoparametric points
+
+    Parameters
+    ----------
+    points : ndarray shape (num_points, 2)
+        (xi, eta) coordinates
+
+    Returns
+    -------
+    N : ndarray shape (num_points, 4)
+    dN_ei : ndarray shape (num_points, 2, 4)
+        derivative with respect to xi (first row) and eta (second row)
+
+    """
+    points = np.asarray(points, dtype=float)
+    e1_term = 0.5 * (1.0 + XEZ[:, 0] * points[:, [0]])
+    e2_term = 0.5 * (1.0 + XEZ[:, 1] * points[:, [1]])
+    N = e1_term * e2_term
+    dN_ei = np.stack([0.5 * XEZ[:, 0] * e2_term,
+                      0.5 * XEZ[:, 1] * e1_term], axis=1)
+    return N, dN_ei
+
+
+class Geometry(object):
+    """Element geometry cache of a model with 4-node quad elements
+
+    Parameters
+    ----------
+    model : Model object
+
+    Attributes
+    ----------
+    eids : ndarray shape (num_ele,)
+        element tags in the order of model.elements
+    index : dict
+        {eid: position in the arrays}
+    conn : ndarray shape (num_ele, 4)
+        element nodes tags
+    physical_surf : ndarray shape (num_ele,)
+        element physical surface tag
+    dof : ndarray shape (num_ele, 8)
+        element dofs (starting at 0)
+    xyz : ndarray shape (num_ele, 4, 2)
+        element nodes coordinates
+    points, weights : ndarray shape (num_gp, 2), (num_gp,)
+        gauss quadrature points and weights
+    N : ndarray shape (num_gp, 4)
+        shape functions at the gauss points
+    xy : ndarray shape (num_ele, num_gp, 2)
+        gauss points cartesian coordinates
+    dJ : ndarray shape (num_ele, num_gp)
+        jacobian determinant
+    dV : ndarray shape (num_ele, num_gp)
+        integration factor, dJ * weight * thickness
+    B : ndarray shape (num_ele, num_gp, 3, 8)
+        standard strain-displacement matrix
+    corner_gp : ndarray shape (4,)
+        index of the gauss points at the corners of the square formed by the
+        outermost points, in the same order as the element nodes
+
+    """
+    def __init__(self, model):
+        num_quad_points = set(model.num_quad_points[eid]
+                              for eid in model.elements.keys())
+        if len(num_quad_points) > 1:
+            raise Exception('Geometry cache requires the same number of '
+                            'quadrature points for all elements')
+        for eid, [etype, *_] in model.elements.items():
+            if etype != 3:
+                raise Exception(f'Geometry cache only for 4-node quad '
+                                f'elements, element {eid} is type {etype}')
+
+        num_ele = len(model.elements)
+        self.eids = np.fromiter(model.elements.keys(), dtype=int,
+                                count=num_ele)
+        self.index = {eid: i for i, eid in enumerate(self.eids)}
+        self.conn = np.array([value[-4:]
+                              for value in model.elements.values()],
+                             dtype=int).reshape(num_ele, 4)
+        self.physical_surf = np.array([value[2]
+                                       for value in model.elements.values()],
+                                      dtype=int)
+        nodes_dof = model.nodes_dof
+        self.dof = np.array([[d - 1 for nid in conn for d in nodes_dof[nid]]
+                             for conn in self.conn],
+                            dtype=int).reshape(num_ele, 8)
+        mesh = model.mesh
+        if isinstance(mesh, Mesh):
+            self.xyz = mesh.coordinates[mesh.get_node_index(self.conn), :2]
+        else:
+            self.xyz = np.array([[mesh.nodes[nid][:2] for nid in conn]
+                                 for conn in self.conn],
+                                dtype=float).reshape(num_ele, 4, 2)
+
+        gauss = quadrature.Quadrilateral(num_quad_points.pop()
+                                         if num_quad_points else 2)
+        self.points = np.array(gauss.points, dtype=float)
+        self.weights = np.array(gauss.weights, dtype=float)
+        self.N, dN_ei = shape_functions(self.points)
+        self.xy = np.einsum('gi,eij->egj', self.N, self.xyz)
+
+        # jac = [ x1_e1 x2_e1
+        #         x1_e2 x2_e2 ] for each element and gauss point
+        jac = np.einsum('gij,ejk->egik', dN_ei, self.xyz)
+        det_jac = (jac[..., 0, 0] * jac[..., 1, 1] -
+                   jac[..., 0, 1] * jac[..., 1, 0])
+        self.dJ = np.abs(det_jac)
+        self.dV = self.dJ * self.weights * model.thickness
+
+        # inverse of the 2x2 jacobian matrices
+        jac_inv = np.empty_like(jac)
+        jac_inv[..., 0, 0] = jac[..., 1, 1]
+        jac_inv[..., 0, 1] = -jac[..., 0, 1]
+        jac_inv[..., 1, 0] = -jac[..., 1, 0]
+        jac_inv[..., 1, 1] = jac[..., 0, 0]
+        jac_inv /= det_jac[..., None, None]
+        dN_xi = np.einsum('egij,gjk->egik', jac_inv, dN_ei)
+
+        self.B = np.zeros(dN_xi.shape[:2] + (3, 8))
+        self.B[..., 0, 0::2] = dN_xi[..., 0, :]
+        self.B[..., 1, 1::2] = dN_xi[..., 1, :]
+        self.B[..., 2, 0::2] = dN_xi[..., 1, :]
+        self.B[..., 2, 1::2] = dN_xi[..., 0, :]
+
+        ges = np.max(self.points)
+        self.corner_gp = np.array([
+            np.flatnonzero(np.all(np.isclose(self.points, ges * corner),
+                                  axis=1))[0]
+            for corner in XEZ])
+
+    def material(self, parameter):
+        """Evaluate a material parameter at every gauss point
+
+        Parameters
+        ----------
+        parameter : dict
+            {physical_surf: value}, value can be a float, a function
+            f(x, y) evaluated at the gauss points coordinates or a list with
+            the values at the 4 element nodes interpolated with the shape
+            functions
+
+        Returns
+        -------
+        ndarray shape (num_ele, num_gp)
+
+        """
+        values = np.empty(self.dJ.shape)
+        for surf in np.unique(self.physical_surf):
+            try:
+                value = parameter[surf]
+            except KeyError:
+                raise Exception(f'Missing material property for physical '
+                                f'surface {surf}')
+            in_surf = self.physical_surf == surf
+            if callable(value):
+                values[in_surf] = [[value(x, y) for x, y in xy]
+                                   for xy in self.xy[in_surf]]
+            elif np.ndim(value) > 0:
+                value = np.asarray(value, dtype=float)
+                if value.shape != (self.N.shape[1],):
+                    raise Exception(f'Material property for physical surface '
+                                    f'{surf} must have one value for each '
+                                    f'of the {self.N.shape[1]} element nodes')
+                values[in_surf] = self.N @ value
+            else:
+                values[in_surf] = value
+        return values
+
+    def gp_to_node(self, adjacency):
+        """Sparse operator that extrapolates gauss point fields to the nodes
+
+        The field at the gauss points of the corners (corner_gp) of each
+        element is extrapolated to the element nodes with the shape
+        functions of the square they form, then the values of the elements
+        sharing a node are averaged.
+
+        Parameters
+        ----------
+        adjacency : Adjacency object
+            node to element adjacency with the elements in the same order,
+            see skmech.topology.Adjacency
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix shape (num_nodes, num_ele * num_gp)
+            rows follow adjacency.nodes and columns the gauss points of
+            each element, field_node = operator @ field.reshape(-1, ...)
+
+        """
+        num_ele, num_gp = self.dJ.shape
+        ges = np.max(self.points)
+        # Q[i, j] weight of the corner gauss point j at the node i
+        Q, _ = shape_functions(XEZ / ges)
+        node = adjacency.node_position(self.conn)
+        rows = np.repeat(node, 4, axis=1)
+        cols = np.tile(np.arange(num_ele)[:, None] * num_gp +
+                       self.corner_gp, (1, 4))
+        values = (Q.ravel() /
+                  np.repeat(adjacency.num_node_elements[node], 4, axis=1))
+        return sparse.csr_matrix(
+            (values.ravel(), (rows.ravel(), cols.ravel())),
+            shape=(len(adjacency.nodes), num_ele * num_gp))
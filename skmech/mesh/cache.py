@@ -0,0 +1,125 @@
+"""Cache of parsed meshes in a .npz file next to the .msh file
+
+The cache stores the Mesh arrays and the physical index. It is valid while
+the .msh file has the same size and modification time, or the same content
+hash when only the modification time changed (e.g. a copied file), then the
+cache is rewritten with the new modification time. A cache that cannot be
+read is parsed again.
+
+"""
+import os
+import hashlib
+import numpy as np
+
+# increase when the stored arrays change
+CACHE_VERSION = 1
+
+ARRAYS = ('node_ids', 'coordinates', 'element_ids', 'element_types',
+          'num_tags', 'tags', 'type_position')
+
+
+def cache_file(mesh_file):
+    """Name of the cache file of a .msh file"""
+    return mesh_file + '.npz'
+
+
+def file_hash(mesh_file):
+    """sha1 hash of the file content"""
+    sha1 = hashlib.sha1()
+    with open(mesh_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def load_cache(mesh_file):
+    """Load the mesh arrays from the cache if it is valid
+
+    Parameters
+    ----------
+    mesh_file : str
+
+    Returns
+    -------
+    arrays : dict or None
+        arguments of Mesh.set_arrays, None if there is no valid cache
+    physical_index : dict or None
+        see Mesh.get_physical_index
+
+    """
+    name = cache_file(mesh_file)
+    if not os.path.isfile(name):
+        return None, None
+    stat = os.stat(mesh_file)
+    # a truncated, corrupted or old cache is a cache miss
+    try:
+        with np.load(name) as data:
+            data = dict(data)
+        if int(data['version']) != CACHE_VERSION:
+            return None, None
+        if int(data['size']) != stat.st_size:
+            return None, None
+        if int(data['mtime']) != stat.st_mtime_ns:
+            if str(data['hash']) != file_hash(mesh_file):
+                return None, None
+            # same content, the new modification time avoids the hash in
+            # the next loads
+            data['mtime'] = stat.st_mtime_ns
+            _write(name, data)
+
+        arrays = {key: data[key] for key in ARRAYS}
+        arrays['connectivity'] = {
+            int(etype): data[f'connectivity_{etype}']
+            for etype in data['connectivity_types']}
+        physical_index = {
+            int(tag): {field: data[f'physical_{tag}_{field}']
+                       for field in ('eids', 'etypes', 'nodes', 'offsets')}
+            for tag in data['physical_tags']}
+    except Exception:
+        return None, None
+    return arrays, physical_index
+
+
+def save_cache(mesh_file, arrays, physical_index):
+    """Save the mesh arrays in the cache file
+
+    Parameters
+    ----------
+    mesh_file : str
+    arrays : dict
+        arguments of Mesh.set_arrays
+    physical_index : dict
+        see Mesh.get_physical_index
+
+    Note
+    ----
+    The cache is optional, it is not written if the directory is read only.
+
+    """
+    stat = os.stat(mesh_file)
+    data = {key: np.asarray(arrays[key]) for key in ARRAYS}
+    data['connectivity_types'] = np.array(list(arrays['connectivity']),
+                                          dtype=int)
+    for etype, conn in arrays['connectivity'].items():
+        data[f'connectivity_{etype}'] = conn
+    data['physical_tags'] = np.array(list(physical_index), dtype=int)
+    for tag, group in physical_index.items():
+        for field, value in group.items():
+            data[f'physical_{tag}_{field}'] = value
+    data['version'] = CACHE_VERSION
+    data['size'] = stat.st_size
+    data['mtime'] = stat.st_mtime_ns
+    data['hash'] = file_hash(mesh_file)
+    _write(cache_file(mesh_file), data)
+
+
+def _write(name, data):
+    """Write the cache in a temporary file and rename it, so a cache file is
+    always complete, nothing is written if the directory is read only"""
+    try:
+        # file object so numpy does not append another .npz
+        with open(name + '.tmp', 'wb') as f:
+            np.savez(f, **data)
+        os.replace(name + '.tmp', name)
+    except OSError:
+        pass
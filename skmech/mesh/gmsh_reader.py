@@ -46,3 +46,289 @@ def parse_msh(mesh_file):
                     ele_index = int(tags[0])
                     elements[ele_index] = tags[1:]
     return nodes, elements
+
+
+# number of nodes of the gmsh element types
+NUM_NODES = {1: 2, 2: 3, 3: 4, 4: 4, 5: 8, 6: 6, 7: 5, 8: 3, 9: 6, 10: 9,
+             11: 10, 12: 27, 13: 18, 14: 14, 15: 1, 16: 8, 17: 20, 18: 15,
+             19: 13, 20: 9, 21: 10, 22: 12, 23: 15, 24: 15, 25: 21, 26: 4,
+             27: 5, 28: 6, 29: 20, 30: 35, 31: 56, 36: 16, 37: 25}
+
+
+def read_msh(mesh_file, mmap=False):
+    """Read a .msh file into arrays
+
+    Reads the ASCII and binary MSH 2.2 and MSH 4.1 formats. Each $Nodes and
+    $Elements block is converted to arrays at once, the elements of the
+    same type that follow each other in the file are reshaped together.
+
+    Parameters
+    ----------
+    mesh_file : str
+    mmap : bool, default False
+        memory map the node block of binary MSH 2.2 files instead of
+        reading it, the coordinates are then read only when accessed
+
+    Returns
+    -------
+    dict
+        arguments of Mesh.set_arrays: node_ids, coordinates, element_ids,
+        element_types, num_tags, tags, connectivity and type_position
+
+    Note
+    ----
+    MSH 4.1 elements have 2 tags, the first physical tag of their entity (0
+    if the entity is not in a physical group) and the entity tag.
+
+    """
+    version, binary, endian = 2.2, False, '<'
+    entities = {}
+    node_blocks, element_blocks = [], []
+    with open(mesh_file, 'rb') as f:
+        while True:
+            line = f.readline()
+            if not line:        # empty line, end of file
+                break
+            section = line.strip()
+            if section == b'$MeshFormat':
+                version, file_type, data_size = f.readline().split()
+                version, binary = float(version), int(file_type) == 1
+                if version >= 3 and version != 4.1:
+                    raise Exception(f'MSH version {version} not supported, '
+                                    'use 2.2 or 4.1')
+                if binary:
+                    if int(data_size) != 8:
+                        raise Exception('Binary MSH requires 8 bytes size_t')
+                    one = f.read(4)
+                    endian = '<' if np.frombuffer(one, '<i4')[0] == 1 else '>'
+            elif section == b'$Entities':
+                if binary:
+                    entities = _entities_binary(f, endian)
+                else:
+                    entities = _entities_ascii(f)
+            elif section == b'$Nodes':
+                if version < 3 and binary:
+                    node_blocks = [_nodes_binary_2(f, endian, mmap,
+                                                   mesh_file)]
+                elif version < 3:
+                    node_blocks = [_nodes_ascii_2(f)]
+                elif binary:
+                    node_blocks = _nodes_binary_4(f, endian)
+                else:
+                    node_blocks = _nodes_ascii_4(f)
+            elif section == b'$Elements':
+                if version < 3 and binary:
+                    element_blocks = _elements_binary_2(f, endian)
+                elif version < 3:
+                    element_blocks = _elements_ascii_2(f)
+                elif binary:
+                    element_blocks = _elements_binary_4(f, endian, entities)
+                else:
+                    element_blocks = _elements_ascii_4(f, entities)
+    return _to_arrays(node_blocks, element_blocks)
+
+
+def _read_lines(f, num_lines):
+    """Read the next num_lines lines as a single string"""
+    return b''.join(f.readline() for _ in range(num_lines)).decode()
+
+
+def _nodes_ascii_2(f):
+    """Nodes of an ASCII MSH 2.2 file"""
+    num_nodes = int(f.readline())
+    data = np.fromstring(_read_lines(f, num_nodes), dtype=float, sep=' ')
+    data = data.reshape(num_nodes, 4)
+    return data[:, 0].astype(int), data[:, 1:]
+
+
+def _nodes_binary_2(f, endian, mmap, mesh_file):
+    """Nodes of a binary MSH 2.2 file"""
+    num_nodes = int(f.readline())
+    dtype = np.dtype([('id', endian + 'i4'), ('xyz', endian + 'f8', (3,))])
+    if mmap:
+        data = np.memmap(mesh_file, dtype=dtype, mode='r', offset=f.tell(),
+                         shape=(num_nodes,))
+        f.seek(num_nodes * dtype.itemsize, 1)
+    else:
+        data = np.frombuffer(f.read(num_nodes * dtype.itemsize), dtype)
+    return data['id'].astype(int), data['xyz']
+
+
+def _elements_ascii_2(f):
+    """Element blocks of an ASCII MSH 2.2 file"""
+    num_ele = int(f.readline())
+    data = np.fromstring(_read_lines(f, num_ele), dtype=int, sep=' ')
+    blocks = []
+    start = 0
+    while start < len(data):
+        etype, num_tags = data[start + 1], data[start + 2]
+        width = 3 + num_tags + NUM_NODES[etype]
+        num_rows = (len(data) - start) // width
+        rows = data[start:start + num_rows * width].reshape(num_rows, width)
+        # rows are aligned until the first element with a different layout
+        same = (rows[:, 1] == etype) & (rows[:, 2] == num_tags)
+        num_same = num_rows if same.all() else np.argmin(same)
+        rows = rows[:num_same]
+        blocks.append((etype, rows[:, 0], rows[:, 3:3 + num_tags],
+                       rows[:, 3 + num_tags:]))
+        start += num_same * width
+    return blocks
+
+
+def _elements_binary_2(f, endian):
+    """Element blocks of a binary MSH 2.2 file"""
+    num_ele = int(f.readline())
+    blocks = []
+    read = 0
+    while read < num_ele:
+        etype, num_follow, num_tags = (
+            int(n) for n in np.frombuffer(f.read(12), endian + 'i4'))
+        width = 1 + num_tags + NUM_NODES[etype]
+        rows = np.frombuffer(f.read(4 * num_follow * width), endian + 'i4')
+        rows = rows.reshape(num_follow, width).astype(int)
+        blocks.append((etype, rows[:, 0], rows[:, 1:1 + num_tags],
+                       rows[:, 1 + num_tags:]))
+        read += num_follow
+    return blocks
+
+
+def _entities_ascii(f):
+    """Physical tag of each (dim, tag) entity of a MSH 4.1 file"""
+    counts = [int(n) for n in f.readline().split()]
+    entities = {}
+    for dim, num in enumerate(counts):
+        for _ in range(num):
+            data = f.readline().split()
+            # points have 3 coordinates and the others a bounding box
+            start = 4 if dim == 0 else 7
+            num_phys = int(data[start])
+            phys = int(data[start + 1]) if num_phys > 0 else 0
+            entities[(dim, int(data[0]))] = phys
+    return entities
+
+
+def _entities_binary(f, endian):
+    """Physical tag of each (dim, tag) entity of a MSH 4.1 file"""
+    size_t, int_t = endian + 'u8', endian + 'i4'
+    counts = [int(n) for n in np.frombuffer(f.read(32), size_t)]
+    entities = {}
+    for dim, num in enumerate(counts):
+        for _ in range(num):
+            tag = np.frombuffer(f.read(4), int_t)[0]
+            f.read(8 * (3 if dim == 0 else 6))
+            num_phys = int(np.frombuffer(f.read(8), size_t)[0])
+            phys = np.frombuffer(f.read(4 * num_phys), int_t)
+            entities[(dim, int(tag))] = int(phys[0]) if num_phys > 0 else 0
+            if dim > 0:
+                num_bound = int(np.frombuffer(f.read(8), size_t)[0])
+                f.read(4 * num_bound)
+    return entities
+
+
+def _nodes_ascii_4(f):
+    """Nodes of an ASCII MSH 4.1 file"""
+    num_blocks = int(f.readline().split()[0])
+    blocks = []
+    for _ in range(num_blocks):
+        dim, _, parametric, num = (int(n) for n in f.readline().split())
+        ids = np.fromstring(_read_lines(f, num), dtype=int, sep=' ')
+        xyz = np.fromstring(_read_lines(f, num), dtype=float, sep=' ')
+        width = 3 + (dim if parametric else 0)
+        blocks.append((ids, xyz.reshape(num, width)[:, :3]))
+    return _concatenate_nodes(blocks)
+
+
+def _nodes_binary_4(f, endian):
+    """Nodes of a binary MSH 4.1 file"""
+    size_t, int_t = endian + 'u8', endian + 'i4'
+    num_blocks = int(np.frombuffer(f.read(32), size_t)[0])
+    blocks = []
+    for _ in range(num_blocks):
+        dim, _, parametric = (int(n) for n in
+                              np.frombuffer(f.read(12), int_t))
+        num = int(np.frombuffer(f.read(8), size_t)[0])
+        ids = np.frombuffer(f.read(8 * num), size_t).astype(int)
+        width = 3 + (dim if parametric else 0)
+        xyz = np.frombuffer(f.read(8 * num * width), endian + 'f8')
+        blocks.append((ids, xyz.reshape(num, width)[:, :3]))
+    return _concatenate_nodes(blocks)
+
+
+def _concatenate_nodes(blocks):
+    """Join the node blocks of all entities"""
+    if len(blocks) == 0:
+        return []
+    ids, xyz = zip(*blocks)
+    return [(np.concatenate(ids), np.concatenate(xyz))]
+
+
+def _elements_ascii_4(f, entities):
+    """Element blocks of an ASCII MSH 4.1 file"""
+    num_blocks = int(f.readline().split()[0])
+    blocks = []
+    for _ in range(num_blocks):
+        dim, tag, etype, num = (int(n) for n in f.readline().split())
+        rows = np.fromstring(_read_lines(f, num), dtype=int, sep=' ')
+        rows = rows.reshape(num, 1 + NUM_NODES[etype])
+        blocks.append(_element_block_4(dim, tag, etype, rows, entities))
+    return blocks
+
+
+def _elements_binary_4(f, endian, entities):
+    """Element blocks of a binary MSH 4.1 file"""
+    size_t, int_t = endian + 'u8', endian + 'i4'
+    num_blocks = int(np.frombuffer(f.read(32), size_t)[0])
+    blocks = []
+    for _ in range(num_blocks):
+        dim, tag, etype = (int(n) for n in np.frombuffer(f.read(12), int_t))
+        num = int(np.frombuffer(f.read(8), size_t)[0])
+        width = 1 + NUM_NODES[etype]
+        rows = np.frombuffer(f.read(8 * num * width), size_t)
+        rows = rows.reshape(num, width).astype(int)
+        blocks.append(_element_block_4(dim, tag, etype, rows, entities))
+    return blocks
+
+
+def _element_block_4(dim, tag, etype, rows, entities):
+    """Element block with the entity physical tag and the entity tag"""
+    tags = np.empty((len(rows), 2), dtype=int)
+    tags[:, 0] = entities.get((dim, tag), 0)
+    tags[:, 1] = tag
+    return etype, rows[:, 0], tags, rows[:, 1:]
+
+
+def _to_arrays(node_blocks, element_blocks):
+    """Join the node and element blocks into the Mesh arrays"""
+    if node_blocks:
+        node_ids, coordinates = node_blocks[0]
+    else:
+        node_ids, coordinates = np.zeros(0, dtype=int), np.zeros((0, 3))
+
+    num_ele = sum(len(block[1]) for block in element_blocks)
+    max_num_tags = max([block[2].shape[1] for block in element_blocks] + [2])
+    element_ids = np.zeros(num_ele, dtype=int)
+    element_types = np.zeros(num_ele, dtype=int)
+    num_tags = np.zeros(num_ele, dtype=int)
+    tags = np.zeros((num_ele, max_num_tags), dtype=int)
+    type_position = np.zeros(num_ele, dtype=int)
+    conn = {}
+    start = 0
+    for etype, ids, ele_tags, ele_conn in element_blocks:
+        end = start + len(ids)
+        element_ids[start:end] = ids
+        element_types[start:end] = etype
+        num_tags[start:end] = ele_tags.shape[1]
+        tags[start:end, :ele_tags.shape[1]] = ele_tags
+        num_type = sum(len(c) for c in conn.get(etype, []))
+        type_position[start:end] = np.arange(num_type, num_type + len(ids))
+        conn.setdefault(etype, []).append(ele_conn)
+        start = end
+    return {'node_ids': node_ids,
+            'coordinates': coordinates,
+            'element_ids': element_ids,
+            'element_types': element_types,
+            'num_tags': num_tags,
+            'tags': tags,
+            'connectivity': {etype: np.concatenate(c).astype(int)
+                             for etype, c in conn.items()},
+            'type_position': type_position}
@@ -1,28 +1,378 @@
 """Build mesh object
 """
-from .gmsh_reader import parse_msh
+import numpy as np
+from collections.abc import Mapping
+from .gmsh_reader import read_msh
+from .cache import load_cache, save_cache
 
 
 class Mesh(object):
     """Creates mesh object
 
+    The mesh is stored in arrays, the nodes and elements dictionaries are
+    views of the arrays.
+
     Parameters
     ----------
-    nodes : dict
+    mesh_file : str, optional
+        gmsh .msh file (MSH 2.2 or 4.1, ASCII or binary), if None the
+        arrays are set with set_arrays
+    mmap : bool, default False
+        memory map the node coordinates of binary MSH 2.2 files
+    cache : bool, default False
+        load the arrays from the mesh_file + '.npz' cache if it is valid,
+        otherwise parse the file and write the cache, see mesh.cache
+
+    Attributes
+    ----------
+    node_ids : ndarray shape (num_nodes,)
+        gmsh node tags in the file order
+    coordinates : ndarray shape (num_nodes, 3)
+        node coordinates
+    node_index : ndarray shape (max(node_ids) + 1,)
+        position of a node tag in node_ids, -1 for tags not in the mesh
+    element_ids : ndarray shape (num_ele,)
+        gmsh element tags in the file order
+    element_types : ndarray shape (num_ele,)
+        gmsh element type
+    element_index : ndarray shape (max(element_ids) + 1,)
+        position of an element tag in element_ids, -1 for tags not in the
+        mesh
+    num_tags : ndarray shape (num_ele,)
+        number of tags of each element
+    tags : ndarray shape (num_ele, max(num_tags))
+        element tags, generally the physical and the geometrical tags
+    connectivity : dict
+        {element type: ndarray shape (num_ele_type, num_nodes_type)} with
+        the node tags of the elements of each type
+    type_position : ndarray shape (num_ele,)
+        row of each element in the connectivity array of its type
+    nodes : Mapping
         Nodes coordinate with the format {node_id : array(x, y, z)}
-    element : dict
+    elements : Mapping
         Elements with format:
             {element_id: array(type, #tags, tag1, ..., n1, n2 ...)}
         type is the gmsh type, #tags is the number of tags, generally is
         referred to physical geometry element tag and the geometry element tag
         n1, n2 ... are the nodes tag that form the element.
 
-    Attributes
+    """
+    def __init__(self, mesh_file=None, mmap=False, cache=False):
+        self._physical_index = None
+        self._element_rows = None
+        if mesh_file is not None:
+            arrays, physical_index = None, None
+            if cache:
+                arrays, physical_index = load_cache(mesh_file)
+            if arrays is None:
+                arrays = read_msh(mesh_file, mmap)
+                self.set_arrays(**arrays)
+                if cache:
+                    save_cache(mesh_file, arrays, self.get_physical_index())
+            else:
+                self.set_arrays(**arrays)
+                self._physical_index = physical_index
+            self.name = mesh_file.split(".", 1)[0]
+
+    @classmethod
+    def from_dict(cls, nodes, elements, name='mesh'):
+        """Create a mesh from nodes and elements dictionaries
+
+        The name is used for the output files, see save_output.
+
+        """
+        mesh = cls()
+        mesh.set_arrays(**dict_to_arrays(nodes, elements))
+        mesh.name = name
+        return mesh
+
+    def set_arrays(self, node_ids, coordinates, element_ids, element_types,
+                   num_tags, tags, connectivity, type_position):
+        """Set the mesh arrays and build the id maps and views
+
+        Parameters are described in the class attributes.
+
+        """
+        self.node_ids = np.asarray(node_ids, dtype=int)
+        self.coordinates = np.asarray(coordinates, dtype=float)
+        self.element_ids = np.asarray(element_ids, dtype=int)
+        self.element_types = np.asarray(element_types, dtype=int)
+        self.num_tags = np.asarray(num_tags, dtype=int)
+        self.tags = np.asarray(tags, dtype=int).reshape(
+            len(self.element_ids), -1)
+        self.connectivity = {etype: np.asarray(conn, dtype=int)
+                             for etype, conn in connectivity.items()}
+        self.type_position = np.asarray(type_position, dtype=int)
+        self._physical_index = None
+        self._element_rows = None
+        self.node_index = id_map(self.node_ids)
+        self.element_index = id_map(self.element_ids)
+        self.nodes = NodesView(self)
+        self.elements = ElementsView(self)
+
+    @property
+    def physical_tags(self):
+        """Physical tag (first tag) of each element"""
+        return self.tags[:, 0]
+
+    @property
+    def geometric_tags(self):
+        """Geometrical tag (second tag) of each element"""
+        return self.tags[:, 1]
+
+    def get_physical_index(self):
+        """Index the elements by physical tag
+
+        Returns
+        -------
+        dict
+            {physical tag: {'eids': ndarray, 'etypes': ndarray,
+                            'nodes': ndarray, 'offsets': ndarray}}
+            the nodes of the i-th element are
+            nodes[offsets[i]:offsets[i + 1]]
+
+        Note
+        ----
+        The index is computed once and stored in the mesh.
+
+        """
+        if self._physical_index is not None:
+            return self._physical_index
+        num_nodes_type = np.zeros(max(self.connectivity, default=0) + 1,
+                                  dtype=int)
+        for etype, conn in self.connectivity.items():
+            num_nodes_type[etype] = conn.shape[1]
+        physical = self.physical_tags
+        unique, first = np.unique(physical, return_index=True)
+        index = {}
+        for phys in unique[np.argsort(first)]:
+            rows = np.flatnonzero(physical == phys)
+            etypes = self.element_types[rows]
+            offsets = np.zeros(len(rows) + 1, dtype=int)
+            np.cumsum(num_nodes_type[etypes], out=offsets[1:])
+            nodes = np.zeros(offsets[-1], dtype=int)
+            for etype in np.unique(etypes):
+                in_type = etypes == etype
+                conn = self.connectivity[etype][
+                    self.type_position[rows[in_type]]]
+                position = (offsets[:-1][in_type, None] +
+                            np.arange(conn.shape[1]))
+                nodes[position] = conn
+            index[int(phys)] = {'eids': self.element_ids[rows],
+                                'etypes': etypes,
+                                'nodes': nodes,
+                                'offsets': offsets}
+        self._physical_index = index
+        return index
+
+    def get_element_rows(self):
+        """Pack the rows (type, #tags, tags, nodes) of all the elements
+
+        Returns
+        -------
+        data : ndarray
+            read only rows of the elements one after the other
+        offsets : ndarray shape (num_ele + 1,)
+            the row of the i-th element is data[offsets[i]:offsets[i + 1]]
+
+        Note
+        ----
+        The rows are computed once and stored in the mesh, so the elements
+        view returns slices of data without copies.
+
+        """
+        if self._element_rows is not None:
+            return self._element_rows
+        num_nodes_type = np.zeros(max(self.connectivity, default=0) + 1,
+                                  dtype=int)
+        for etype, conn in self.connectivity.items():
+            num_nodes_type[etype] = conn.shape[1]
+        offsets = np.zeros(len(self.element_ids) + 1, dtype=int)
+        np.cumsum(2 + self.num_tags + num_nodes_type[self.element_types],
+                  out=offsets[1:])
+        data = np.zeros(offsets[-1], dtype=int)
+        start = offsets[:-1]
+        data[start] = self.element_types
+        data[start + 1] = self.num_tags
+        column = np.arange(self.tags.shape[1])
+        in_tags = column < self.num_tags[:, None]
+        data[(start[:, None] + 2 + column)[in_tags]] = self.tags[in_tags]
+        for etype, conn in self.connectivity.items():
+            rows = np.flatnonzero(self.element_types == etype)
+            position = ((start + 2 + self.num_tags)[rows, None] +
+                        np.arange(conn.shape[1]))
+            data[position] = conn[self.type_position[rows]]
+        data.flags.writeable = False
+        self._element_rows = data, offsets
+        return self._element_rows
+
+    def get_node_index(self, nids):
+        """Get the position of node tags in the node arrays
+
+        Raises
+        ------
+        KeyError
+            if a node tag is not in the mesh
+
+        """
+        return lookup(self.node_index, nids)
+
+    def get_element_index(self, eids):
+        """Get the position of element tags in the element arrays
+
+        Raises
+        ------
+        KeyError
+            if an element tag is not in the mesh
+
+        """
+        return lookup(self.element_index, eids)
+
+
+class NodesView(Mapping):
+    """Read only {node_id: array(x, y, z)} view of the mesh arrays"""
+    def __init__(self, mesh):
+        self.mesh = mesh
+
+    def __getitem__(self, nid):
+        return self.mesh.coordinates[lookup(self.mesh.node_index, nid)]
+
+    def __iter__(self):
+        return iter(self.mesh.node_ids.tolist())
+
+    def __len__(self):
+        return len(self.mesh.node_ids)
+
+    def __contains__(self, nid):
+        return valid_id(self.mesh.node_index, nid)
+
+
+class ElementsView(Mapping):
+    """Read only {element_id: array(type, #tags, tags, nodes)} view
+
+    The values are slices of the packed rows of Mesh.get_element_rows.
+
+    Parameters
+    ----------
+    mesh : Mesh object
+    selected : ndarray shape (num_ele,), optional
+        boolean mask of the elements in the view, all the elements of the
+        mesh if None, see select
+
+    """
+    def __init__(self, mesh, selected=None):
+        self.mesh = mesh
+        self.selected = selected
+
+    def select(self, etypes):
+        """View of the elements with a type in etypes"""
+        return ElementsView(self.mesh,
+                            np.isin(self.mesh.element_types, etypes))
+
+    def __getitem__(self, eid):
+        i = lookup(self.mesh.element_index, eid)
+        if self.selected is not None and not self.selected[i]:
+            raise KeyError(eid)
+        data, offsets = self.mesh.get_element_rows()
+        return data[offsets[i]:offsets[i + 1]]
+
+    def __iter__(self):
+        eids = self.mesh.element_ids
+        if self.selected is not None:
+            eids = eids[self.selected]
+        return iter(eids.tolist())
+
+    def __len__(self):
+        if self.selected is not None:
+            return int(np.count_nonzero(self.selected))
+        return len(self.mesh.element_ids)
+
+    def __contains__(self, eid):
+        if not valid_id(self.mesh.element_index, eid):
+            return False
+        return (self.selected is None or
+                bool(self.selected[self.mesh.element_index[eid]]))
+
+
+def id_map(ids):
+    """Lookup array with the position of each id, -1 for missing ids"""
+    index = np.full(ids.max() + 1 if len(ids) > 0 else 0, -1, dtype=int)
+    index[ids] = np.arange(len(ids))
+    return index
+
+
+def valid_id(index, key):
+    """Check if an integer key is in the lookup array"""
+    try:
+        return 0 <= key < len(index) and index[key] >= 0
+    except TypeError:
+        return False
+
+
+def lookup(index, keys):
+    """Get the positions of keys in the lookup array
+
+    Raises
+    ------
+    KeyError
+        if a key is not in the lookup array
+
+    """
+    keys = np.asarray(keys)
+    if not np.issubdtype(keys.dtype, np.integer):
+        raise KeyError(keys.tolist())
+    valid = (keys >= 0) & (keys < len(index))
+    if np.all(valid):
+        positions = index[keys]
+        valid = positions >= 0
+        if np.all(valid):
+            return positions
+    raise KeyError(keys[~valid].tolist() if keys.ndim else keys.item())
+
+
+def dict_to_arrays(nodes, elements):
+    """Convert nodes and elements dictionaries to the mesh arrays
+
+    Parameters
     ----------
     nodes : dict
-    element : dict
+        {node_id : array(x, y, z)}
+    elements : dict
+        {element_id: array(type, #tags, tag1, ..., n1, n2 ...)}
+
+    Returns
+    -------
+    dict
+        arguments of Mesh.set_arrays
 
     """
-    def __init__(self, mesh_file):
-        self.nodes, self.elements = parse_msh(mesh_file)
-        self.name = mesh_file.split(".", 1)[0]
+    coordinates = np.zeros((len(nodes), 3))
+    for i, xyz in enumerate(nodes.values()):
+        coordinates[i, :len(xyz)] = xyz[:3]
+
+    num_ele = len(elements)
+    element_types = np.zeros(num_ele, dtype=int)
+    num_tags = np.zeros(num_ele, dtype=int)
+    type_position = np.zeros(num_ele, dtype=int)
+    tags, conn = [], {}
+    for i, [etype, ntags, *edata] in enumerate(elements.values()):
+        element_types[i], num_tags[i] = etype, ntags
+        tags.append(edata[:ntags])
+        conn.setdefault(etype, [])
+        type_position[i] = len(conn[etype])
+        conn[etype].append(edata[ntags:])
+    max_num_tags = max(num_tags.max() if num_ele > 0 else 0, 2)
+    tags_array = np.zeros((num_ele, max_num_tags), dtype=int)
+    for i, ele_tags in enumerate(tags):
+        tags_array[i, :len(ele_tags)] = ele_tags
+    return {'node_ids': np.fromiter(nodes.keys(), dtype=int,
+                                    count=len(nodes)),
+            'coordinates': coordinates,
+            'element_ids': np.fromiter(elements.keys(), dtype=int,
+                                       count=num_ele),
+            'element_types': element_types,
+            'num_tags': num_tags,
+            'tags': tags_array,
+            'connectivity': {etype: np.array(c, dtype=int)
+                             for etype, c in conn.items()},
+            'type_position': type_position}
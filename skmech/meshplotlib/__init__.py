@@ -1 +1,2 @@
 from .gmshio import gmshio
+from .vtkio import vtkio
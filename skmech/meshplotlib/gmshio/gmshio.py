@@ -20,25 +20,7 @@ def write_field(field_value, mesh_file, field_name, ndim,
     datatype : {'Node', 'Element'}
 
     """
-    # Create file if it does not exist or if it was created during
-    # another execution
-    if os.path.isfile(f'{mesh_file}_out.msh'):
-        # True if file already exist
-        if exe_time > os.path.getmtime(f'{mesh_file}_out.msh'):
-            # file was created before this execution, then rewrite
-            with open(f'{mesh_file}_out.msh', 'w') as out, \
-                 open(f'{mesh_file}.msh', 'r') as msh:
-                # copy msh into out file
-                out.writelines(l for l in msh)
-        else:
-            # file was created during this execution, do nothing
-            pass
-    else:
-        # file does not exist, create
-        with open(f'{mesh_file}_out.msh', 'w') as out, \
-             open(f'{mesh_file}.msh', 'r') as msh:
-            # copy msh into out file
-            out.writelines(l for l in msh)
+    init_output(mesh_file, exe_time)
 
     header = f"""
 ${datatype}Data
@@ -70,6 +52,88 @@ ${datatype}Data
         out.write(f'$End{datatype}Data')
 
 
+def write_fields(fields, mesh_file, time_value, time_step, exe_time,
+                 datatype='Node'):
+    """Write many fields of one time step with a single file write
+
+    Parameters
+    ----------
+    fields : list of tuple
+        (field_name, ids, values) for each field, ids is an array shape (n,)
+        with the node (or element) tags and values an array shape (n,) for
+        scalar fields or (n, ndim) for vector fields
+    mesh_file : string
+    time_value : float
+    time_step : int
+    exe_time : float
+    datatype : {'Node', 'Element'}
+
+    Note
+    ----
+    The blocks are the same written by write_field, but they are formatted
+    in memory and appended to the output file at once.
+
+    """
+    init_output(mesh_file, exe_time)
+
+    blocks = []
+    for field_name, ids, values in fields:
+        values = np.asarray(values, dtype=float)
+        ndim = 1 if values.ndim == 1 else values.shape[1]
+        values = values.reshape(len(values), ndim)
+        header = f"""
+${datatype}Data
+1
+"{field_name}"
+1
+{time_value}
+3
+{time_step}
+{ndim}
+{len(values)}
+"""
+        lines = [f'{nid} ' + ' '.join(map(str, value))
+                 for nid, value in zip(np.asarray(ids).tolist(),
+                                       values.tolist())]
+        blocks.append(header + '\n'.join(lines) + f'\n$End{datatype}Data')
+
+    with open(f'{mesh_file}_out.msh', 'a') as out:
+        out.write(''.join(blocks))
+
+
+def init_output(mesh_file, exe_time):
+    """Copy the mesh into the output file if it was not created in this
+    execution
+
+    Parameters
+    ----------
+    mesh_file : string
+        name of the mesh file without the .msh extension
+    exe_time : float
+        start time of the execution
+
+    """
+    # Create file if it does not exist or if it was created during
+    # another execution
+    if os.path.isfile(f'{mesh_file}_out.msh'):
+        # True if file already exist
+        if exe_time > os.path.getmtime(f'{mesh_file}_out.msh'):
+            # file was created before this execution, then rewrite
+            with open(f'{mesh_file}_out.msh', 'w') as out, \
+                 open(f'{mesh_file}.msh', 'r') as msh:
+                # copy msh into out file
+                out.writelines(l for l in msh)
+        else:
+            # file was created during this execution, do nothing
+            pass
+    else:
+        # file does not exist, create
+        with open(f'{mesh_file}_out.msh', 'w') as out, \
+             open(f'{mesh_file}.msh', 'r') as msh:
+            # copy msh into out file
+            out.writelines(l for l in msh)
+
+
 if __name__ == '__main__':
     with open('test.msh', 'w') as test_file:
         test_mesh = """$MeshFormat
@@ -0,0 +1,309 @@
+"""Write VTK unstructured grid files (.vtu) with a .pvd time series index
+
+The arrays are stored in the appended data section of the .vtu files, raw
+binary or base64 encoded, each one preceded by its size in bytes as UInt64,
+so writing a time step costs about the same as copying its arrays to disk.
+
+"""
+import os
+import re
+import base64
+import numpy as np
+from ...mesh.mesh import Mesh
+from ...postprocess.stressrecovery import smooth_fields, gauss_point_array
+
+# VTK cell types
+VTK_QUAD = 9
+
+# numpy to VTK data types, little endian
+DTYPES = {'f8': 'Float64', 'f4': 'Float32', 'i8': 'Int64', 'i4': 'Int32',
+          'u1': 'UInt8'}
+
+
+def write_vtu(file_name, points, connectivity, cell_types, point_data=None,
+              cell_data=None, encoding='raw', component_names=None):
+    """Write an unstructured grid in a .vtu file
+
+    Parameters
+    ----------
+    file_name : str
+    points : ndarray shape (num_points, 2) or (num_points, 3)
+        point coordinates
+    connectivity : ndarray shape (num_cells, num_nodes_cell)
+        position in points of the nodes of each cell
+    cell_types : int or ndarray shape (num_cells,)
+        VTK cell type, e.g. VTK_QUAD
+    point_data, cell_data : dict, optional
+        {name: ndarray shape (num_points, ...) or (num_cells, ...)}, the
+        axes after the first are the components
+    encoding : {'raw', 'base64'}, default 'raw'
+        encoding of the appended data
+    component_names : dict, optional
+        {name: list of str} names of the components of an array
+
+    """
+    if encoding not in ('raw', 'base64'):
+        raise Exception(f'Encoding {encoding} not supported, use raw or '
+                        'base64')
+    points = np.asarray(points, dtype=float)
+    num_points = len(points)
+    if points.shape[1] == 2:
+        points = np.hstack([points, np.zeros((num_points, 1))])
+    connectivity = np.asarray(connectivity)
+    num_cells, num_nodes_cell = connectivity.shape
+    cell_types = np.broadcast_to(np.asarray(cell_types, dtype=np.uint8),
+                                 (num_cells,))
+    component_names = component_names or {}
+
+    blocks = []
+    offset = 0
+
+    def data_array(name, array, num_rows):
+        """DataArray tag of an array and its appended block"""
+        nonlocal offset
+        array = np.ascontiguousarray(array).reshape(num_rows, -1)
+        dtype = array.dtype.newbyteorder('<')
+        array = array.astype(dtype, copy=False)
+        attributes = (f'type="{DTYPES[dtype.str[1:]]}" '
+                      + (f'Name="{name}" ' if name is not None else '')
+                      + f'NumberOfComponents="{array.shape[1]}" ')
+        for i, component in enumerate(component_names.get(name, [])):
+            attributes += f'ComponentName{i}="{component}" '
+        tag = (f'<DataArray {attributes}format="appended" '
+               f'offset="{offset}"/>\n')
+        data = array.tobytes()
+        header = np.array([len(data)], dtype='<u8').tobytes()
+        if encoding == 'base64':
+            # header and data are encoded separately
+            block = base64.b64encode(header) + base64.b64encode(data)
+        else:
+            block = header + data
+        blocks.append(block)
+        offset += len(block)
+        return tag
+
+    xml = ['<?xml version="1.0"?>\n'
+           '<VTKFile type="UnstructuredGrid" version="1.0" '
+           'byte_order="LittleEndian" header_type="UInt64">\n'
+           '<UnstructuredGrid>\n'
+           f'<Piece NumberOfPoints="{num_points}" '
+           f'NumberOfCells="{num_cells}">\n']
+    xml.append('<PointData>\n')
+    for name, values in (point_data or {}).items():
+        xml.append(data_array(name, np.asarray(values, dtype=float),
+                              num_points))
+    xml.append('</PointData>\n<CellData>\n')
+    for name, values in (cell_data or {}).items():
+        xml.append(data_array(name, np.asarray(values, dtype=float),
+                              num_cells))
+    xml.append('</CellData>\n<Points>\n')
+    xml.append(data_array(None, points, num_points))
+    xml.append('</Points>\n<Cells>\n')
+    # cell arrays have one component
+    xml.append(data_array('connectivity', connectivity.astype(np.int64),
+                          connectivity.size))
+    xml.append(data_array('offsets',
+                          np.arange(1, num_cells + 1, dtype=np.int64) *
+                          num_nodes_cell, num_cells))
+    xml.append(data_array('types', cell_types, num_cells))
+    xml.append('</Cells>\n</Piece>\n</UnstructuredGrid>\n'
+               f'<AppendedData encoding="{encoding}">\n_')
+
+    with open(file_name, 'wb') as out:
+        out.write(''.join(xml).encode())
+        for block in blocks:
+            out.write(block)
+        out.write(b'\n</AppendedData>\n</VTKFile>\n')
+
+
+def write_pvd(file_name, datasets):
+    """Write the .pvd index of a time series of .vtu files
+
+    Parameters
+    ----------
+    file_name : str
+    datasets : list of tuple
+        (time, vtu file name) of each time step, the vtu file names are
+        written relative to the .pvd directory
+
+    """
+    directory = os.path.dirname(os.path.abspath(file_name))
+    lines = ['<?xml version="1.0"?>\n'
+             '<VTKFile type="Collection" version="0.1" '
+             'byte_order="LittleEndian">\n<Collection>\n']
+    for time, vtu in datasets:
+        vtu = os.path.relpath(os.path.abspath(vtu), directory)
+        lines.append(f'<DataSet timestep="{time}" group="" part="0" '
+                     f'file="{vtu}"/>\n')
+    lines.append('</Collection>\n</VTKFile>\n')
+    with open(file_name, 'w') as out:
+        out.write(''.join(lines))
+
+
+def read_vtu(file_name):
+    """Read the appended arrays of a .vtu file written by write_vtu
+
+    Returns
+    -------
+    dict
+        {name: ndarray shape (num_rows, num_components)}, the points are
+        stored with the name 'Points'
+
+    """
+    with open(file_name, 'rb') as f:
+        content = f.read()
+    start = content.index(b'<AppendedData')
+    xml = content[:start].decode()
+    data_start = content.index(b'_', start)
+    encoding = re.search(rb'encoding="(\w+)"',
+                         content[start:data_start]).group(1).decode()
+    data = content[data_start + 1:]
+    types = {value: np.dtype('<' + key) for key, value in DTYPES.items()}
+
+    arrays = {}
+    for tag in re.findall(r'<DataArray ([^>]*)/>', xml):
+        attributes = dict(re.findall(r'(\w+)="([^"]*)"', tag))
+        offset = int(attributes['offset'])
+        dtype = types[attributes['type']]
+        if encoding == 'base64':
+            # the 8 bytes header is encoded in 12 characters
+            size = int(np.frombuffer(
+                base64.b64decode(data[offset:offset + 12]), '<u8')[0])
+            length = 4 * ((size + 2) // 3)
+            raw = base64.b64decode(data[offset + 12:offset + 12 + length])
+        else:
+            size = int(np.frombuffer(data[offset:offset + 8], '<u8')[0])
+            raw = data[offset + 8:offset + 8 + size]
+        array = np.frombuffer(raw, dtype)
+        arrays[attributes.get('Name', 'Points')] = array.reshape(
+            -1, int(attributes['NumberOfComponents']))
+    return arrays
+
+
+class VTKWriter(object):
+    """Write the results of each increment in a .vtu file with a .pvd index
+
+    The files are name_0001.vtu, name_0002.vtu, ... and name.pvd, which is
+    rewritten after each time step so it is always complete.
+
+    Parameters
+    ----------
+    model : Model object
+        the quad elements of the model are the cells and the nodes of the
+        elements are the points
+    name : str
+        name of the output files without extension
+    encoding : {'raw', 'base64'}, default 'raw'
+    gauss_points : bool, default True
+        write the internal variables at the gauss points as cell data in
+        each increment, besides the smoothed nodal values
+
+    Attributes
+    ----------
+    node_ids : ndarray shape (num_points,)
+        node tag of each point, model.adjacency.nodes
+    element_ids : ndarray shape (num_cells,)
+        element tag of each cell
+    datasets : list
+        (time, file name) of the written time steps
+
+    Example
+    -------
+    The writer can be used as the output of the incremental solver
+
+    >>> skmech.incremental.solver(model, output=VTKWriter(model, 'plate'))
+
+    """
+    def __init__(self, model, name, encoding='raw', gauss_points=True):
+        self.model = model
+        self.name = name
+        self.encoding = encoding
+        self.gauss_points = gauss_points
+        adjacency = model.adjacency
+        geo = model.geometry
+        self.node_ids = adjacency.nodes
+        self.element_ids = geo.eids
+        self.connectivity = adjacency.node_position(geo.conn)
+        mesh = model.mesh
+        if isinstance(mesh, Mesh):
+            xyz = mesh.coordinates[mesh.get_node_index(self.node_ids)]
+        else:
+            xyz = np.array([np.pad(np.asarray(mesh.nodes[nid], dtype=float),
+                                   (0, 3))[:3]
+                            for nid in self.node_ids.tolist()]).reshape(-1, 3)
+        self.points = xyz
+        self.datasets = []
+
+    def write(self, time, point_data=None, cell_data=None, gauss_data=None,
+              component_names=None):
+        """Write one time step
+
+        Parameters
+        ----------
+        time : float
+        point_data : dict, optional
+            {name: ndarray shape (num_points, ...)} in the node_ids order
+        cell_data : dict, optional
+            {name: ndarray shape (num_cells, ...)} in the element_ids order
+        gauss_data : dict, optional
+            {name: ndarray shape (num_cells, num_gp, ...) or gauss point
+            field {(eid, gp_id): value}} written as cell data with the values
+            of all the gauss points as components
+        component_names : dict, optional
+            {name: list of str} names of the components of point, cell or
+            gauss point data
+
+        Returns
+        -------
+        str
+            name of the .vtu file
+
+        """
+        cell_data = dict(cell_data or {})
+        component_names = dict(component_names or {})
+        for name, field in (gauss_data or {}).items():
+            values = gauss_point_array(self.model, field)
+            cell_data[name] = values
+            num_comp = int(np.prod(values.shape[2:]))
+            components = component_names.get(name, range(num_comp))
+            component_names[name] = [
+                f'gp{gp}' if num_comp == 1 else f'gp{gp}_{comp}'
+                for gp in range(values.shape[1]) for comp in components]
+
+        file_name = f'{self.name}_{len(self.datasets) + 1:04d}.vtu'
+        write_vtu(file_name, self.points, self.connectivity, VTK_QUAD,
+                  point_data, cell_data, self.encoding, component_names)
+        self.datasets.append((time, file_name))
+        write_pvd(f'{self.name}.pvd', self.datasets)
+        return file_name
+
+    def __call__(self, model, u, int_var, increment, start, lmbda):
+        """Write the fields of save_output for an increment
+
+        The displacement and the smoothed stress components, von Mises
+        stress and accumulated plastic strain are point data. If
+        gauss_points is True the stress, von Mises stress and accumulated
+        plastic strain at the gauss points are cell data.
+
+        """
+        displ = np.zeros((len(self.node_ids), 3))
+        displ[:, :2] = u[model.get_nodes_dof(self.node_ids)]
+        sig = gauss_point_array(model, int_var['sig'])
+        q = gauss_point_array(model, int_var['q'])
+        eps_bar_p = gauss_point_array(model, int_var['eps_bar_p'])
+        # stress components are stored as (x, y, xy, z)
+        stacked = np.concatenate([sig, q[..., None], eps_bar_p[..., None]],
+                                 axis=-1)
+        field_node = smooth_fields(model, stacked)
+        point_data = {'Displacement': displ,
+                      'Stress': field_node[:, :4],
+                      'Von Mises': field_node[:, 4],
+                      'Cummulative plastic strain': field_node[:, 5]}
+        gauss_data = {}
+        if self.gauss_points:
+            gauss_data = {'Stress gp': sig, 'Von Mises gp': q,
+                          'Cummulative plastic strain gp': eps_bar_p}
+        components = ['x', 'y', 'xy', 'z']
+        self.write(lmbda, point_data, gauss_data=gauss_data,
+                   component_names={'Stress': components,
+                                    'Stress gp': components})
@@ -6,6 +6,12 @@ structure model.
 """
 import numpy as np
 from .xfem.xfem import Xfem
+from .assembly import ScatterPlan, element_dofs
+from .geometry import Geometry
+from .topology import Topology, Adjacency
+from .dirichlet import DisplacementPlan
+from .mesh.mesh import Mesh
+from .plasticity.tangentmises import elastic_regions
 
 
 class Model(object):
@@ -55,9 +61,21 @@ class Model(object):
         # too many node related attributes:
         # nodes.coord, nodes.num_dof, nodes.dof, nodes.num_dof_pernode,
         self.nodes_dof = self._generate_dof()
+        # sorted dofs of all nodes (starting at 0) without enrichment
+        self._standard_dof = np.sort(
+            self.get_nodes_dof(list(self.nodes_dof)).ravel())
+
+        # element ids, types and nodes for each physical tag
+        self.physical_index = self._get_physical_index()
+
+        # displacement_bc and imposed_displ schedule as dof and value arrays,
+        # built on first use
+        self._displacement_plan = None
 
         # array with free and restrained dof
         self.id_f, self.id_r = self.get_free_restrained_dof()
+        # free and restrained dof for each increment with imposed_displ
+        self._increment_dof = {}
 
         if zerolevelset is None:
             self.xfem = None
@@ -70,81 +88,164 @@ class Model(object):
         self.microscale = microscale
         self.homogenized_c = homogenized_c
 
+        # sparsity pattern of global matrices, element geometry at the
+        # quadrature points, edge topology, adjacency and gauss point to node
+        # operator, all built on first use
+        self._scatter_plan = None
+        self._geometry = None
+        self._topology = None
+        self._adjacency = None
+        self._gp_to_node = None
+        self._elastic_tangent = None
+
+    @property
+    def displacement_plan(self):
+        """Prescribed displacements as dof and value arrays
+
+        See skmech.dirichlet.DisplacementPlan.
+
+        """
+        if self._displacement_plan is None:
+            self._displacement_plan = DisplacementPlan(self)
+        return self._displacement_plan
+
+    @property
+    def scatter_plan(self):
+        """Sparsity pattern and element to CSR slot map of the model
+
+        Built once on first use and reused for every assembly of the
+        global tangent matrix.
+
+        """
+        if self._scatter_plan is None:
+            self._scatter_plan = ScatterPlan(element_dofs(self),
+                                             self.num_dof)
+        return self._scatter_plan
+
+    @property
+    def geometry(self):
+        """Element geometry at the quadrature points
+
+        B matrices, jacobian determinants and integration weights for every
+        element and gauss point, computed once since the mesh is fixed for
+        the whole analysis. See skmech.geometry.Geometry.
+
+        """
+        if self._geometry is None:
+            self._geometry = Geometry(self)
+        return self._geometry
+
+    @property
+    def topology(self):
+        """Element edges, edge adjacency and element sides at boundary lines
+
+        Computed once, see skmech.topology.Topology.
+
+        """
+        if self._topology is None:
+            self._topology = Topology(self)
+        return self._topology
+
+    @property
+    def adjacency(self):
+        """Node to element and element to element adjacency (CSR)
+
+        Computed once, see skmech.topology.Adjacency.
+
+        """
+        if self._adjacency is None:
+            if self.xfem is not None:
+                self._adjacency = self.xfem.adjacency
+            else:
+                self._adjacency = Adjacency.from_elements(self.elements)
+        return self._adjacency
+
+    @property
+    def gp_to_node(self):
+        """Sparse operator that extrapolates gauss point fields to the nodes
+
+        Computed once, see skmech.geometry.Geometry.gp_to_node.
+
+        """
+        if self._gp_to_node is None:
+            self._gp_to_node = self.geometry.gp_to_node(self.adjacency)
+        return self._gp_to_node
+
+    @property
+    def elastic_tangent(self):
+        """Elastic tangent matrix of each material region
+
+        Tuple (De, region) for the gauss points in the geometry order,
+        computed once, see skmech.plasticity.tangentmises.elastic_regions.
+
+        """
+        if self._elastic_tangent is None:
+            geo = self.geometry
+            self._elastic_tangent = elastic_regions(
+                geo.material(self.material.E),
+                geo.material(self.material.nu), self.material.case)
+        return self._elastic_tangent
+
     def get_free_restrained_dof(self):
         """Create array with free and restrained dofs
 
+        Returns
+        -------
+        id_f, id_r : ndarray
+            sorted free and restrained dofs (starting at 0)
+
         Note
         ----
         Used the items in the displacement_bc dictionary
 
         """
-        id_r = []
-        if self.displacement_bc is not None:
-            for d_loc, d_value in self.displacement_bc.items():
-                physical_element = self.get_physical_element(d_loc)
-                for eid, [etype, *edata] in physical_element.items():
-                    # physical points
-                    if etype == 15:
-                        node = edata[-1]  # last entry
-                        dof = np.array(self.nodes_dof[node]) - 1
-                        if d_value[0] is not None:
-                            id_r.append(dof[0])
-                        if d_value[1] is not None:
-                            id_r.append(dof[1])
-                    # physical lines
-                    if etype == 1:
-                        node_1, node_2 = edata[-2], edata[-1]
-                        dof_n1 = np.array(self.nodes_dof[node_1]) - 1
-                        dof_n2 = np.array(self.nodes_dof[node_2]) - 1
-                        if d_value[0] is not None:
-                            id_r.append(dof_n1[0])
-                            id_r.append(dof_n2[0])
-                        if d_value[1] is not None:
-                            id_r.append(dof_n1[1])
-                            id_r.append(dof_n2[1])
-
-        id_f = [dof[i] - 1 for i in [0, 1] for dof in self.nodes_dof.values()
-                if dof[i] - 1 not in id_r]
-        return id_f, id_r
+        restrained = np.zeros(self.num_dof, dtype=bool)
+        restrained[self.displacement_plan.fixed[0]] = True
+        return self._split_dof(restrained)
 
     def update_free_restrained_dof(self, increment):
         """Update the free and restrained dof arrays
 
+        Returns
+        -------
+        id_f, id_r : ndarray
+            sorted free and restrained dofs (starting at 0)
+
         Note
         ----
         Uses the items in imposed_displ[increment] dictionary for an specific
-        time increment in the incremental solver
-
-        """
-        id_r = []
-        if self.imposed_displ is not None:
-            for d_loc, d_value in self.imposed_displ[increment].items():
-                physical_element = self.get_physical_element(d_loc)
-                for eid, [etype, *edata] in physical_element.items():
-                    # physical points
-                    if etype == 15:
-                        node = edata[-1]  # last entry
-                        dof = np.array(self.nodes_dof[node]) - 1
-                        if d_value[0] is not None:
-                            id_r.append(dof[0])
-                        if d_value[1] is not None:
-                            id_r.append(dof[1])
-                    # physical lines
-                    if etype == 1:
-                        node_1, node_2 = edata[-2], edata[-1]
-                        dof_n1 = np.array(self.nodes_dof[node_1]) - 1
-                        dof_n2 = np.array(self.nodes_dof[node_2]) - 1
-                        if d_value[0] is not None:
-                            id_r.append(dof_n1[0])
-                            id_r.append(dof_n2[0])
-                        if d_value[1] is not None:
-                            id_r.append(dof_n1[1])
-                            id_r.append(dof_n2[1])
-        id_r = self.id_r + id_r
-
-        id_f = [dof[i] - 1 for i in [0, 1] for dof in self.nodes_dof.values()
-                if dof[i] - 1 not in id_r]
-        return id_f, id_r
+        time increment in the incremental solver. The arrays are computed
+        once for each increment and cached.
+
+        """
+        if increment not in self._increment_dof:
+            restrained = np.zeros(self.num_dof, dtype=bool)
+            restrained[self.displacement_plan.fixed[0]] = True
+            if self.imposed_displ is not None:
+                restrained[self.displacement_plan.imposed[increment][0]] = True
+            self._increment_dof[increment] = self._split_dof(restrained)
+        return self._increment_dof[increment]
+
+    def _split_dof(self, restrained):
+        """Split the standard dofs in free and restrained using a mask"""
+        dof = self._standard_dof
+        return dof[~restrained[dof]], dof[restrained[dof]]
+
+    def get_nodes_dof(self, nodes):
+        """Get the dofs (starting at 0) of nodes
+
+        Parameters
+        ----------
+        nodes : array_like
+            node ids
+
+        Returns
+        -------
+        ndarray shape (len(nodes), num_dof_node)
+
+        """
+        return np.array([self.nodes_dof[nid] for nid in nodes],
+                        dtype=int).reshape(-1, self.num_dof_node) - 1
 
     def set_dof_displacement(self, displacement):
         """Set the dof displacemnt into model attribute"""
@@ -165,10 +266,74 @@ class Model(object):
         dict
             dictionary with element data that are in the physical element
 
+        Note
+        ----
+        Uses the physical index built with the model, so the cost depends
+        only on the number of elements in the physical element.
+
         """
-        return {key: value
-                for key, value in self.mesh.elements.items()
-                if value[2] == physical_element}
+        try:
+            eids = self.physical_index[physical_element]['eids']
+        except KeyError:
+            return {}
+        return {eid: self.mesh.elements[eid] for eid in eids}
+
+    def get_physical_nodes(self, physical_element, etypes=None):
+        """Get the nodes of a physical element
+
+        Parameters
+        ----------
+        physical_element : int
+            physical tag
+        etypes : list of int, optional
+            only nodes of elements with these types, all types if None
+
+        Returns
+        -------
+        ndarray
+            sorted unique node ids, empty if the tag does not exist
+
+        """
+        try:
+            group = self.physical_index[physical_element]
+        except KeyError:
+            return np.zeros(0, dtype=int)
+        if etypes is None:
+            return np.unique(group['nodes'])
+        in_etypes = np.isin(group['etypes'], etypes)
+        counts = np.diff(group['offsets'])
+        return np.unique(group['nodes'][np.repeat(in_etypes, counts)])
+
+    def _get_physical_index(self):
+        """Index the mesh elements by physical tag
+
+        Returns
+        -------
+        dict
+            {physical tag: {'eids': ndarray, 'etypes': ndarray,
+                            'nodes': ndarray, 'offsets': ndarray}}
+            the nodes of the i-th element are
+            nodes[offsets[i]:offsets[i + 1]]
+
+        """
+        if isinstance(self.mesh, Mesh):
+            return self.mesh.get_physical_index()
+        groups = {}
+        for eid, [etype, num_tags, phys, *edata] in self.mesh.elements.items():
+            groups.setdefault(phys, []).append((eid, etype,
+                                                edata[num_tags - 1:]))
+        index = {}
+        for phys, group in groups.items():
+            eids, etypes, conn = zip(*group)
+            offsets = np.zeros(len(conn) + 1, dtype=int)
+            np.cumsum([len(nodes) for nodes in conn], out=offsets[1:])
+            index[phys] = {
+                'eids': np.array(eids, dtype=int),
+                'etypes': np.array(etypes, dtype=int),
+                'nodes': np.array([nid for nodes in conn for nid in nodes],
+                                  dtype=int),
+                'offsets': offsets}
+        return index
 
     def _generate_dof(self):
         """Generate nodal degree of freedom
@@ -200,11 +365,14 @@ class Model(object):
 
         Returns
         -------
-        dict
+        dict or ElementsView
             dictionary with element type and element data if element
-            type is in declared etypes list
+            type is in declared etypes list, a view of the mesh arrays
+            for a Mesh object
 
         """
+        if hasattr(elements, 'select'):
+            return elements.select(self.etypes)
         return {key: value
                 for key, value in elements.items()
                 if value[0] in self.etypes}
@@ -1,36 +1,126 @@
 """Apply the Neumann boundary conditions"""
 import numpy as np
+from .assembly import assemble_vector
 
 
-def neumann(model):
+def neumann(model, lmbda=1):
     """Creates an equivalent nodal load with traction boundary condition
 
+    Parameters
+    ----------
+    model : Model object
+        uses the items in the traction dictionary {physical_tag: traction}
+    lmbda : float, default 1
+        load factor, constant tractions are multiplied by it and it is
+        passed to traction functions
+
+    Returns
+    -------
+    Pt : ndarray shape (num_dof,)
+
+    Note
+    ----
+    A traction is a constant vector (t_x, t_y) or a function
+    t(x, y, lmbda) that returns (t_x, t_y). The function is called once for
+    each physical element with arrays with the coordinates of all the
+    quadrature points of its lines. The lines are integrated with
+    model.num_quad_points gauss points and on physical points the traction
+    is a concentrated nodal load.
+
+    Without traction functions neumann(model, lmbda) is equal to
+    lmbda * neumann(model).
+
     """
     Pt = np.zeros(model.num_dof)
+    Pt_function = np.zeros(model.num_dof)
     if model.traction is not None:
         for t_location, t_vector in model.traction.items():
-            physical_element = model.get_physical_element(t_location)
-            if len(physical_element) == 0:
+            if t_location not in model.physical_index:
                 raise Exception('Check if the physical element '
-                                f'{physical_element} '
+                                f'{t_location} '
                                 'was defined in gmsh')
-            # loop over elements that are in the t_location physical entity
-            for eid, [etype, *edata] in physical_element.items():
-                # check if physical element is 2 node line
-                if etype == 1:
-                    n1, n2 = edata[-2], edata[-1]
-                    dxyz = (np.asarray(model.mesh.nodes[n1]) -
-                            np.asarray(model.mesh.nodes[n2]))
-                    d = np.linalg.norm(dxyz)
-                    pt = d * np.asarray(t_vector) / 2
-                    dof1 = np.asarray(model.nodes_dof[n1]) - 1  # starts at 0
-                    dof2 = np.asarray(model.nodes_dof[n2]) - 1  # starts at 0
-                    Pt[dof1] += pt
-                    Pt[dof2] += pt
-                # if physical element is a node
-                if etype == 15:
-                    n = edata[-1]
-                    dof = np.asarray(model.nodes_dof[n]) - 1  # starts at 0
-                    pt = np.asarray(t_vector)
-                    Pt[dof] += pt
+            if callable(t_vector):
+                Pt_function += traction_load(model, t_location, t_vector,
+                                             lmbda)
+            else:
+                Pt += traction_load(model, t_location, t_vector)
+    return lmbda * Pt + Pt_function
+
+
+def traction_load(model, t_location, t_vector, lmbda=1):
+    """Equivalent nodal load of the traction on a physical element
+
+    Parameters
+    ----------
+    model : Model object
+    t_location : int
+        physical tag with 2 node lines (etype 1) or points (etype 15)
+    t_vector : array_like or function
+        constant traction (t_x, t_y) or function t(x, y, lmbda)
+    lmbda : float, default 1
+        load factor passed to the traction function
+
+    Returns
+    -------
+    ndarray shape (num_dof,)
+
+    """
+    group = model.physical_index[t_location]
+    # nodes of lines are the last 2 and the node of points is the last one
+    end = group['offsets'][1:] - 1
+    lines = group['etypes'] == 1
+    points = group['etypes'] == 15
+    n1, n2 = group['nodes'][end[lines] - 1], group['nodes'][end[lines]]
+    n = group['nodes'][end[points]]
+    Pt = np.zeros(model.num_dof)
+
+    if np.any(lines):
+        x1, x2 = node_coordinates(model, n1), node_coordinates(model, n2)
+        length = np.linalg.norm(x2 - x1, axis=1)
+        dof = np.hstack([model.get_nodes_dof(n1), model.get_nodes_dof(n2)])
+        if callable(t_vector):
+            num_gp = max(model.num_quad_points[eid]
+                         for eid in group['eids'][lines])
+            xi, w = np.polynomial.legendre.leggauss(num_gp)
+            N = np.stack([(1 - xi) / 2, (1 + xi) / 2], axis=1)
+            # coordinates of the quadrature points, shape (num_lines, gp)
+            x = np.outer(x1[:, 0], N[:, 0]) + np.outer(x2[:, 0], N[:, 1])
+            y = np.outer(x1[:, 1], N[:, 0]) + np.outer(x2[:, 1], N[:, 1])
+            t = evaluate_traction(t_vector, x, y, lmbda)
+            # line gp, shape function and component, dS = length / 2 dxi
+            pt = np.einsum('g,ga,lgi,l->lai', w, N, t, length / 2)
+        else:
+            pt = (length[:, None, None] / 2 *
+                  np.broadcast_to(np.asarray(t_vector, dtype=float),
+                                  (len(length), 2, 2)))
+        Pt += assemble_vector(dof, pt.reshape(len(length), -1), model.num_dof)
+
+    if np.any(points):
+        dof = model.get_nodes_dof(n)
+        if callable(t_vector):
+            xy = node_coordinates(model, n)
+            pt = evaluate_traction(t_vector, xy[:, 0], xy[:, 1], lmbda)
+        else:
+            pt = np.broadcast_to(np.asarray(t_vector, dtype=float),
+                                 (len(n), 2))
+        Pt += assemble_vector(dof, pt, model.num_dof)
     return Pt
+
+
+def evaluate_traction(t_function, x, y, lmbda):
+    """Evaluate a traction function at many points at once
+
+    Returns
+    -------
+    ndarray shape x.shape + (2,)
+        (t_x, t_y) at each point
+
+    """
+    t_x, t_y = t_function(x, y, lmbda)
+    return np.stack(np.broadcast_arrays(t_x, t_y, x)[:2], axis=-1)
+
+
+def node_coordinates(model, nodes):
+    """Get the (x, y) coordinates of nodes, shape (len(nodes), 2)"""
+    return np.array([model.mesh.nodes[nid][:2] for nid in nodes],
+                    dtype=float).reshape(-1, 2)
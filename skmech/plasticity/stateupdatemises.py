@@ -251,5 +251,142 @@ def local_constitutive_newton(max_num_local_iter,
         raise Exception('Local Newton-Raphson did not converge')
 
 
+def state_update_mises_batch(E, nu, H, sig_y0,
+                             eps_e_trial, eps_bar_p_trial, eps_p_trial):
+    """State update with von Mises yield criterion for many gauss points
+
+    Vectorized version of state_update_mises with linear hardening, see
+    local_const_lin_hard. All gauss points are updated in one call and the
+    results are the same as calling the scalar version for each point.
+
+    Parameters
+    ----------
+    E, nu, H, sig_y0 : float or ndarray shape (num_gp,)
+        material parameters at each gauss point
+    eps_e_trial : ndarray shape (num_gp, 4)
+        elastic trial strain [eps_11, eps_22, 2 eps_12, eps_33]
+    eps_bar_p_trial : ndarray shape (num_gp,)
+        accumulated plastic strain obtained from the previous load increment
+    eps_p_trial : ndarray shape (num_gp, 4)
+        plastic strain from the previous load increment
+
+    Returns
+    -------
+    sig : ndarray shape (num_gp, 4)
+    eps_e : ndarray shape (num_gp, 4)
+    eps_p : ndarray shape (num_gp, 4)
+    eps_bar_p : ndarray shape (num_gp,)
+    dgama : ndarray shape (num_gp,)
+    q : ndarray shape (num_gp,)
+        von Mises effective stress
+    ep_flag : ndarray shape (num_gp,) of bool
+        True for the gauss points in a plastic step
+
+    Note
+    ----
+    From (sec. 7.3.4 and 7.3.5 Neto 2008)
+
+    """
+    eps_e_trial = np.asarray(eps_e_trial, dtype=float)
+    num_gp = len(eps_e_trial)
+    E, nu, H, sig_y0 = (np.broadcast_to(np.asarray(a, dtype=float), (num_gp,))
+                        for a in (E, nu, H, sig_y0))
+    eps_bar_p_trial = np.broadcast_to(
+        np.asarray(eps_bar_p_trial, dtype=float), (num_gp,))
+    eps_p_trial = np.asarray(eps_p_trial, dtype=float)
+    m = np.array([1, 1, 0, 1])
+
+    # material properties
+    G = E / (2 * (1 + nu))      # shear modulus
+    K = E / (3 * (1 - 2 * nu))  # bulk modulus
+
+    # Elastic predictor step (eq. 3.90 Neto 2008)
+    eps_v_trial = eps_e_trial[:, 0] + eps_e_trial[:, 1] + eps_e_trial[:, 3]
+    p = K * eps_v_trial                       # hydrostatic stress
+    # elastic trial deviatoric strain
+    eps_d_trial = eps_e_trial - (1 / 3) * eps_v_trial[:, None] * m
+    # convert engineering shear strain component into physical
+    eps_d_trial[:, 2] = eps_d_trial[:, 2] / 2
+
+    # von Mises effective stress
+    sig_d_trial = 2 * G[:, None] * eps_d_trial
+    J2 = (0.5) * (sig_d_trial[:, 0]**2 + sig_d_trial[:, 1]**2 +
+                  2 * sig_d_trial[:, 2]**2 + sig_d_trial[:, 3]**2)
+    q_trial = np.sqrt(3 * J2)
+
+    # linear hardening function and yield function
+    sig_y = sig_y0 + H * eps_bar_p_trial
+    Phi_trial = q_trial - sig_y
+
+    # elastic step, variables that are not updated keep the trial value
+    ep_flag = Phi_trial > 0
+    sig = sig_d_trial + p[:, None] * m
+    eps_e = eps_e_trial.copy()
+    eps_p = eps_p_trial.copy()
+    eps_bar_p = eps_bar_p_trial.copy()
+    dgama = np.zeros(num_gp)
+    q = q_trial
+
+    # plastic step
+    if np.any(ep_flag):
+        pl = ep_flag
+        sig[pl], eps_e[pl], eps_p[pl], eps_bar_p[pl], dgama[pl], q[pl] = \
+            local_const_lin_hard_batch(
+                Phi_trial[pl], G[pl], H[pl], eps_d_trial[pl], q_trial[pl],
+                p[pl], eps_v_trial[pl], eps_bar_p[pl], eps_p[pl])
+
+    return sig, eps_e, eps_p, eps_bar_p, dgama, q, ep_flag
+
+
+def local_const_lin_hard_batch(Phi_trial, G, H, eps_d_trial, q_trial,
+                               p, eps_v_trial, eps_bar_p, eps_p):
+    """Vectorized local_const_lin_hard for many gauss points
+
+    Parameters
+    ----------
+    Phi_trial, G, H, q_trial, p, eps_v_trial, eps_bar_p : ndarray (num_gp,)
+    eps_d_trial, eps_p : ndarray shape (num_gp, 4)
+
+    Returns
+    -------
+    sig, eps_e, eps_p : ndarray shape (num_gp, 4)
+    eps_bar_p, dgama, q : ndarray shape (num_gp,)
+
+    Note
+    ----
+    Reference (sec. 7.3.4 Neto 2008)
+
+    """
+    m = np.array([1, 1, 0, 1])
+    dgama = Phi_trial / (3 * G + H)   # Eq. 7.101
+
+    # deviatoric stress trial
+    sig_d_trial = 2 * G[:, None] * eps_d_trial
+
+    # update deviatoric stress, not trial anymore
+    sig_d = (1 - dgama * 3 * G / q_trial)[:, None] * sig_d_trial
+
+    sig_d_norm = np.sqrt(sig_d[:, 0]**2 + sig_d[:, 1]**2 + sig_d[:, 3]**2 +
+                         2 * sig_d[:, 2]**2)
+    q = np.sqrt(3 / 2) * sig_d_norm
+
+    # update stress tensor
+    sig = sig_d + p[:, None] * m
+
+    # update elastic strain
+    eps_e = ((1 / (2 * G))[:, None] * sig_d +
+             (1 / 3) * eps_v_trial[:, None] * m)
+    # convert back to engineering strain
+    eps_e[:, 2] = 2 * eps_e[:, 2]
+
+    # update cummulative plastic strain
+    eps_bar_p = eps_bar_p + dgama
+
+    eps_p = eps_p + ((dgama * np.sqrt(3 / 2))[:, None] * sig_d /
+                     sig_d_norm[:, None])
+
+    return sig, eps_e, eps_p, eps_bar_p, dgama, q
+
+
 if __name__ == '__main__':
     pass
@@ -87,6 +87,151 @@ def consistent_tangent_mises(dgama, sig, E, nu, H, elastoplastic_flag,
     return D[:3, :3]
 
 
+def elastic_tangent_mises(E, nu, material_case):
+    """Build the elastic tangent matrix for each pair of elastic properties
+
+    Parameters
+    ----------
+    E, nu : ndarray shape (num,)
+        elastic material properties
+    material_case : str {'strain', 'stress'}
+
+    Returns
+    -------
+    D : ndarray shape (num, 3, 3)
+
+    Note
+    ----
+    Eq. 4.51 & 7.107 Neto 2008, same as the elastic branch of
+    consistent_tangent_mises
+
+    """
+    fourth_sym_I = np.array([
+        [1, 0, 0],
+        [0, 1, 0],
+        [0, 0, .5]])
+    ii = np.outer([1, 1, 0], [1, 1, 0])
+    dev_sym_proj = fourth_sym_I - (1 / 3) * ii
+
+    E = np.asarray(E, dtype=float)[:, None, None]
+    nu = np.asarray(nu, dtype=float)[:, None, None]
+    G = E / (2 * (1 + nu))      # shear modulus
+    K = E / (3 * (1 - 2 * nu))  # bulk modulus
+    if material_case == 'strain':
+        return 2 * G * dev_sym_proj + K * ii
+    elif material_case == 'stress':
+        return 2 * G * fourth_sym_I + (K - 2 / 3 * G) * (
+            (2 * G / (K + 4 / 3 * G)) * ii)
+    else:
+        raise Exception(f'Material case {material_case} not implemented!')
+
+
+def elastic_regions(E, nu, material_case):
+    """Elastic tangent matrix of each material region
+
+    Parameters
+    ----------
+    E, nu : ndarray shape (num_gp,)
+        elastic material properties at each gauss point
+    material_case : str {'strain', 'stress'}
+
+    Returns
+    -------
+    De : ndarray shape (num_regions, 3, 3)
+        elastic matrix of each distinct pair (E, nu)
+    region : ndarray shape (num_gp,)
+        region of each gauss point, its elastic matrix is De[region]
+
+    """
+    props, region = np.unique(np.stack([np.ravel(E), np.ravel(nu)], axis=1),
+                              axis=0, return_inverse=True)
+    De = elastic_tangent_mises(props[:, 0], props[:, 1], material_case)
+    return De, region.ravel()
+
+
+def consistent_tangent_mises_batch(dgama, sig, E, nu, H, elastoplastic_flag,
+                                   material_case, elastic=None):
+    """Build the consistent tangent matrix for many gauss points
+
+    Vectorized version of consistent_tangent_mises.
+
+    Parameters
+    ----------
+    dgama : ndarray shape (num_gp,)
+        incremental plastic multiplier obtained from the previous global
+        equilibrium iteration
+    sig : ndarray shape (num_gp, 4)
+        updated stress components from the state update
+    E, nu, H : float or ndarray shape (num_gp,)
+        material properties at each gauss point
+    elastoplastic_flag : ndarray shape (num_gp,) of bool
+        True for the gauss points in a plastic step
+    material_case : str {'strain', 'stress'}
+    elastic : tuple, optional
+        (De, region) of elastic_regions for all the gauss points, computed
+        from E and nu if None
+
+    Returns
+    -------
+    D : ndarray shape (num_gp, 3, 3)
+
+    Note
+    ----
+    The elastic matrix is computed once for each distinct pair (E, nu), so
+    the elastic points of a material region share the same matrix. The
+    solvers pass the regions of Model.elastic_tangent, which are computed
+    once for the model.
+
+    Reference: (sec. 7.4.2 Neto 2008)
+
+    """
+    sig = np.asarray(sig, dtype=float)
+    num_gp = len(sig)
+    dgama, E, nu, H = (np.broadcast_to(np.asarray(a, dtype=float), (num_gp,))
+                       for a in (dgama, E, nu, H))
+    ep = np.asarray(elastoplastic_flag, dtype=bool)
+
+    D = np.empty((num_gp, 3, 3))
+
+    # elastic points, one matrix for each material region
+    el = ~ep
+    if np.any(el):
+        if elastic is None:
+            De, region = elastic_regions(E[el], nu[el], material_case)
+        else:
+            De, region = elastic
+            region = region[el]
+        D[el] = De[region]
+
+    # plastic points, Eq. 7.120 Neto 2008
+    if np.any(ep):
+        fourth_sym_I = np.array([
+            [1, 0, 0],
+            [0, 1, 0],
+            [0, 0, .5]])
+        second_i = np.array([1, 1, 0])
+        dev_sym_proj = fourth_sym_I - (1 / 3) * np.outer(second_i, second_i)
+
+        G = E[ep] / (2 * (1 + nu[ep]))      # shear modulus
+        K = E[ep] / (3 * (1 - 2 * nu[ep]))  # bulk modulus
+        dg, s = dgama[ep], sig[ep]
+
+        p = (1 / 3) * (s[:, 0] + s[:, 1] + s[:, 3])     # hydrostatic stress
+        s = s - p[:, None] * np.array([1, 1, 0, 1])     # deviatoric
+        s_norm = np.sqrt(s[:, 0]**2 + s[:, 1]**2 + 2 * s[:, 2]**2 +
+                         s[:, 3]**2)
+        # (Eq. 7.100 Neto 2008)
+        q_trial = np.sqrt(3 / 2) * s_norm + 3 * G * dg
+
+        Afactor = 2 * G * (1 - 3 * G * dg / q_trial)
+        Bfactor = (6 * G**2 *
+                   (dg / q_trial - 1 / (3 * G + H[ep])) / s_norm**2)
+        D[ep] = (Afactor[:, None, None] * dev_sym_proj +
+                 Bfactor[:, None, None] * (s[:, :3, None] * s[:, None, :3]) +
+                 K[:, None, None] * np.outer(second_i, second_i))
+    return D
+
+
 if __name__ == '__main__':
     dgama, E, nu, sig, H = .001, 1e9, .3, np.array([1, 1, 1]), 1e7
     D = consistent_tangent_mises(dgama, sig, E, nu, H,
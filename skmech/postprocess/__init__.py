@@ -7,3 +7,4 @@ from .filterresults import field_at_fixed_x
 from .stressrecovery import stress_recovery
 from .stressrecovery import stress_recovery_smoothed
 from .stressrecovery import stress_recovery_dict
+from .probes import ProbeRecorder, load_probes
@@ -0,0 +1,278 @@
+"""Time history of displacements and internal variables at probes
+
+The probes are registered before the analysis, each record gathers the
+values of all the probes of a kind and variable with a single array index
+and stores them in a small buffer. The full buffer is appended to a single
+.npy file with one structured record for each increment, only the number of
+records in the header is rewritten, so each record is written once and the
+memory used does not grow with the number of increments.
+
+Example
+-------
+>>> probes = ProbeRecorder(model, 'plate_probes')
+>>> probes.add_node('displ_node3', 3)
+>>> probes.add_gauss_point('mises_ele16_gp1', 'q', 16, 0)
+>>> incremental.solver(model, probes=probes)
+>>> history = load_probes('plate_probes')
+>>> history['time'], history['displ_node3']
+
+"""
+import os
+import numpy as np
+
+# .npy format 2.0 magic string, the header length is a 4 bytes integer
+MAGIC = b'\x93NUMPY\x02\x00'
+
+
+class ProbeRecorder(object):
+    """Record the values at node, element and gauss point probes
+
+    Parameters
+    ----------
+    model : Model object
+    file_name : str
+        output file name without extension, the records are written in
+        file_name + '.npy'
+    flush_every : int, default 10
+        number of records kept in memory between writes to the file
+
+    Attributes
+    ----------
+    probes : dict
+        {name: (kind, variable, key)} with kind 'node', 'element' or
+        'gauss_point', key is the node dofs, the element tag or the
+        (eid, gp_id) tuple
+    num_records : int
+
+    Note
+    ----
+    The file is a .npy structured array with shape (num_records,) and the
+    fields 'time', 'increment' and one field for each probe: shape (2,) for
+    node displacements, (num_gp, ...) for elements and (...) for gauss
+    points, where ... are the components of the variable. It can be read
+    with load_probes or np.load while the analysis runs. A file of a
+    previous analysis with the same name is replaced in the first flush.
+
+    """
+    def __init__(self, model, file_name, flush_every=10):
+        self.model = model
+        self.file_name = file_name
+        self.flush_every = flush_every
+        self.probes = {}
+        self.num_records = 0
+        self._num_flushed = 0
+        # [(kind, variable, names, keys)], built on the first record
+        self._groups = None
+        # structured array with the records not written yet
+        self._buffer = None
+
+    def add_node(self, name, nid):
+        """Record the displacement of a node"""
+        if nid not in self.model.nodes_dof:
+            raise Exception(f'Node {nid} is not in the model')
+        self._add(name, 'node', None, self.model.get_nodes_dof([nid])[0])
+
+    def add_element(self, name, variable, eid):
+        """Record an internal variable at all the gauss points of an
+        element"""
+        self._check_element(eid)
+        self._add(name, 'element', variable, eid)
+
+    def add_gauss_point(self, name, variable, eid, gp_id):
+        """Record an internal variable at one gauss point"""
+        self._check_element(eid)
+        num_gp = self.model.geometry.dJ.shape[1]
+        if not 0 <= gp_id < num_gp:
+            raise Exception(f'Gauss point {gp_id} out of the {num_gp} gauss '
+                            'points of the elements')
+        self._add(name, 'gauss_point', variable, (eid, gp_id))
+
+    def _add(self, name, kind, variable, key):
+        if self._groups is not None:
+            raise Exception('Probes must be added before the first record')
+        if name in self.probes or name in ('time', 'increment'):
+            raise Exception(f'Probe {name} already exists')
+        self.probes[name] = (kind, variable, key)
+
+    def _check_element(self, eid):
+        if eid not in self.model.elements:
+            raise Exception(f'Element {eid} is not in the model')
+
+    def record(self, u, int_var, time, increment=None):
+        """Store the values of all the probes
+
+        Parameters
+        ----------
+        u : ndarray shape (num_dof,)
+            displacement
+        int_var : InternalVariables or dict
+            {variable: {(eid, gp_id): value}}
+        time : float
+            load factor or time
+        increment : int, optional
+            increment number, default is the number of records
+
+        """
+        if self._groups is None:
+            groups = {}
+            for name, (kind, variable, key) in self.probes.items():
+                names, keys = groups.setdefault((kind, variable), ([], []))
+                names.append(name)
+                keys.append(key)
+            self._groups = [(kind, variable, names, keys)
+                            for (kind, variable), (names, keys)
+                            in groups.items()]
+
+        values = []
+        for kind, variable, names, keys in self._groups:
+            if kind == 'node':
+                values.append((names, u[np.array(keys)]))
+            else:
+                values.append((names, self._gather(int_var[variable], kind,
+                                                   keys)))
+        if self._buffer is None:
+            fields = [('time', '<f8'), ('increment', '<i8')]
+            fields += [(name, '<f8', group.shape[1:])
+                       for names, group in values for name in names]
+            self._buffer = np.zeros(self.flush_every, dtype=fields)
+
+        n = self.num_records - self._num_flushed
+        buffer = self._buffer
+        buffer['time'][n] = time
+        buffer['increment'][n] = (self.num_records + 1 if increment is None
+                                  else increment)
+        for names, group in values:
+            for name, value in zip(names, group):
+                buffer[name][n] = value
+        self.num_records += 1
+
+        if self.num_records - self._num_flushed >= len(buffer):
+            self.flush()
+
+    def _gather(self, field, kind, keys):
+        """Values of a gauss point field at element or gauss point keys"""
+        if hasattr(field, 'array'):
+            # one index of the internal variables array
+            if kind == 'element':
+                return field.array[[field.index[eid] for eid in keys]]
+            eids, gps = zip(*keys)
+            return field.array[[field.index[eid] for eid in eids], list(gps)]
+        if kind == 'element':
+            num_gp = self.model.geometry.dJ.shape[1]
+            return np.array([[field[(eid, gp_id)] for gp_id in range(num_gp)]
+                             for eid in keys], dtype=float)
+        return np.array([field[key] for key in keys], dtype=float)
+
+    def history(self):
+        """Recorded values, the written records are read from the file
+
+        Returns
+        -------
+        dict
+            {'time': ndarray, 'increment': ndarray, probe name: ndarray}
+
+        """
+        if self._buffer is None:
+            return {'time': np.zeros(0), 'increment': np.zeros(0, dtype=int)}
+        records = self._buffer[:self.num_records - self._num_flushed]
+        if self._num_flushed > 0:
+            records = np.concatenate([np.load(self.file_name + '.npy'),
+                                      records])
+        return {name: records[name] for name in records.dtype.names}
+
+    def flush(self):
+        """Append the records since the last flush to the file
+
+        The records are written after the last complete record and then the
+        number of records in the header is updated, so the file is always
+        valid. The first flush writes a temporary file that replaces the
+        file name + '.npy'.
+
+        """
+        if self.num_records == self._num_flushed:
+            return
+        records = self._buffer[:self.num_records - self._num_flushed]
+        name = self.file_name + '.npy'
+        if self._num_flushed == 0:
+            with open(name + '.tmp', 'wb') as f:
+                f.write(npy_header(records.dtype, len(records)))
+                f.write(records.tobytes())
+            os.replace(name + '.tmp', name)
+        else:
+            header = npy_header(records.dtype, self.num_records)
+            with open(name, 'r+b') as f:
+                f.seek(len(header) + self._num_flushed * records.itemsize)
+                f.write(records.tobytes())
+                f.flush()
+                f.seek(0)
+                f.write(header)
+        self._num_flushed = self.num_records
+
+
+def npy_header(dtype, num_records):
+    """Header of a .npy file with a structured array shape (num_records,)
+
+    The number of records is padded to 20 digits, so the header has the
+    same size for any number of records and it is rewritten in place.
+
+    """
+    descr = np.lib.format.dtype_to_descr(np.dtype(dtype))
+    header = (f"{{'descr': {descr!r}, 'fortran_order': False, "
+              f"'shape': ({num_records:20d},), }}")
+    # magic string, header length and header are aligned to 64 bytes
+    size = 64 * ((len(MAGIC) + 4 + len(header) + 1 + 63) // 64)
+    header = header.ljust(size - len(MAGIC) - 4 - 1) + '\n'
+    return (MAGIC + np.array([len(header)], dtype='<u4').tobytes() +
+            header.encode('latin1'))
+
+
+def load_probes(file_name):
+    """Load the history written by a ProbeRecorder
+
+    Parameters
+    ----------
+    file_name : str
+        file name of the recorder, without extension
+
+    Returns
+    -------
+    dict
+        {'time': ndarray, 'increment': ndarray, probe name: ndarray} with
+        the written records
+
+    """
+    records = np.load(file_name + '.npy')
+    return {name: records[name] for name in records.dtype.names}
+
+
+def output_probes(model, element_out=None, node_out=None):
+    """Probes of the element_out and node_out options of the solvers
+
+    Parameters
+    ----------
+    model : Model object
+    element_out : int, optional
+        element with the von Mises stress ('mises_ele{eid}'), accumulated
+        plastic strain ('peeq_ele{eid}'), stress ('sig_ele{eid}') and strain
+        ('eps_ele{eid}') recorded at its gauss points
+    node_out : int, optional
+        node with the displacement recorded ('displ_node{nid}')
+
+    Returns
+    -------
+    ProbeRecorder or None
+        recorder writing model.mesh.name + '_probes.npy', None if there
+        are no probes
+
+    """
+    if element_out is None and node_out is None:
+        return None
+    probes = ProbeRecorder(model, f'{model.mesh.name}_probes')
+    if node_out is not None:
+        probes.add_node(f'displ_node{node_out}', node_out)
+    if element_out is not None:
+        for name, variable in [('mises', 'q'), ('peeq', 'eps_bar_p'),
+                               ('sig', 'sig'), ('eps', 'eps')]:
+            probes.add_element(f'{name}_ele{element_out}', variable,
+                               element_out)
+    return probes
@@ -8,6 +8,7 @@ TODO: extrapolate nodes from gp to nodes, append the stress to a dictionary
 """
 import numpy as np
 from ..constructor import constructor
+from ..elements.quad4 import constitutive_matrix, batch_strain
 
 
 def recovery(model, U, EPS0, t=1):
@@ -241,6 +242,11 @@ def stress_recovery(model, t=1):
             [[gp1_x, gp2_y, s11, s22, s13], ...]
 
     """
+    if model.xfem is None:
+        geo = model.geometry
+        sig = gauss_point_stress(model, model.dof_displacement)
+        return np.concatenate([geo.xy, sig], axis=-1).reshape(-1, 5)
+
     sig = []
     for eid, [etype, *edata] in model.elements.items():
         element = constructor(eid, etype, model)
@@ -291,6 +297,13 @@ def stress_recovery_dict(model, t=1):
     dict
         {(eid, gp_id): [sx, sy, sxy]}
     """
+    if model.xfem is None:
+        geo = model.geometry
+        sig_gp = gauss_point_stress(model, model.dof_displacement)
+        return {(eid, gp_id): s
+                for eid, sig_ele in zip(geo.eids, sig_gp)
+                for gp_id, s in enumerate(sig_ele)}
+
     sig = {}
     for eid, [etype, *edata] in model.elements.items():
         element = constructor(eid, etype, model)
@@ -348,6 +361,13 @@ def stress_recovery_smoothed(model, dof_displ=None, t=1):
         {node id: [sx, sy, txy]} smoothed stresses
 
     """
+    if model.xfem is None:
+        if dof_displ is None:
+            # get them from model, not optimal but ok
+            dof_displ = model.dof_displacement
+        sig_node = smooth_fields(model, gauss_point_stress(model, dof_displ))
+        return dict(zip(model.adjacency.nodes.tolist(), sig_node))
+
     sig = {}
     for eid, [etype, *edata] in model.elements.items():
         element = constructor(eid, etype, model)
@@ -458,6 +478,74 @@ def stress_recovery_smoothed(model, dof_displ=None, t=1):
     return sig
 
 
+def gauss_point_stress(model, dof_displ, t=1):
+    """Compute the stress at every gauss point with the geometry cache
+
+    Parameters
+    ----------
+    model : Model object
+        model without xfem
+    dof_displ : ndarray shape (num_dof,)
+        displacement at the dofs
+
+    Returns
+    -------
+    ndarray shape (num_ele, num_gp, 3)
+        [sx, sy, sxy] at each element gauss point, elements in the
+        model.elements order
+
+    """
+    geo = model.geometry
+    C = constitutive_matrix(geo.material(model.material.E),
+                            geo.material(model.material.nu),
+                            model.material.case)
+    # TODO: add initial strain due thermal changes
+    eps = batch_strain(geo.B, dof_displ[geo.dof])
+    return np.einsum('egij,egj->egi', C, eps)
+
+
+def prepare_smoothing(model):
+    """Build the operator used by smooth_fields
+
+    The operator is cached in the model on first use, building it before
+    the analysis avoids building it concurrently in the output thread.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        model.gp_to_node
+
+    """
+    return model.gp_to_node
+
+
+def smooth_fields(model, fields):
+    """Extrapolate gauss point fields to the nodes and average them
+
+    Parameters
+    ----------
+    model : Model object
+    fields : ndarray shape (num_ele, num_gp, ...)
+        any number of fields stacked in the last axes, elements in the
+        model.elements order
+
+    Returns
+    -------
+    ndarray shape (num_nodes, ...)
+        smoothed fields, nodes in the model.adjacency.nodes order
+
+    Note
+    ----
+    A single product with the sparse operator model.gp_to_node, see
+    skmech.geometry.Geometry.gp_to_node.
+
+    """
+    fields = np.asarray(fields, dtype=float)
+    num_ele, num_gp = fields.shape[:2]
+    field_node = model.gp_to_node @ fields.reshape(num_ele * num_gp, -1)
+    return field_node.reshape((-1,) + fields.shape[2:])
+
+
 def extrapolate_gp_smoothed(model, field, t=1):
     """Extrapolate field from gp to nodes and smooth it by averaging
 
@@ -469,6 +557,8 @@ def extrapolate_gp_smoothed(model, field, t=1):
     ----------
     model : Model object
         object with model attributes
+    field : dict or GaussPointField
+        {(eid, gp_id): value} scalar field at the gauss points
     t : float, default 1
         time
 
@@ -483,75 +573,38 @@ def extrapolate_gp_smoothed(model, field, t=1):
     field value at the four corners
 
     """
-    field_dic = {}
-    for eid, [etype, *edata] in model.elements.items():
-        element = constructor(eid, etype, model)
-
-        # to store 4 values at gauss points
-        f_gp = []
-
-        # to form a square from which the interpolation to nodes will occur
-        # for 2x2 gp -> ges = 1 / sqrt(3)
-        ges = np.max(element.gauss.points)  # gauss element size
-        # points to extrapolate in the xez' coordinate
-        point_to_extrapolate = np.array([[-1 / ges, -1 / ges],
-                                         [1 / ges, -1 / ges],
-                                         [1 / ges, 1 / ges],
-                                         [-1 / ges, 1 / ges]])
-        # gauss points to form a square in xez coordinates
-        gauss_points = np.array([[-ges, -ges],
-                                 [ges, -ges],
-                                 [ges, ges],
-                                 [-ges, ges]])
-        Q = matrix_gp2node(pte=point_to_extrapolate)
+    field_node = smooth_fields(model, gauss_point_array(model, field))
+    return dict(zip(model.adjacency.nodes.tolist(), field_node))
 
-        # obtain stresses at GP
-        # loop over quadrature points
-        for gp_id, gp in enumerate(gauss_points):
 
-            # append the GP stress values into a list len(4)
-            f_gp.append(field[(eid, gp_id)])
+def gauss_point_array(model, field):
+    """Convert a gauss point field to an array in the geometry order
 
-        # extrapolate from GP to nodes
-        # Q is shape (4, 4) and f_gp is (4,) resulting in (4,)
-        # one for each element node
-        f_node = Q @ f_gp
-
-        # create an empty list for the nodal stresses to collect from different
-        # elements
-        # if the node is not already in the dictionary, create an empty list
-        if field_dic.get(element.conn[0]) is None:
-            field_dic[element.conn[0]] = []
-        if field_dic.get(element.conn[1]) is None:
-            field_dic[element.conn[1]] = []
-        if field_dic.get(element.conn[2]) is None:
-            field_dic[element.conn[2]] = []
-        if field_dic.get(element.conn[3]) is None:
-            field_dic[element.conn[3]] = []
-
-        # append to each node list the field value obtained from this element
-        field_dic[element.conn[0]].append(f_node[0])
-        field_dic[element.conn[1]].append(f_node[1])
-        field_dic[element.conn[2]].append(f_node[2])
-        field_dic[element.conn[3]].append(f_node[3])
+    Parameters
+    ----------
+    model : Model object
+    field : dict, GaussPointField or ndarray
+        {(eid, gp_id): value}, values can be scalars or arrays, arrays are
+        returned as they are
 
-    # smooth the stresses
-    # loop over nodes
-    for node, fld in field_dic.items():
-        # fld is a list of floats
-        # each float is an extrapolation from an element that contain the node
-        # len(fld) means number of elements sharing this nodeq
-        if len(fld) > 1:
-            # TODO: Finish this later DONE
-            # sum contribution of each element and average that out
-            field_average = sum(fld) / len(fld)
-            # change the list for a single float
-            field_dic[node] = field_average
-        else:
-            # change the list for the unique value in it
-            field_dic[node] = fld[0]
+    Returns
+    -------
+    ndarray shape (num_ele, num_gp, ...)
+        only the corner gauss points are read from dictionaries, the others
+        are zero since they are not used in the extrapolation
 
-    return field_dic
+    """
+    if isinstance(field, np.ndarray):
+        return field
+    if hasattr(field, 'array'):
+        # internal variable arrays are already in the geometry order
+        return field.array
+    geo = model.geometry
+    corner = np.array([[field[(eid, gp_id)] for gp_id in geo.corner_gp]
+                       for eid in geo.eids], dtype=float)
+    values = np.zeros(geo.dJ.shape + corner.shape[2:])
+    values[:, geo.corner_gp] = corner
+    return values
 
 
 def matrix_gp2node(pte):
@@ -0,0 +1,157 @@
+"""Write the output of the increments in the background
+
+The solver puts snapshots of the converged state in a bounded queue and a
+thread or a process runs the output function (smoothing and file writing)
+for each one, so the next increment starts without waiting for the output.
+
+"""
+import queue
+import threading
+import multiprocessing
+from .saveoutput import save_output
+
+
+class BackgroundWriter(object):
+    """Call an output function in a background thread or process
+
+    Parameters
+    ----------
+    output : function, default save_output
+        called with the arguments of each submit, in order
+    max_queue : int, default 2
+        number of snapshots waiting to be written, submit blocks when the
+        queue is full, which bounds the memory used by the snapshots
+    process : bool, default False
+        call the output function in a forked process instead of a thread
+
+    Note
+    ----
+    The arguments must not be modified after submit, the solver submits
+    copies of the displacement and internal variables. An exception in the
+    output function stops the writing of the next snapshots and it is raised
+    again by the next submit or by close. When the writer is used as a
+    context manager and the block raises, the snapshots are still written
+    and an output error is chained to the error of the block.
+
+    A thread shares the model without copies, but only the parts of the
+    output that release the GIL run alongside the solver: the sparse
+    smoothing product and the file writes. The text formatting of
+    save_output is Python code that holds the GIL, so with a thread it
+    takes turns with the Newton iterations instead of overlapping them.
+
+    A process runs all the output alongside the solver. It is forked at the
+    first submit and inherits the model and the output function, then only
+    the other arguments are sent to it, so the first argument of every
+    submit must be the same model. It requires the fork start method (Linux
+    and macOS) and the state of the output function, e.g. the time steps of
+    a VTKWriter, is updated in the process, not in the caller.
+
+    Example
+    -------
+    >>> with BackgroundWriter() as writer:
+    ...     writer.submit(model, u.copy(), int_var.copy(), increment, start,
+    ...                   lmbda)
+
+    """
+    def __init__(self, output=save_output, max_queue=2, process=False):
+        self.output = output
+        self.max_queue = max_queue
+        self.process = process
+        self._error = None
+        if process:
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                raise Exception('Background output in a process requires '
+                                'the fork start method')
+            self._context = multiprocessing.get_context('fork')
+            self._queue = self._context.Queue(maxsize=max_queue)
+            # errors are written to the pipe at once, see _raise_error
+            self._errors = self._context.SimpleQueue()
+            # forked at the first submit, see submit
+            self._model = None
+            self._worker = None
+        else:
+            self._queue = queue.Queue(maxsize=max_queue)
+            self._worker = threading.Thread(target=self._run_thread,
+                                            daemon=True)
+            self._worker.start()
+        self._closed = False
+
+    def _run_thread(self):
+        while True:
+            args = self._queue.get()
+            if args is None:
+                break
+            # after an error the remaining snapshots are discarded
+            if self._error is None:
+                try:
+                    self.output(*args)
+                except Exception as error:
+                    self._error = error
+
+    def _run_process(self):
+        failed = False
+        while True:
+            args = self._queue.get()
+            if args is None:
+                break
+            # after an error the remaining snapshots are discarded
+            if not failed:
+                try:
+                    self.output(self._model, *args)
+                except Exception as error:
+                    failed = True
+                    try:
+                        self._errors.put(error)
+                    except Exception:
+                        # the error can not be pickled
+                        self._errors.put(Exception(repr(error)))
+
+    def submit(self, *args):
+        """Queue the arguments of one call of the output function"""
+        self._raise_error()
+        if self._closed:
+            raise Exception('Background writer is closed')
+        if self.process:
+            if self._worker is None:
+                self._model = args[0]
+                self._worker = self._context.Process(
+                    target=self._run_process, daemon=True)
+                self._worker.start()
+            elif args[0] is not self._model:
+                raise Exception('Background writer process submits must '
+                                'have the same model')
+            args = args[1:]
+        self._queue.put(args)
+
+    def close(self):
+        """Wait until all the snapshots are written and stop the worker"""
+        if not self._closed:
+            self._closed = True
+            if self._worker is not None:
+                self._queue.put(None)
+                self._worker.join()
+            if self.process:
+                self._queue.close()
+                self._queue.join_thread()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.process and self._error is None and not self._errors.empty():
+            self._error = self._errors.get()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc is None:
+            self.close()
+            return
+        # the error of the caller is raised, an output error is its context
+        try:
+            self.close()
+        except Exception as error:
+            error.__context__ = exc.__context__
+            exc.__context__ = error
@@ -1,17 +1,27 @@
 """Solves the incremental problem"""
 import numpy as np
 import time
+from contextlib import ExitStack
 from ..dirichlet import imposed_displacement
 from ..neumann import neumann
 from .localization import localization
 from ..postprocess.saveoutput import save_output
-from .partitioned import solve_partitioned
+from ..postprocess.probes import output_probes
+from ..postprocess.writer import BackgroundWriter
+from ..postprocess.stressrecovery import prepare_smoothing
+from .partitioned import solve_partitioned, Partition
+from .internalvariables import InternalVariables
+from .strategy import IterationStrategy
+from .linear import get_linear_solver
 
 
 def solver(model, time_step=.1, min_time_step=1e-3,
            max_num_iter=15, tol=1e-6,
            max_num_local_iter=100,
-           element_out=None, node_out=None):
+           element_out=None, node_out=None,
+           linear_solver='direct', iteration='newton',
+           refactor_every=None, probes=None, background_output=False,
+           output=None):
     """Performes the incremental solution of linearized virtual work equation
 
     Parameters
@@ -23,6 +33,41 @@ def solver(model, time_step=.1, min_time_step=1e-3,
     min_time_step : float (1e-3)
         minimum time step allowed when the step is divided when the number of
         iterations is greater than max_num_iteration
+    linear_solver : str or LinearSolver object, default 'direct'
+        method used to solve the linearized system for the free dofs,
+        {'direct', 'cg', 'minres'} or a LinearSolver with preconditioner and
+        tolerance, see solvers.linear
+    iteration : {'newton', 'modified', 'initial', 'bfgs'}, default 'newton'
+        global iteration strategy, full Newton-Raphson, modified Newton,
+        initial stiffness or BFGS quasi-Newton, see solvers.strategy
+    refactor_every : int, optional
+        number of iterations between factorizations of the modified Newton
+        method, if None the tangent is factorized once per increment
+    element_out : int, optional
+        element with the internal variables recorded at each increment
+    node_out : int, optional
+        node with the displacement recorded at each increment
+    probes : ProbeRecorder object, optional
+        records the probes after each converged increment, if None and
+        element_out or node_out are given they are recorded in
+        model.mesh.name + '_probes.npy', see postprocess.probes
+    background_output : bool or {'thread', 'process'}, default False
+        write the output in a background thread (True or 'thread') or in a
+        forked process ('process') while the next increments are solved,
+        the output is complete when the solver returns, see
+        postprocess.writer for which one overlaps more of the output
+    output : function, optional
+        called as output(model, u, int_var, increment, start, lmbda) after
+        each converged increment, default is save_output (gmsh .msh file),
+        e.g. a meshplotlib.vtkio.vtkio.VTKWriter for .vtu files
+
+    Returns
+    -------
+    dict
+        {'iterations': total number of global iterations,
+         'factorizations': number of tangent factorizations,
+         'increments': number of iterations of each converged increment,
+         'linear_iterations': iterations of the iterative linear solver}
 
     Note
     ----
@@ -41,95 +86,146 @@ def solver(model, time_step=.1, min_time_step=1e-3,
     # initial displacement for t_0 (n=0)
     u = np.zeros(num_dof)
 
-    eps_e_n, eps_p_n, eps_bar_p_n, dgamma_n = initial_values(model)
+    # converged internal variables (n) and storage for the iterations
+    int_var_n = initial_values(model)
+    int_var = initial_values(model)
 
     # external load vector
     # Only traction for now
     f_ext_bar = external_load_vector(model)
-
-    increment, lmbda = 0, 0
-    # Loop over load increments
-    while lmbda <= 1 + tol:
-        print('--------------------------------------')
-        print(f'Load factor {lmbda:.4f} increment {increment}')
-        print('--------------------------------------')
-
-        # break after all imposed displacement load steps
-        if model.imposed_displ is not None:
-            if increment >= len(model.imposed_displ):
-                break
-
-        # initial displacement increment for each load step
-        Delta_u = np.zeros(num_dof)
-        f_ext = lmbda * f_ext_bar
-        # Step (2), (3)
-        f_int, K_T, int_var = localization(model, Delta_u,
-                                           eps_e_n,
-                                           eps_p_n,
-                                           eps_bar_p_n,
-                                           dgamma_n,
-                                           max_num_local_iter)
-        # Begin global Newton procedures
-        for k in range(0, max_num_iter + 1):
-            # if more than 6 iterations, add half of the interval
-            if k >= max_num_iter:
-                lmbda = lmbda - time_step + time_step / 2
-                if time_step < min_time_step:
-                    time_step = min_time_step
+    # traction functions are evaluated again for each load factor
+    proportional = (model.traction is None or
+                    not any(callable(t) for t in model.traction.values()))
+
+    if probes is None:
+        probes = output_probes(model, element_out, node_out)
+    if output is None:
+        output = save_output
+
+    # when the tangent is assembled and factorized
+    linear_solver = get_linear_solver(linear_solver)
+    strategy = IterationStrategy(iteration, linear_solver, refactor_every)
+
+    # the output writer is closed, its queued snapshots are written and the
+    # probes are flushed even if the analysis fails
+    with ExitStack() as stack:
+        writer = None
+        if background_output:
+            prepare_smoothing(model)
+            writer = stack.enter_context(BackgroundWriter(
+                output, process=background_output == 'process'))
+        if probes is not None:
+            stack.callback(probes.flush)
+
+        increment, lmbda = 0, 0
+        partition = None
+        # Loop over load increments
+        while lmbda <= 1 + tol:
+            print('--------------------------------------')
+            print(f'Load factor {lmbda:.4f} increment {increment}')
+            print('--------------------------------------')
+
+            # break after all imposed displacement load steps
+            if model.imposed_displ is not None:
+                if increment >= len(model.imposed_displ):
+                    break
+
+            # free and restrained dofs are fixed during the increment, the
+            # previous partition and its blocks maps are kept if they are equal
+            new_partition = Partition(model, increment)
+            if partition is None or not new_partition.same_dofs(partition):
+                partition = new_partition
+            strategy.new_increment()
+
+            # initial displacement increment for each load step
+            Delta_u = np.zeros(num_dof)
+            if proportional:
+                f_ext = lmbda * f_ext_bar
+            else:
+                f_ext = external_load_vector(model, lmbda)
+            # Step (2), (3)
+            f_int, K_T, int_var = localization(model, Delta_u, int_var_n,
+                                               max_num_local_iter, int_var,
+                                               strategy.tangent_required(0))
+            # Begin global Newton procedures
+            for k in range(0, max_num_iter + 1):
+                # if more than 6 iterations, add half of the interval
+                if k >= max_num_iter:
+                    lmbda = lmbda - time_step + time_step / 2
+                    if time_step < min_time_step:
+                        time_step = min_time_step
+                    else:
+                        time_step = time_step / 2
+                    # break out of Newton loop
+                    break
+
+                # Step (4) Assemble global and solve for correction
+                K, solve_ff = strategy.operator(K_T, partition, k)
+                newton_correction, f_ext = solve_partitioned(
+                    model, K, f_int, f_ext, increment, k,
+                    partition, linear_solver, solve_ff)
+                # Step (5) Update solutions
+                Delta_u += newton_correction
+                u += newton_correction
+                # Step (6) (7) (8)
+                # build internal load vector and solve local constitutive
+                # equation
+                f_int, K_T, int_var = localization(
+                    model, Delta_u, int_var_n, max_num_local_iter, int_var,
+                    strategy.tangent_required(k + 1))
+                # new residual
+                r_updt = f_int - f_ext
+                strategy.update(newton_correction[partition.f],
+                                r_updt[partition.f])
+                # compute residual norm to check equilibrium
+                r_norm = np.linalg.norm(r_updt)
+
+                print(f'Iteration {k + 1} residual norm {r_norm:.1e}')
+
+                if r_norm <= tol:
+                    # solution converged +1 because it started in 0
+                    print(f'Converged with {k + 1} iterations '
+                          f'residual norm {r_norm:.1e}')
+
+                    strategy.converged(k + 1)
+
+                    # add to time step
+                    lmbda = lmbda + time_step
+                    increment += 1
+
+                    int_var_n, int_var = update_int_var(int_var, int_var_n)
+                    if writer is not None:
+                        # the arrays are reused in the next increment
+                        writer.submit(model, u.copy(), int_var_n.copy(),
+                                      increment, start, lmbda)
+                    else:
+                        output(model, u, int_var_n, increment, start, lmbda)
+                    if probes is not None:
+                        probes.record(u, int_var_n, lmbda, increment)
+                    break
                 else:
-                    time_step = time_step / 2
-                # break out of Newton loop
-                break
-
-            # Step (4) Assemble global and solve for correction
-            newton_correction, f_ext = solve_partitioned(
-                model, K_T, f_int, f_ext, increment, k)
-            # Step (5) Update solutions
-            Delta_u += newton_correction
-            u += newton_correction
-            # Step (6) (7) (8)
-            # build internal load vector and solve local constitutive equation
-            f_int, K_T, int_var = localization(model, Delta_u,
-                                               eps_e_n,
-                                               eps_p_n,
-                                               eps_bar_p_n,
-                                               dgamma_n,
-                                               max_num_local_iter)
-            # new residual
-            r_updt = f_int - f_ext
-            # compute residual norm to check equilibrium
-            r_norm = np.linalg.norm(r_updt)
-
-            print(f'Iteration {k + 1} residual norm {r_norm:.1e}')
-
-            if r_norm <= tol:
-                # solution converged +1 because it started in 0
-                print(f'Converged with {k + 1} iterations '
-                      f'residual norm {r_norm:.1e}')
-
-                # add to time step
-                lmbda = lmbda + time_step
-                increment += 1
-
-                eps_e_n, eps_p_n, eps_bar_p_n, dgamma_n = update_int_var(
-                    int_var)
-                save_output(model, u, int_var, increment, start, lmbda,
-                            element_out, node_out)
-                break
+                    # did't converge, continue to next global iteration
+                    continue
             else:
-                # did't converge, continue to next global iteration
-                continue
-        else:
-            raise Exception(f'Solution did not converge at time step '
-                            f'{increment + 1} after {k} iterations')
+                raise Exception(f'Solution did not converge at time step '
+                                f'{increment + 1} after {k} iterations')
     end = time.time()
-    print(f'Solution finished in {end - start:.3f}s')
-    return None
+    stats = strategy.stats()
+    print(f'Solution finished in {end - start:.3f}s with '
+          f'{stats["iterations"]} iterations and '
+          f'{stats["factorizations"]} factorizations')
+    return stats
 
 
-def external_load_vector(model):
+def external_load_vector(model, lmbda=1):
     """Assemble external load vector
 
+    Parameters
+    ----------
+    model : Model object
+    lmbda : float, default 1
+        load factor, see neumann
+
     Note
     ----
     Reference Eq. 4.68 (Neto 2008)
@@ -137,12 +233,17 @@ def external_load_vector(model):
     """
     # TODO: add body force later
     # only traction vector for now
-    Pt = neumann(model)
+    Pt = neumann(model, lmbda)
     return Pt
 
 
 def initial_values(model):
-    """Initialize internal variables dic
+    """Initialize internal variables with zeros
+
+    Returns
+    -------
+    InternalVariables object
+        arrays with shape (num_ele, num_gp, ...) for each variable
 
     Note
     ----
@@ -151,44 +252,20 @@ def initial_values(model):
     and platic parts are not, See (p. 761 Neto 2008)
 
     """
-    # initial elastic strain for each element gauss point
-    # TODO: fixed for 4 gauss point for now
-    # TODO: maybe put that in the element class
-    # TODO: Question about initial elastic strain
-    # initialize cummulatice plastic strain for each element gauss point
-    # num_quad_points is a dictionary with {eid, num_quad_points}
-    # num_quad_poins for each dimension, multiply by 2 for plane problems
-    eps_e_n = {(eid, gp): np.zeros(4) for eid in model.elements.keys()
-               for gp in range(model.num_quad_points[eid] * 2)}
-    eps_p_n = {(eid, gp): np.zeros(4) for eid in model.elements.keys()
-               for gp in range(model.num_quad_points[eid] * 2)}
-    eps_bar_p_n = {(eid, gp): 0 for eid in model.elements.keys()
-                   for gp in range(model.num_quad_points[eid] * 2)}
-    # initialize dict to store incremental plastic multiplier
-    # used to compute the consistent tangent matrix
-    dgamma_n = {(eid, gp): 0 for eid in model.elements.keys()
-                for gp in range(model.num_quad_points[eid] * 2)}
-    # initialize displacement to compute internal force vector
-    # at firt iteration of each step
-    # sig_n = {(eid, gp): np.zeros(3) for eid in model.elements.keys()
-    # for gp in range(model.num_quad_points[eid] * 2)}
-    return eps_e_n, eps_p_n, eps_bar_p_n, dgamma_n
-
-
-def update_int_var(int_var):
-    """Update internal variables with iteration values"""
-    # TODO: update interal variables converged DONE
-    # update elastic strain for this element for this gp
-    eps_e_n = int_var['eps_e']
-    # update plastic strain
-    eps_p_n = int_var['eps_p']
-    # update cummulative plastic strain
-    eps_bar_p_n = int_var['eps_bar_p']
-    # update incremental plastic multiplier
-    dgamma_n = int_var['dgamma']
-    # update stress, not required
-    # sig_n = int_var['sig']
-    return eps_e_n, eps_p_n, eps_bar_p_n, dgamma_n
+    return InternalVariables(model)
+
+
+def update_int_var(int_var, int_var_n):
+    """Update internal variables with iteration values
+
+    Returns
+    -------
+    int_var_n, int_var : InternalVariables object
+        the converged values become the step (n) values and the old step
+        storage is reused in the next iterations, so nothing is copied
+
+    """
+    return int_var, int_var_n
 
 
 if __name__ == '__main__':
@@ -0,0 +1,110 @@
+"""Internal state variables stored at the gauss points
+
+Each variable is a preallocated array with shape (num_ele, num_gp, ...) where
+the element axis follows the model geometry cache order. Dict-style access
+with (eid, gp_id) keys is kept for the post processing functions.
+
+"""
+import copy
+import numpy as np
+from collections.abc import Mapping
+
+# name and number of components of each internal variable
+VARIABLES = {'eps_e': 4, 'eps_p': 4, 'eps_bar_p': 1, 'dgamma': 1,
+             'sig': 4, 'q': 1}
+
+
+class GaussPointField(Mapping):
+    """Gauss point array with read and write access by (eid, gp_id)
+
+    Parameters
+    ----------
+    array : ndarray shape (num_ele, num_gp, ...)
+        field values, not copied
+    index : dict
+        {eid: position in the array first axis}
+
+    """
+    def __init__(self, array, index):
+        self.array = array
+        self.index = index
+
+    def __getitem__(self, key):
+        eid, gp_id = key
+        try:
+            return self.array[self.index[eid], gp_id]
+        except (KeyError, IndexError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        eid, gp_id = key
+        self.array[self.index[eid], gp_id] = value
+
+    def __iter__(self):
+        num_gp = self.array.shape[1]
+        return ((eid, gp_id) for eid in self.index for gp_id in range(num_gp))
+
+    def __len__(self):
+        return self.array.shape[0] * self.array.shape[1]
+
+
+class InternalVariables(object):
+    """Internal variables of all elements gauss points
+
+    Parameters
+    ----------
+    model : Model object
+        the elements and number of gauss points are read from the model
+        geometry cache
+
+    Attributes
+    ----------
+    eps_e, eps_p, sig : ndarray shape (num_ele, num_gp, 4)
+        elastic strain, plastic strain and stress, with the 33 component
+    eps_bar_p, dgamma, q : ndarray shape (num_ele, num_gp)
+        accumulated plastic strain, incremental plastic multiplier and von
+        Mises effective stress
+
+    Example
+    -------
+    The variables can be accessed as dictionaries with (eid, gp_id) keys
+
+    >>> int_var = InternalVariables(model)
+    >>> int_var['sig'][(eid, 0)]
+    array([0., 0., 0., 0.])
+
+    Note
+    ----
+    The total strain 'eps' = eps_e + eps_p is computed on access.
+
+    """
+    def __init__(self, model):
+        geo = model.geometry
+        self.index = geo.index
+        shape = geo.dJ.shape
+        for name, num_comp in VARIABLES.items():
+            if num_comp == 1:
+                setattr(self, name, np.zeros(shape))
+            else:
+                setattr(self, name, np.zeros(shape + (num_comp,)))
+
+    def __getitem__(self, name):
+        if name == 'eps':
+            return GaussPointField(self.eps_e + self.eps_p, self.index)
+        elif name in VARIABLES:
+            return GaussPointField(getattr(self, name), self.index)
+        else:
+            raise KeyError(name)
+
+    def __contains__(self, name):
+        return name == 'eps' or name in VARIABLES
+
+    def keys(self):
+        return list(VARIABLES) + ['eps']
+
+    def copy(self):
+        """Snapshot of the internal variables with copies of the arrays"""
+        new = copy.copy(self)
+        for name in VARIABLES:
+            setattr(new, name, getattr(self, name).copy())
+        return new
@@ -0,0 +1,221 @@
+"""Linear solvers for the global system of equations
+
+The methods available are
+
+direct
+    sparse LU factorization (SuperLU)
+cg
+    conjugate gradient, requires A symmetric positive definite
+minres
+    minimum residual, requires A symmetric but not definite, e.g. xfem
+    models where the enriched stiffness can be close to singular
+
+The iterative methods accept the preconditioners 'jacobi', 'ilu' (incomplete
+LU) and 'amg' (smoothed aggregation algebraic multigrid, requires pyamg).
+
+"""
+from scipy import sparse
+from scipy import linalg
+from scipy.sparse import linalg as spla
+
+METHODS = ('direct', 'cg', 'minres')
+PRECONDITIONERS = (None, 'jacobi', 'ilu', 'amg')
+
+
+class LinearSolver(object):
+    """Solver of the linear system A x = b with iteration counts
+
+    Parameters
+    ----------
+    method : {'direct', 'cg', 'minres'}, default 'direct'
+    preconditioner : {'jacobi', 'ilu', 'amg', None}, default 'jacobi'
+        preconditioner for the iterative methods, ignored by 'direct'. The
+        'ilu' preconditioner is not symmetric and should not be used with
+        'minres'.
+    tol : float, default 1e-10
+        relative residual tolerance for the iterative methods
+    maxiter : int, optional
+        maximum number of iterations for the iterative methods
+
+    Attributes
+    ----------
+    num_solves : int
+        number of systems solved
+    num_iterations : int
+        total number of iterations of the iterative method
+    last_iterations : int
+        iterations of the last solve, 0 for the direct method
+
+    Note
+    ----
+    Dense matrices are always solved with a dense LU factorization.
+
+    """
+    def __init__(self, method='direct', preconditioner='jacobi', tol=1e-10,
+                 maxiter=None):
+        if method not in METHODS:
+            raise Exception(f'Linear solver {method} not implemented!')
+        if preconditioner not in PRECONDITIONERS:
+            raise Exception(f'Preconditioner {preconditioner} not '
+                            f'implemented!')
+        self.method = method
+        self.preconditioner = preconditioner
+        self.tol = tol
+        self.maxiter = maxiter
+        self.num_solves = 0
+        self.num_iterations = 0
+        self.last_iterations = 0
+
+    def solve(self, A, b):
+        """Solve the linear system A x = b
+
+        Parameters
+        ----------
+        A : ndarray or scipy.sparse matrix shape (n, n)
+        b : ndarray shape (n,)
+
+        Returns
+        -------
+        x : ndarray shape (n,)
+
+        """
+        return self.factorized(A)(b)
+
+    def factorized(self, A):
+        """Prepare A once to solve many systems with different right hand sides
+
+        With the direct method the LU factorization of A is computed and
+        stored, the iterative methods build the preconditioner once.
+
+        Parameters
+        ----------
+        A : ndarray or scipy.sparse matrix shape (n, n)
+
+        Returns
+        -------
+        function
+            f(b) that returns the solution x of A x = b
+
+        """
+        if not sparse.issparse(A):
+            lu = linalg.lu_factor(A)
+            return self._counted(lambda b: linalg.lu_solve(lu, b))
+        elif self.method == 'direct':
+            return self._counted(spla.splu(A.tocsc()).solve)
+
+        A = A.tocsr()
+        M = self._preconditioner(A)
+
+        def solve_iterative(b):
+            iterations = [0]
+
+            def count(xk):
+                iterations[0] += 1
+
+            if self.method == 'cg':
+                x, info = spla.cg(A, b, rtol=self.tol, atol=0,
+                                  maxiter=self.maxiter, M=M, callback=count)
+            else:
+                x, info = spla.minres(A, b, rtol=self.tol,
+                                      maxiter=self.maxiter, M=M,
+                                      callback=count)
+            self.last_iterations = iterations[0]
+            self.num_iterations += iterations[0]
+            if info > 0:
+                raise Exception(f'Linear solver {self.method} did not '
+                                f'converge after {info} iterations')
+            elif info < 0:
+                raise Exception(f'Linear solver {self.method} failed with '
+                                f'illegal input or breakdown')
+            return x
+
+        return self._counted(solve_iterative)
+
+    def _counted(self, solve):
+        """Wrap solve to count the number of systems solved"""
+        def counted_solve(b):
+            self.num_solves += 1
+            self.last_iterations = 0
+            return solve(b)
+        return counted_solve
+
+    def _preconditioner(self, A):
+        """Build the preconditioner operator for the sparse matrix A"""
+        if self.preconditioner is None:
+            return None
+        elif self.preconditioner == 'jacobi':
+            diagonal = A.diagonal()
+            diagonal[diagonal == 0] = 1
+            return sparse.diags(1 / diagonal)
+        elif self.preconditioner == 'ilu':
+            ilu = spla.spilu(A.tocsc())
+            return spla.LinearOperator(A.shape, ilu.solve)
+        elif self.preconditioner == 'amg':
+            try:
+                import pyamg
+            except ImportError:
+                raise Exception('The amg preconditioner requires pyamg')
+            return pyamg.smoothed_aggregation_solver(A).aspreconditioner()
+
+
+def get_linear_solver(linear_solver):
+    """Get a LinearSolver object
+
+    Parameters
+    ----------
+    linear_solver : str or LinearSolver object
+        method name, see LinearSolver, or a configured solver object which
+        is returned unchanged
+
+    Returns
+    -------
+    LinearSolver object
+
+    """
+    if isinstance(linear_solver, LinearSolver):
+        return linear_solver
+    return LinearSolver(linear_solver)
+
+
+def solve(A, b, method='direct', tol=1e-10, maxiter=None,
+          preconditioner='jacobi'):
+    """Solve the linear system A x = b
+
+    Parameters
+    ----------
+    A : ndarray or scipy.sparse matrix shape (n, n)
+    b : ndarray shape (n,)
+    method : {'direct', 'cg', 'minres'} or LinearSolver, default 'direct'
+        see LinearSolver, if a LinearSolver object is given the other
+        parameters are ignored
+    tol : float, default 1e-10
+        relative residual tolerance for the iterative methods
+    maxiter : int, optional
+        maximum number of iterations for the iterative methods
+    preconditioner : {'jacobi', 'ilu', 'amg', None}, default 'jacobi'
+
+    Returns
+    -------
+    x : ndarray shape (n,)
+
+    """
+    if not isinstance(method, LinearSolver):
+        method = LinearSolver(method, preconditioner, tol, maxiter)
+    return method.solve(A, b)
+
+
+def factorized(A, method='direct', tol=1e-10, maxiter=None,
+               preconditioner='jacobi'):
+    """Prepare A once to solve many systems with different right hand sides
+
+    Parameters are the same as solve, see LinearSolver.factorized
+
+    Returns
+    -------
+    function
+        f(b) that returns the solution x of A x = b
+
+    """
+    if not isinstance(method, LinearSolver):
+        method = LinearSolver(method, preconditioner, tol, maxiter)
+    return method.factorized(A)
@@ -1,8 +1,11 @@
 """Solve partitioned system for the incremental problem"""
 import numpy as np
+from scipy import sparse
+from .linear import solve
 
 
-def solve_partitioned(model, K_T, f_int, f_ext, increment, k):
+def solve_partitioned(model, K_T, f_int, f_ext, increment, k,
+                      partition=None, linear_solver='direct', solve_ff=None):
     """Solve partitioned system
 
     Obtain Newton correction for free degree's of freedom and obtain residual
@@ -11,6 +14,21 @@ def solve_partitioned(model, K_T, f_int, f_ext, increment, k):
     [ Kff Kfr ] [ delta_u_f ] = - [ residual_f ]
     [ Krf Krr ] [ delta_u_r ] = - [ residual_r ]
 
+    Parameters
+    ----------
+    K_T : ndarray or scipy.sparse matrix shape (num_dof, num_dof)
+        global tangent matrix
+    partition : Partition object, optional
+        free and restrained dofs of this increment, if None it is computed
+        for this call only. Reuse the same object in all iterations of an
+        increment so the blocks extraction map is computed once.
+    linear_solver : str or LinearSolver object, default 'direct'
+        method used to solve the Kff system, see solvers.linear
+    solve_ff : function, optional
+        f(b) that returns the solution of Kff x = b, used to reuse a
+        factorization or a quasi-Newton inverse between iterations. If None
+        Kff is solved with linear_solver.
+
     Returns
     -------
     delta_u, f_int_r
@@ -26,17 +44,16 @@ def solve_partitioned(model, K_T, f_int, f_ext, increment, k):
     See Borst 2012 Section 2.5
 
     """
-    # Compute residual
-    if model.imposed_displ is not None:
-        f, r = model.update_free_restrained_dof(increment)
-    else:
-        # incidences of free and restrained dofs
-        f, r = model.id_f, model.id_r
-    ff = np.ix_(f, f)
-    rf = np.ix_(r, f)
-    fr = np.ix_(f, r)
-    rr = np.ix_(r, r)
+    if partition is None:
+        partition = Partition(model, increment)
+    # incidences of free and restrained dofs
+    f, r = partition.f, partition.r
+    K_ff, K_fr, K_rf, K_rr = partition.blocks(K_T)
+    if solve_ff is None:
+        def solve_ff(b):
+            return solve(K_ff, b, linear_solver)
 
+    # Compute residual
     residual = f_int - f_ext
 
     # updtade vector with all dofs, the restrained dofs correction is zero
@@ -46,15 +63,14 @@ def solve_partitioned(model, K_T, f_int, f_ext, increment, k):
     if k == 0:
         delta_u[r] = set_imposed_displacement(model, increment, r)
         # solve for free considering non zero restrained correction
-        delta_u[f] = - np.linalg.solve(K_T[ff],
-                                       residual[f] + K_T[fr] @ delta_u[r])
-        residual[r] = - K_T[rf] @ delta_u[f] - K_T[rr] @ delta_u[r]
+        delta_u[f] = - solve_ff(residual[f] + K_fr @ delta_u[r])
+        residual[r] = - K_rf @ delta_u[f] - K_rr @ delta_u[r]
     else:
         # now all restrained dofs have zero displacement correction
         # solve for free dofs when correction for restrained is zero
-        delta_u[f] = np.linalg.solve(K_T[ff], - residual[f])
+        delta_u[f] = solve_ff(- residual[f])
         # update residual vector with the restrained part
-        residual[r] = - K_T[rf] @ delta_u[f]
+        residual[r] = - K_rf @ delta_u[f]
 
     # add reaction to external load vector
     f_ext[r] = f_int[r] - residual[r]
@@ -62,6 +78,106 @@ def solve_partitioned(model, K_T, f_int, f_ext, increment, k):
     return delta_u, f_ext
 
 
+class Partition(object):
+    """Free and restrained dofs for one increment of the analysis
+
+    Parameters
+    ----------
+    model : Model object
+    increment : int
+        pseudo-time increment, used when imposed_displ is set
+
+    Attributes
+    ----------
+    f, r : ndarray
+        sorted free and restrained dofs (starting at 0)
+
+    Note
+    ----
+    The tangent matrix assembled with the model scatter plan keeps the same
+    sparsity pattern for the whole analysis. The positions of the Kff, Kfr,
+    Krf and Krr entries in the CSR data array are computed on the first call
+    to blocks(), the following calls only gather the data array.
+
+    """
+    def __init__(self, model, increment):
+        if model.imposed_displ is not None:
+            f, r = model.update_free_restrained_dof(increment)
+        else:
+            f, r = model.id_f, model.id_r
+        self.f = np.asarray(f, dtype=int)
+        self.r = np.asarray(r, dtype=int)
+        self._indptr = None
+        self._maps = None
+
+    def same_dofs(self, other):
+        """Check if other Partition has the same free and restrained dofs"""
+        return (np.array_equal(self.f, other.f) and
+                np.array_equal(self.r, other.r))
+
+    def blocks(self, K_T):
+        """Extract the free and restrained blocks of the tangent matrix
+
+        Parameters
+        ----------
+        K_T : ndarray or scipy.sparse matrix shape (num_dof, num_dof)
+
+        Returns
+        -------
+        K_ff, K_fr, K_rf, K_rr
+            blocks with the same format as K_T, sparse blocks are CSR
+
+        """
+        f, r = self.f, self.r
+        if not sparse.issparse(K_T):
+            return (K_T[np.ix_(f, f)], K_T[np.ix_(f, r)],
+                    K_T[np.ix_(r, f)], K_T[np.ix_(r, r)])
+
+        K_T = K_T.tocsr()
+        if not self._same_pattern(K_T):
+            K_T.sum_duplicates()
+            self._maps = self._block_maps(K_T)
+            self._indptr, self._indices = K_T.indptr, K_T.indices
+        return tuple(sparse.csr_matrix((K_T.data[entries], indices, indptr),
+                                       shape=shape)
+                     for entries, indices, indptr, shape in self._maps)
+
+    def _same_pattern(self, K_T):
+        """Check if K_T has the sparsity pattern of the cached maps"""
+        if self._indptr is None:
+            return False
+        return (K_T.indptr.shape == self._indptr.shape and
+                K_T.indices.shape == self._indices.shape and
+                np.may_share_memory(K_T.indptr, self._indptr) and
+                np.may_share_memory(K_T.indices, self._indices))
+
+    def _block_maps(self, K_T):
+        """Compute the data entries and CSR structure of each block"""
+        num_dof = K_T.shape[0]
+        # 0 for free, 1 for restrained and -1 for dofs in none of them
+        group = np.full(num_dof, -1)
+        group[self.f] = 0
+        group[self.r] = 1
+        # index of each dof inside its group
+        local = np.zeros(num_dof, dtype=int)
+        local[self.f] = np.arange(len(self.f))
+        local[self.r] = np.arange(len(self.r))
+        size = (len(self.f), len(self.r))
+
+        row = np.repeat(np.arange(num_dof), np.diff(K_T.indptr))
+        col = K_T.indices
+        maps = []
+        for row_group, col_group in [(0, 0), (0, 1), (1, 0), (1, 1)]:
+            entries = np.flatnonzero((group[row] == row_group) &
+                                     (group[col] == col_group))
+            counts = np.bincount(local[row[entries]],
+                                 minlength=size[row_group])
+            indptr = np.concatenate([[0], np.cumsum(counts)])
+            maps.append((entries, local[col[entries]], indptr,
+                         (size[row_group], size[col_group])))
+        return maps
+
+
 def set_imposed_displacement(model, increment, r):
     """Set the imposed displacement for this pseudo-time increment
 
@@ -69,34 +185,20 @@ def set_imposed_displacement(model, increment, r):
     ----------
     model.impoed_displ[increment] : dict
         Imposed displacement {physical_tag: (imposed_u_x, imposed_u_y)}
-    """
-    delta_u = np.zeros(model.num_dof)
+    r : ndarray
+        sorted restrained dofs (starting at 0) of the increment
 
-    if model.imposed_displ is not None:
-        # displacement_location and displacement_value
-        for d_loc, d_value in model.imposed_displ[increment].items():
-            physical_element = model.get_physical_element(d_loc)
-            for eid, [etype, *edata] in physical_element.items():
-                # physical points
-                if etype == 15:
-                    node = edata[-1]  # last entry
-                    dof = np.array(model.nodes_dof[node]) - 1
-                    if d_value[0] is not None:
-                        delta_u[dof[0]] = d_value[0]
-                    if d_value[1] is not None:
-                        delta_u[dof[1]] = d_value[1]
-                # physical lines
-                if etype == 1:
-                    node_1, node_2 = edata[-2], edata[-1]
-                    dof_n1 = np.array(model.nodes_dof[node_1]) - 1
-                    dof_n2 = np.array(model.nodes_dof[node_2]) - 1
-                    if d_value[0] is not None:
-                        # modify dof in x for node 1
-                        delta_u[dof_n1[0]] = d_value[0]
-                        delta_u[dof_n2[0]] = d_value[0]
-                    if d_value[1] is not None:
-                        # modify dof in y for node 1
-                        delta_u[dof_n1[1]] = d_value[1]
-                        # modify dof in y for node 2
-                        delta_u[dof_n2[1]] = d_value[1]
-    return delta_u[r]
+    Returns
+    -------
+    ndarray shape (len(r),)
+        imposed displacement at the restrained dofs
+
+    Note
+    ----
+    The schedule is compiled when the model is created, see
+    dirichlet.DisplacementPlan, so only the increment values are scattered.
+
+    """
+    if model.imposed_displ is None:
+        return np.zeros(len(r))
+    return model.displacement_plan.imposed_values(increment, r)
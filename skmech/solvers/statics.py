@@ -1,18 +1,30 @@
 import numpy as np
 import time
-from ..dirichlet import dirichlet
+from ..dirichlet import dirichlet, prescribed_displacement
 from ..neumann import neumann
 from ..constructor import constructor
+from ..assembly import sparse_stiffness
 from ..postprocess.dof2node import dof2node
+from .linear import solve
 
 
-def solver(model, t=1):
+def solver(model, t=1, sparse=True, linear_solver='direct'):
     """Solver for the elastostatics problem
 
     Parameters
     ----------
     model : Build instance
         object containing all problem paramenters
+    t : float, default 1
+        time
+    sparse : bool, default True
+        assemble the stiffness matrix in sparse (CSR) format and solve it
+        with a sparse direct solver. If False, the dense stiffness matrix is
+        assembled and the boundary conditions are imposed by `dirichlet`.
+    linear_solver : str or LinearSolver object, default 'direct'
+        method used to solve the sparse system, {'direct', 'cg', 'minres'}
+        or a LinearSolver with preconditioner and tolerance, which also
+        keeps the iteration counts, see solvers.linear
 
    Return
     -------
@@ -22,19 +34,24 @@ def solver(model, t=1):
     """
     start = time.time()
     print('Starting statics solver at {:.3f}h '.format(t / 3600), end='')
-    K, P = 0, 0
-    for eid, [etype, *edata] in model.elements.items():
-        element = constructor(eid, etype, model)
-        k = element.stiffness_matrix(t)
-        # pb = element.load_body_vector(model.body_force, t)
-        # pe = element.load_strain_vector(t)
-        K += k
-        # P += pb + pe
-
-    Pt = neumann(model)
-    P = P + Pt
-    Km, Pm = dirichlet(K, P, model)
-    U = np.linalg.solve(Km, Pm)
+    if sparse:
+        K = sparse_stiffness(model, t)
+        P = neumann(model)
+        U = solve_sparse(K, P, model, linear_solver)
+    else:
+        K, P = 0, 0
+        for eid, [etype, *edata] in model.elements.items():
+            element = constructor(eid, etype, model)
+            k = element.stiffness_matrix(t)
+            # pb = element.load_body_vector(model.body_force, t)
+            # pe = element.load_strain_vector(t)
+            K += k
+            # P += pb + pe
+
+        Pt = neumann(model)
+        P = P + Pt
+        Km, Pm = dirichlet(K, P, model)
+        U = np.linalg.solve(Km, Pm)
     # add current dof displacement to model
     # not optimal but ok, because it requires me to run solver before
     # stress recovery
@@ -43,3 +60,38 @@ def solver(model, t=1):
     end = time.time()
     print('Solution completed in {:.3f}s!'.format(end - start))
     return u
+
+
+def solve_sparse(K, P, model, linear_solver='direct'):
+    """Solve the sparse system eliminating the restrained dofs
+
+    Parameters
+    ----------
+    K : scipy.sparse matrix shape (num_dof, num_dof)
+    P : ndarray shape (num_dof,)
+    model : Model object
+    linear_solver : str or LinearSolver object, default 'direct'
+
+    Returns
+    -------
+    U : ndarray shape (num_dof,)
+        displacement at each dof, including the prescribed ones
+
+    Note
+    ----
+    The system is partitioned in free (f) and restrained (r) dofs and only
+
+        Kff U_f = P_f - Kfr U_r
+
+    is solved, so the matrix is never densified.
+
+    """
+    r, u_r = prescribed_displacement(model)
+    f = np.ones(model.num_dof, dtype=bool)
+    f[r] = False
+
+    U = np.zeros(model.num_dof)
+    U[r] = u_r
+    K_f = K[f]
+    U[f] = solve(K_f[:, f], P[f] - K_f[:, r] @ u_r, linear_solver)
+    return U
@@ -0,0 +1,187 @@
+"""Iteration strategies for the global equilibrium of the incremental solver
+
+The full Newton-Raphson method assembles and factorizes the tangent matrix
+in every iteration. The other strategies reuse a factorization of the free
+dofs block Kff and trade more iterations for less factorizations:
+
+newton
+    tangent assembled and factorized every iteration
+modified
+    tangent factorized at the beginning of each increment, or every
+    refactor_every iterations
+initial
+    the first tangent (elastic) is factorized once and used for the whole
+    analysis
+bfgs
+    tangent factorized at the beginning of each increment and the inverse is
+    improved with BFGS updates in the following iterations
+
+"""
+import numpy as np
+from .linear import get_linear_solver
+
+STRATEGIES = ('newton', 'modified', 'initial', 'bfgs')
+
+
+class IterationStrategy(object):
+    """Decide when the tangent is rebuilt and provide the Kff solver
+
+    Parameters
+    ----------
+    method : {'newton', 'modified', 'initial', 'bfgs'}, default 'newton'
+    linear_solver : str or LinearSolver object, default 'direct'
+        method used to solve the Kff system, see solvers.linear
+    refactor_every : int, optional
+        for the modified method, number of iterations between factorizations
+        inside an increment. If None the tangent is factorized once per
+        increment.
+
+    Attributes
+    ----------
+    num_iterations : int
+        total number of global iterations
+    num_factorizations : int
+        total number of Kff factorizations
+    increment_iterations : list
+        number of iterations of each converged increment
+
+    Note
+    ----
+    The BFGS update uses the two-loop recursion with the factorized Kff as
+    initial inverse, see (Algorithm 7.4 Nocedal and Wright 2006). Updates
+    that do not satisfy the curvature condition y.s > 0 are skipped.
+
+    """
+    def __init__(self, method='newton', linear_solver='direct',
+                 refactor_every=None):
+        if method not in STRATEGIES:
+            raise Exception(f'Iteration strategy {method} not implemented!')
+        self.method = method
+        self.linear_solver = get_linear_solver(linear_solver)
+        self.refactor_every = refactor_every
+        self.num_iterations = 0
+        self.num_factorizations = 0
+        self.increment_iterations = []
+
+        # tangent and Kff solver currently in use
+        self._K = None
+        self._f = None
+        self._solve_ff = None
+        # BFGS pairs and residual of the previous iteration
+        self._s, self._y, self._rho = [], [], []
+        self._residual = None
+
+    def new_increment(self):
+        """Reset the information that is valid only inside an increment"""
+        self._s, self._y, self._rho = [], [], []
+        self._residual = None
+
+    def tangent_required(self, k):
+        """Check if the tangent of iteration k has to be assembled"""
+        if self._K is None or self.method == 'newton':
+            return True
+        elif self.method == 'initial':
+            return False
+        elif self.method == 'modified' and self.refactor_every is not None:
+            return k % self.refactor_every == 0
+        else:
+            return k == 0
+
+    def operator(self, K_T, partition, k):
+        """Get the tangent and the Kff solver for iteration k
+
+        Parameters
+        ----------
+        K_T : scipy.sparse matrix or None
+            tangent matrix assembled for this iteration, only required when
+            tangent_required(k) is True
+        partition : Partition object
+            free and restrained dofs of the increment
+        k : int
+            iteration inside the increment, starting at 0
+
+        Returns
+        -------
+        K : matrix
+            tangent used to compute the restrained dofs reactions
+        solve_ff : function
+            f(b) that returns the (approximate) solution of Kff x = b
+
+        """
+        if self.tangent_required(k):
+            self._K = K_T
+            self._factorize(partition)
+        elif not np.array_equal(self._f, partition.f):
+            # free dofs changed, same tangent with the new Kff block
+            self._factorize(partition)
+
+        if self.method == 'bfgs' and self._s:
+            return self._K, self._bfgs_solve
+        return self._K, self._solve_ff
+
+    def update(self, delta_u_f, residual_f):
+        """Store the iteration correction and the new free dofs residual
+
+        Parameters
+        ----------
+        delta_u_f : ndarray
+            correction of the free dofs computed in this iteration
+        residual_f : ndarray
+            free dofs residual after the correction
+
+        """
+        self.num_iterations += 1
+        if self.method != 'bfgs':
+            return
+        if self._residual is not None:
+            # first pair is skipped because the correction of the first
+            # iteration includes the imposed displacements
+            y = residual_f - self._residual
+            ys = y @ delta_u_f
+            if ys > 0:
+                self._s.append(delta_u_f.copy())
+                self._y.append(y)
+                self._rho.append(1 / ys)
+        self._residual = residual_f.copy()
+
+    def converged(self, k):
+        """Register the number of iterations of a converged increment"""
+        self.increment_iterations.append(k)
+
+    def stats(self):
+        """Iteration counts of the analysis
+
+        Returns
+        -------
+        dict
+            {'iterations': int, 'factorizations': int, 'increments': list,
+             'linear_iterations': int}
+
+        """
+        return {'iterations': self.num_iterations,
+                'factorizations': self.num_factorizations,
+                'increments': list(self.increment_iterations),
+                'linear_iterations': self.linear_solver.num_iterations}
+
+    def _factorize(self, partition):
+        """Factorize the free dofs block of the current tangent"""
+        K_ff = partition.blocks(self._K)[0]
+        self._solve_ff = self.linear_solver.factorized(K_ff)
+        self._f = partition.f
+        self.num_factorizations += 1
+
+    def _bfgs_solve(self, b):
+        """Apply the BFGS inverse approximation to b"""
+        q = np.array(b, dtype=float)
+        alpha = []
+        for s, y, rho in zip(reversed(self._s), reversed(self._y),
+                             reversed(self._rho)):
+            a = rho * (s @ q)
+            q -= a * y
+            alpha.append(a)
+        x = self._solve_ff(q)
+        for s, y, rho, a in zip(self._s, self._y, self._rho,
+                                reversed(alpha)):
+            beta = rho * (y @ x)
+            x += (a - beta) * s
+        return x
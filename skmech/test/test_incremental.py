@@ -0,0 +1,373 @@
+"""Test the incremental solver building blocks"""
+import numpy as np
+import pytest
+import skmech
+from skmech.solvers.partitioned import Partition
+from skmech.solvers.internalvariables import InternalVariables
+
+
+class Mesh():
+    pass
+
+
+# 4 element with offset center node
+msh = Mesh()
+msh.nodes = {
+    1: [0, 0, 0],
+    2: [1, 0, 0],
+    3: [1, 1, 0],
+    4: [0, 1, 0],
+    5: [.5, 0, 0],
+    6: [1, .5, 0],
+    7: [.5, 1, 0],
+    8: [0, .5, 0],
+    9: [.4, .6]
+}
+msh.elements = {
+    1: [15, 2, 12, 1, 1],
+    2: [15, 2, 13, 2, 2],
+    3: [1, 2, 7, 2, 2, 6],
+    4: [1, 2, 7, 2, 6, 3],
+    7: [1, 2, 5, 4, 4, 8],
+    8: [1, 2, 5, 4, 8, 1],
+    9: [3, 2, 11, 10, 1, 5, 9, 8],
+    10: [3, 2, 11, 10, 5, 2, 6, 9],
+    11: [3, 2, 11, 10, 9, 6, 3, 7],
+    12: [3, 2, 11, 10, 8, 9, 7, 4]
+}
+material = skmech.Material(E={11: 10000}, nu={11: 0.3},
+                           H={11: 1000}, sig_y0={11: 10}, case='strain')
+model = skmech.Model(
+    msh,
+    material=material,
+    displacement_bc={5: (0, None), 12: (None, 0)},
+    imposed_displ=[{7: (1e-3, None)}, {7: (1e-3, None)}],
+    num_quad_points=2)
+
+
+def test_partition_blocks():
+    """sparse blocks extracted with cached maps are equal to dense slices"""
+    for i, (eid, [etype, *_]) in enumerate(model.elements.items()):
+        ele = skmech.constructor(eid, etype, model)
+        model.scatter_plan.set_element(i, ele.local_stiffness_matrix())
+    K = model.scatter_plan.assemble()
+    partition = Partition(model, 0)
+    assert len(np.intersect1d(partition.f, partition.r)) == 0
+    assert len(partition.f) + len(partition.r) == model.num_dof
+    for _ in range(2):
+        blocks = partition.blocks(K)
+        dense = partition.blocks(K.toarray())
+        for sparse_block, dense_block in zip(blocks, dense):
+            assert np.allclose(sparse_block.toarray(), dense_block)
+
+
+def test_imposed_displ_dict():
+    """single step {tag: (u_x, u_y)} form still builds a model"""
+    from skmech.dirichlet import imposed_displacement
+    model_dict = skmech.Model(msh, material=material,
+                              displacement_bc={12: (0, 0), 13: (None, 0)},
+                              imposed_displ={7: (.01, None)})
+    assert list(model_dict.id_r) == [0, 1, 3]
+    Pd = imposed_displacement(model_dict)
+    assert Pd.shape == (model_dict.num_dof,)
+    assert np.any(Pd != 0)
+    with pytest.raises(Exception):
+        model_dict.displacement_plan.imposed
+
+
+def test_internal_variables():
+    """dict-style access reads and writes the preallocated arrays"""
+    int_var = InternalVariables(model)
+    assert int_var.sig.shape == (4, 4, 4)
+    assert int_var.q.shape == (4, 4)
+    assert len(int_var['q']) == 16
+    assert set(int_var['q'].keys()) == {(eid, gp) for eid in [9, 10, 11, 12]
+                                        for gp in range(4)}
+    int_var['sig'][(11, 2)] = [1, 2, 3, 4]
+    int_var['eps_bar_p'][(12, 3)] = 0.5
+    assert np.all(int_var.sig[2, 2] == [1, 2, 3, 4])
+    assert int_var.eps_bar_p[3, 3] == 0.5
+    int_var.eps_e[0, 1] = 1
+    int_var.eps_p[0, 1] = 2
+    assert np.all(int_var['eps'][(9, 1)] == 3)
+
+
+def test_iteration_strategies(monkeypatch):
+    """all iteration strategies converge to the full Newton solution"""
+    from skmech.solvers import incremental
+    displ = {}
+
+    def save_u(model, u, int_var, increment, *args):
+        displ[increment] = u.copy()
+
+    monkeypatch.setattr(incremental, 'save_output', save_u)
+    incremental.solver(model, max_num_iter=100)
+    u_newton = displ[2]
+    for method in ['modified', 'initial', 'bfgs']:
+        stats = incremental.solver(model, iteration=method, max_num_iter=100)
+        assert np.allclose(displ[2], u_newton, atol=1e-7)
+        assert stats['factorizations'] <= stats['iterations']
+        assert len(stats['increments']) == 2
+        if method == 'initial':
+            assert stats['factorizations'] == 1
+
+
+def test_free_restrained_dof():
+    """masks give sorted disjoint dofs cached for each increment"""
+    f, r = model.update_free_restrained_dof(1)
+    assert list(r) == [0, 1, 2, 4, 6, 10, 14]
+    assert list(f) == [3, 5, 7, 8, 9, 11, 12, 13, 15, 16, 17]
+    assert model.update_free_restrained_dof(1)[0] is f
+    assert list(model.id_r) == [0, 1, 6, 14]
+
+
+def test_displacement_plan():
+    """compiled schedule scatters the imposed values into restrained dofs"""
+    from skmech.solvers.partitioned import set_imposed_displacement
+    plan = model.displacement_plan
+    assert list(plan.fixed[0]) == [0, 1, 6, 14]
+    assert np.all(plan.fixed[1] == 0)
+    assert len(plan.imposed) == 2
+    dof, value = plan.imposed[1]
+    assert list(dof) == [2, 4, 10]
+    assert np.allclose(value, 1e-3)
+    f, r = model.update_free_restrained_dof(1)
+    delta_u_r = set_imposed_displacement(model, 1, r)
+    assert list(r[delta_u_r != 0]) == [2, 4, 10]
+
+
+def test_write_fields(tmp_path):
+    """one pass write has the same blocks as one write_field per field"""
+    from skmech.meshplotlib.gmshio.gmshio import write_field, write_fields
+    import time
+    u = {1: np.array([0.1, 0.2]), 3: np.array([0.3, 0.4])}
+    s = {1: 1.5, 3: -2.}
+    for name in ['a', 'b']:
+        (tmp_path / f'{name}.msh').write_text('$MeshFormat\n$EndMeshFormat')
+    start = time.time() - 1
+    write_field(u, str(tmp_path / 'a'), 'Displacement', 2, 0.5, 1, start)
+    write_field(s, str(tmp_path / 'a'), 'Sigma x', 1, 0.5, 1, start)
+    write_fields([('Displacement', [1, 3], [[0.1, 0.2], [0.3, 0.4]]),
+                  ('Sigma x', np.array([1, 3]), np.array([1.5, -2.]))],
+                 str(tmp_path / 'b'), 0.5, 1, start)
+
+    def blocks(name):
+        text = (tmp_path / f'{name}_out.msh').read_text()
+        return [line.split() for line in text.splitlines()]
+    assert blocks('a') == blocks('b')
+
+
+def test_probe_recorder(tmp_path):
+    """probes gather node, element and gauss point histories in one file"""
+    from skmech.postprocess.probes import ProbeRecorder, load_probes
+    name = str(tmp_path / 'probes')
+    # a previous history is replaced, files with similar names are kept
+    np.save(name + '.npy', np.zeros(3))
+    np.save(name + '_backup.npy', np.zeros(3))
+    probes = ProbeRecorder(model, name, flush_every=2)
+    probes.add_node('u9', 9)
+    probes.add_element('q11', 'q', 11)
+    probes.add_gauss_point('sig11', 'sig', 11, 2)
+    probes.add_gauss_point('sig9', 'sig', 9, 0)
+    with pytest.raises(Exception):
+        probes.add_gauss_point('sig9', 'sig', 9, 1)
+    with pytest.raises(Exception):
+        probes.add_node('u100', 100)
+
+    int_var = InternalVariables(model)
+    u = np.arange(model.num_dof, dtype=float)
+    for increment in range(1, 4):
+        int_var.sig[2, 2] = increment
+        int_var.q[2] = [increment, 0, 0, -increment]
+        # dict like internal variables are also accepted
+        int_var_dict = {variable: dict(int_var[variable])
+                        for variable in ['q', 'sig']}
+        probes.record(increment * u, int_var if increment < 3 else
+                      int_var_dict, increment / 10)
+    with pytest.raises(Exception):
+        probes.add_node('u1', 1)
+
+    # last record is not flushed yet, only the buffer is in memory
+    assert len(load_probes(name)['time']) == 2
+    assert len(probes.history()['time']) == 3
+    size = (tmp_path / 'probes.npy').stat().st_size
+    probes.flush()
+    probes.flush()
+    # one record is appended to the same file, other files are kept
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'probes.npy', 'probes_backup.npy']
+    assert (tmp_path / 'probes.npy').stat().st_size == (
+        size + probes._buffer.itemsize)
+    history = load_probes(name)
+    for key, value in probes.history().items():
+        assert np.array_equal(history[key], value)
+    assert np.allclose(history['time'], [.1, .2, .3])
+    assert list(history['increment']) == [1, 2, 3]
+    assert np.allclose(history['u9'], np.outer([1, 2, 3], [16, 17]))
+    assert history['q11'].shape == (3, 4)
+    assert np.allclose(history['q11'][:, 3], [-1, -2, -3])
+    assert np.allclose(history['sig11'], np.outer([1, 2, 3], [1, 1, 1, 1]))
+    assert np.all(history['sig9'] == 0)
+
+
+def test_background_writer(monkeypatch):
+    """snapshots written in the background match the synchronous output"""
+    import time
+    from skmech.solvers import incremental
+    from skmech.postprocess.writer import BackgroundWriter
+    displ, sig = {}, {}
+
+    def save_u(model, u, int_var, increment, *args):
+        time.sleep(0.01)
+        displ[increment] = u.copy()
+        sig[increment] = int_var.sig.copy()
+
+    monkeypatch.setattr(incremental, 'save_output', save_u)
+    incremental.solver(model)
+    displ_sync, sig_sync = dict(displ), dict(sig)
+    displ.clear()
+    sig.clear()
+    incremental.solver(model, background_output=True)
+    assert displ.keys() == displ_sync.keys()
+    for increment in displ:
+        assert np.all(displ[increment] == displ_sync[increment])
+        assert np.all(sig[increment] == sig_sync[increment])
+
+    def fail(*args):
+        raise ValueError('disk full')
+
+    writer = BackgroundWriter(fail)
+    writer.submit(1)
+    with pytest.raises(ValueError):
+        writer.close()
+
+    # an analysis error closes the writer, the converged increments are
+    # written and the output error is chained to the analysis error
+    localization = incremental.localization
+    calls = []
+
+    def fail_second_increment(*args):
+        # the first increment converges after 9 calls
+        calls.append(1)
+        if len(calls) > 10:
+            raise ZeroDivisionError('singular')
+        return localization(*args)
+
+    displ.clear()
+    monkeypatch.setattr(incremental, 'localization', fail_second_increment)
+    with pytest.raises(ZeroDivisionError):
+        incremental.solver(model, background_output=True)
+    assert list(displ) == [1]
+
+    def save_fail(model, u, int_var, increment, *args):
+        save_u(model, u, int_var, increment)
+        raise ValueError('disk full')
+
+    displ.clear()
+    calls.clear()
+    monkeypatch.setattr(incremental, 'save_output', save_fail)
+    with pytest.raises(ZeroDivisionError) as error:
+        incremental.solver(model, background_output=True)
+    assert isinstance(error.value.__context__, ValueError)
+
+
+def test_background_writer_process(tmp_path, monkeypatch):
+    """snapshots written by a forked process match the synchronous output"""
+    import multiprocessing
+    from skmech.solvers import incremental
+    from skmech.postprocess.writer import BackgroundWriter
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        pytest.skip('fork start method not available')
+
+    def save_u(model, u, int_var, increment, *args):
+        # the process writes files, the caller memory is not shared
+        np.save(tmp_path / f'u_{len(model.elements)}_{increment}.npy', u)
+
+    monkeypatch.setattr(incremental, 'save_output', save_u)
+    incremental.solver(model, background_output='process')
+    written = sorted(tmp_path.iterdir())
+    assert len(written) == len(model.imposed_displ)
+    u = {path.name: np.load(path) for path in written}
+    incremental.solver(model)
+    for path in tmp_path.iterdir():
+        assert np.all(np.load(path) == u[path.name])
+
+    def fail(*args):
+        raise ValueError('disk full')
+
+    writer = BackgroundWriter(lambda *args: None, process=True)
+    writer.submit(model, 1)
+    with pytest.raises(Exception, match='same model'):
+        writer.submit(object(), 1)
+    writer.close()
+    writer = BackgroundWriter(fail, process=True)
+    writer.submit(model, 1)
+    with pytest.raises(ValueError):
+        writer.close()
+    with pytest.raises(Exception):
+        writer.submit(model, 1)
+
+
+def test_vtk_writer(tmp_path):
+    """vtu time series written by the solver is read back in both
+    encodings"""
+    from skmech.solvers import incremental
+    from skmech.meshplotlib.vtkio.vtkio import VTKWriter, read_vtu
+    name = str(tmp_path / 'model')
+    writer = VTKWriter(model, name)
+    displ = {}
+
+    def output(model, u, int_var, increment, start, lmbda):
+        displ[increment] = u.copy()
+        writer(model, u, int_var, increment, start, lmbda)
+
+    incremental.solver(model, output=output)
+    pvd = (tmp_path / 'model.pvd').read_text()
+    assert pvd.count('<DataSet') == len(displ) == len(writer.datasets)
+    assert 'file="model_0002.vtu"' in pvd
+
+    raw = read_vtu(writer.datasets[-1][1])
+    assert list(writer.node_ids) == list(range(1, 10))
+    assert np.allclose(raw['Displacement'][:, :2],
+                       displ[2].reshape(-1, 2))
+    assert np.allclose(raw['Points'][:, :2],
+                       [msh.nodes[nid][:2] for nid in range(1, 10)])
+    assert list(raw['connectivity'].ravel()[:4]) == [0, 4, 8, 7]
+    assert raw['Stress gp'].shape == (4, 16)
+    assert raw['Von Mises'].shape == (9, 1)
+
+    base64 = VTKWriter(model, str(tmp_path / 'base64'), encoding='base64')
+    int_var = InternalVariables(model)
+    int_var.sig[:] = np.random.RandomState(0).rand(*int_var.sig.shape)
+    base64(model, displ[2], int_var, 2, 0, 0.2)
+    writer(model, displ[2], int_var, 2, 0, 0.2)
+    encoded = read_vtu(base64.datasets[-1][1])
+    raw = read_vtu(writer.datasets[-1][1])
+    assert encoded.keys() == raw.keys()
+    for key in raw:
+        assert np.all(encoded[key] == raw[key])
+    assert np.allclose(raw['Stress gp'].reshape(4, 4, 4), int_var.sig)
+
+
+def test_probes_flushed_on_error(tmp_path, monkeypatch):
+    """records since the last flush are written when the analysis fails"""
+    from skmech.solvers import incremental
+    from skmech.postprocess.probes import ProbeRecorder, load_probes
+    localization = incremental.localization
+    calls = []
+
+    def fail_second_increment(*args):
+        # the first increment converges after 9 calls
+        calls.append(1)
+        if len(calls) > 10:
+            raise ZeroDivisionError('singular')
+        return localization(*args)
+
+    monkeypatch.setattr(incremental, 'save_output', lambda *args: None)
+    monkeypatch.setattr(incremental, 'localization', fail_second_increment)
+    name = str(tmp_path / 'probes')
+    probes = ProbeRecorder(model, name, flush_every=10)
+    probes.add_node('u9', 9)
+    with pytest.raises(ZeroDivisionError):
+        incremental.solver(model, probes=probes)
+    assert list(load_probes(name)['increment']) == [1]
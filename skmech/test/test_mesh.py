@@ -0,0 +1,210 @@
+"""Test the array based mesh"""
+import numpy as np
+import pytest
+import skmech
+
+
+class Mesh():
+    pass
+
+
+# 4 element with offset center node
+msh = Mesh()
+msh.nodes = {
+    1: np.array([0, 0, 0]),
+    2: np.array([1, 0, 0]),
+    3: np.array([1, 1, 0]),
+    4: np.array([0, 1, 0]),
+    5: np.array([.5, 0, 0]),
+    6: np.array([1, .5, 0]),
+    7: np.array([.5, 1, 0]),
+    8: np.array([0, .5, 0]),
+    9: np.array([.4, .6, 0])
+}
+msh.elements = {
+    1: np.array([15, 2, 12, 1, 1]),
+    2: np.array([15, 2, 13, 2, 2]),
+    3: np.array([1, 2, 7, 2, 2, 6]),
+    4: np.array([1, 2, 7, 2, 6, 3]),
+    7: np.array([1, 2, 5, 4, 4, 8]),
+    8: np.array([1, 2, 5, 4, 8, 1]),
+    9: np.array([3, 2, 11, 10, 1, 5, 9, 8]),
+    10: np.array([3, 2, 11, 10, 5, 2, 6, 9]),
+    11: np.array([3, 2, 11, 10, 9, 6, 3, 7]),
+    12: np.array([3, 2, 11, 10, 8, 9, 7, 4])
+}
+material = skmech.Material(E={11: 10000}, nu={11: 0.3})
+
+
+def test_dict_view():
+    mesh = skmech.Mesh.from_dict(msh.nodes, msh.elements)
+    assert list(mesh.nodes) == list(msh.nodes)
+    assert list(mesh.elements) == list(msh.elements)
+    for nid, xyz in msh.nodes.items():
+        assert np.array_equal(mesh.nodes[nid], xyz)
+    for eid, value in msh.elements.items():
+        assert np.array_equal(mesh.elements[eid], value)
+    assert 12 in mesh.elements and 5 not in mesh.elements
+    with pytest.raises(KeyError):
+        mesh.nodes[10]
+    assert mesh.connectivity[3].shape == (4, 4)
+    assert list(mesh.get_element_index([12, 1])) == [9, 0]
+    assert list(mesh.physical_tags[mesh.element_types == 1]) == [7, 7, 5, 5]
+    assert mesh.name == 'mesh'
+    # values are slices of the packed rows, not copies
+    data, _ = mesh.get_element_rows()
+    assert np.shares_memory(mesh.elements[9], data)
+    with pytest.raises(ValueError):
+        mesh.elements[9][0] = 1
+    quads = mesh.elements.select([3])
+    assert list(quads) == [9, 10, 11, 12] and len(quads) == 4
+    assert 9 in quads and 3 not in quads
+    with pytest.raises(KeyError):
+        quads[3]
+
+
+def test_physical_index():
+    mesh = skmech.Mesh.from_dict(msh.nodes, msh.elements)
+    model = skmech.Model(mesh, material=material)
+    model_dict = skmech.Model(msh, material=material)
+    assert list(model.physical_index) == list(model_dict.physical_index)
+    for tag, group in model_dict.physical_index.items():
+        for key, value in group.items():
+            assert np.array_equal(model.physical_index[tag][key], value)
+    assert np.array_equal(model.geometry.xyz, model_dict.geometry.xyz)
+    assert list(model.elements) == list(model_dict.elements)
+
+
+def write_msh(path, version, binary):
+    """Write the test mesh in MSH 2.2 or 4.1 format"""
+    from struct import pack
+    ntype = {1: 2, 3: 4, 15: 1}
+    dim = {15: 0, 1: 1, 3: 2}
+    with open(path, 'wb') as f:
+        f.write(f'$MeshFormat\n{version} {int(binary)} 8\n'.encode())
+        if binary:
+            f.write(pack('<i', 1) + b'\n')
+        f.write(b'$EndMeshFormat\n')
+        if version == 2.2:
+            f.write(f'$Nodes\n{len(msh.nodes)}\n'.encode())
+            for nid, xyz in msh.nodes.items():
+                if binary:
+                    f.write(pack('<i3d', nid, *xyz))
+                else:
+                    f.write(f'{nid} {xyz[0]} {xyz[1]} {xyz[2]}\n'.encode())
+            f.write(f'$EndNodes\n$Elements\n{len(msh.elements)}\n'.encode())
+            for eid, value in msh.elements.items():
+                if binary:
+                    f.write(pack('<3i', value[0], 1, value[1]))
+                    f.write(pack(f'<{len(value) - 1}i', eid, *value[2:]))
+                else:
+                    f.write((' '.join(str(v) for v in [eid, *value]) +
+                             '\n').encode())
+            f.write(b'$EndElements\n')
+            return
+
+        # one entity for each element, tagged with the element id
+        f.write(b'$Entities\n')
+        counts = [sum(dim[v[0]] == d for v in msh.elements.values())
+                  for d in range(4)]
+        f.write(pack('<4Q', *counts) if binary else
+                (' '.join(map(str, counts)) + '\n').encode())
+        for d in range(3):
+            for eid, value in msh.elements.items():
+                if dim[value[0]] != d:
+                    continue
+                box = 3 if d == 0 else 6
+                if binary:
+                    f.write(pack(f'<i{box}dQi', eid, *[0] * box, 1, value[2]))
+                    if d > 0:
+                        f.write(pack('<Q', 0))
+                else:
+                    f.write((f'{eid} ' + '0 ' * box + f'1 {value[2]}' +
+                             (' 0' if d > 0 else '') + '\n').encode())
+        f.write(b'$EndEntities\n$Nodes\n')
+        num = len(msh.nodes)
+        f.write(pack('<4Q', 1, num, 1, num) if binary else
+                f'1 {num} 1 {num}\n'.encode())
+        f.write(pack('<3iQ', 2, 1, 0, num) if binary else
+                f'2 1 0 {num}\n'.encode())
+        for nid in msh.nodes:
+            f.write(pack('<Q', nid) if binary else f'{nid}\n'.encode())
+        for xyz in msh.nodes.values():
+            f.write(pack('<3d', *xyz) if binary else
+                    f'{xyz[0]} {xyz[1]} {xyz[2]}\n'.encode())
+        f.write(b'$EndNodes\n$Elements\n')
+        num = len(msh.elements)
+        f.write(pack('<4Q', num, num, 1, 12) if binary else
+                f'{num} {num} 1 12\n'.encode())
+        for eid, value in msh.elements.items():
+            nodes = value[2 + value[1]:]
+            if binary:
+                f.write(pack('<3iQ', dim[value[0]], eid, value[0], 1))
+                f.write(pack(f'<{1 + ntype[value[0]]}Q', eid, *nodes))
+            else:
+                f.write(f'{dim[value[0]]} {eid} {value[0]} 1\n'.encode())
+                f.write((' '.join(map(str, [eid, *nodes])) + '\n').encode())
+        f.write(b'$EndElements\n')
+
+
+@pytest.mark.parametrize('version, binary', [(2.2, False), (2.2, True),
+                                             (4.1, False), (4.1, True)])
+def test_read_msh(tmp_path, version, binary):
+    path = str(tmp_path / 'mesh.msh')
+    write_msh(path, version, binary)
+    for mmap in [False, True]:
+        mesh = skmech.Mesh(path, mmap=mmap)
+        assert list(mesh.nodes) == list(msh.nodes)
+        assert list(mesh.elements) == list(msh.elements)
+        for nid, xyz in msh.nodes.items():
+            assert np.array_equal(mesh.nodes[nid], xyz)
+        for eid, value in msh.elements.items():
+            if version == 2.2:
+                assert np.array_equal(mesh.elements[eid], value)
+            else:
+                # the geometrical tag is the entity tag
+                assert np.array_equal(mesh.elements[eid][[0, 1, 2]],
+                                      value[[0, 1, 2]])
+                assert mesh.elements[eid][3] == eid
+                assert np.array_equal(mesh.elements[eid][4:], value[4:])
+    if version == 2.2 and not binary:
+        from skmech.mesh.gmsh_reader import parse_msh
+        nodes, elements = parse_msh(path)
+        assert list(elements) == list(mesh.elements)
+
+
+def test_mesh_cache(tmp_path):
+    import os
+    path = str(tmp_path / 'mesh.msh')
+    write_msh(path, 2.2, False)
+    mesh = skmech.Mesh(path, cache=True)
+    assert os.path.isfile(path + '.npz')
+    cached = skmech.Mesh(path, cache=True)
+    for key in ['node_ids', 'coordinates', 'element_ids', 'tags',
+                'type_position']:
+        assert np.array_equal(getattr(cached, key), getattr(mesh, key))
+    assert np.array_equal(cached.connectivity[3], mesh.connectivity[3])
+    index = cached.get_physical_index()
+    for tag, group in mesh.get_physical_index().items():
+        for key, value in group.items():
+            assert np.array_equal(index[tag][key], value)
+
+    # same content with other modification time is still valid
+    os.utime(path, ns=(0, 0))
+    assert skmech.Mesh(path, cache=True)._physical_index is not None
+    # the cache is updated with the new modification time
+    with np.load(path + '.npz') as data:
+        assert int(data['mtime']) == os.stat(path).st_mtime_ns
+    assert not os.path.exists(path + '.npz.tmp')
+    # corrupted or incomplete cache is parsed again and rewritten
+    with open(path + '.npz', 'wb') as f:
+        f.write(b'PK\x03\x04 corrupted')
+    assert np.array_equal(skmech.Mesh(path, cache=True).tags, mesh.tags)
+    np.savez(path + '.npz', version=1)
+    assert np.array_equal(skmech.Mesh(path, cache=True).tags, mesh.tags)
+    with np.load(path + '.npz') as data:
+        assert 'hash' in data
+    # modified file is parsed again
+    write_msh(path, 4.1, False)
+    mesh = skmech.Mesh(path, cache=True)
+    assert mesh.elements[9][3] == 9
@@ -0,0 +1,58 @@
+"""Test the von Mises state update and consistent tangent"""
+import numpy as np
+from skmech.plasticity.stateupdatemises import (state_update_mises,
+                                                state_update_mises_batch)
+from skmech.plasticity.tangentmises import (consistent_tangent_mises,
+                                            consistent_tangent_mises_batch,
+                                            elastic_regions)
+
+E, nu, H, sig_y0 = 10000, 0.3, 1000, 10
+rand = np.random.RandomState(0)
+# mix of elastic and plastic gauss points
+eps_e_trial = rand.uniform(-2e-3, 2e-3, (20, 4))
+eps_e_trial[:5] *= 1e-2
+eps_bar_p_trial = rand.uniform(0, 1e-3, 20)
+eps_p_trial = rand.uniform(-1e-4, 1e-4, (20, 4))
+
+
+def test_state_update_batch():
+    """batch return mapping is identical to the scalar version"""
+    batch = state_update_mises_batch(E, nu, H, sig_y0, eps_e_trial,
+                                     eps_bar_p_trial, eps_p_trial)
+    assert 0 < np.sum(batch[-1]) < len(eps_e_trial)
+    for i in range(len(eps_e_trial)):
+        scalar = state_update_mises(E, nu, H, sig_y0, eps_e_trial[i],
+                                    eps_bar_p_trial[i], eps_p_trial[i],
+                                    10, 'strain')
+        for s, b in zip(scalar, batch):
+            assert np.array_equal(s, b[i])
+
+
+def test_consistent_tangent_batch():
+    """batch tangent is equal to the scalar version at every gauss point"""
+    sig, *_, ep_flag = state_update_mises_batch(
+        E, nu, H, sig_y0, eps_e_trial, eps_bar_p_trial, eps_p_trial)
+    dgama = rand.uniform(0, 1e-4, len(sig))
+    for case in ['strain', 'stress']:
+        D = consistent_tangent_mises_batch(dgama, sig, E, nu, H, ep_flag,
+                                           case)
+        assert D.shape == (len(sig), 3, 3)
+        for i in range(len(sig)):
+            D_i = consistent_tangent_mises(dgama[i], sig[i], E, nu, H,
+                                           bool(ep_flag[i]), case)
+            assert np.allclose(D[i], D_i, rtol=1e-14, atol=0)
+
+
+def test_elastic_regions():
+    """precomputed elastic regions give the same tangent"""
+    sig, *_, ep_flag = state_update_mises_batch(
+        E, nu, H, sig_y0, eps_e_trial, eps_bar_p_trial, eps_p_trial)
+    dgama = rand.uniform(0, 1e-4, len(sig))
+    E_gp = np.where(np.arange(len(sig)) < 10, E, 2 * E)
+    nu_gp = np.full(len(sig), nu)
+    De, region = elastic_regions(E_gp, nu_gp, 'strain')
+    assert De.shape == (2, 3, 3) and region.shape == (len(sig),)
+    D = consistent_tangent_mises_batch(dgama, sig, E_gp, nu_gp, H, ep_flag,
+                                       'strain', (De, region))
+    assert np.array_equal(D, consistent_tangent_mises_batch(
+        dgama, sig, E_gp, nu_gp, H, ep_flag, 'strain'))
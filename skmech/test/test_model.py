@@ -222,4 +222,81 @@ def test_xyz():
         print(model.id_r, model.id_f)
 
 
+def test_physical_index():
+    class Mesh():
+        pass
+
+    msh = Mesh()
+    msh.nodes = {1: [0, 0, 0], 2: [1, 0, 0], 3: [1, 1, 0], 4: [0, 1, 0],
+                 5: [2, 0, 0], 6: [2, 1, 0]}
+    msh.elements = {
+        1: [15, 2, 12, 1, 1],
+        2: [1, 2, 7, 2, 5, 6],
+        3: [1, 2, 5, 4, 4, 1],
+        4: [1, 2, 7, 2, 2, 5],
+        5: [3, 2, 11, 10, 1, 2, 3, 4],
+        6: [3, 2, 11, 10, 2, 5, 6, 3]
+    }
+    model = skmech.Model(msh)
+    assert list(model.physical_index[7]['eids']) == [2, 4]
+    assert list(model.physical_index[11]['etypes']) == [3, 3]
+    assert model.get_physical_element(7) == {2: [1, 2, 7, 2, 5, 6],
+                                             4: [1, 2, 7, 2, 2, 5]}
+    assert model.get_physical_element(99) == {}
+    assert list(model.get_physical_nodes(7)) == [2, 5, 6]
+    assert list(model.get_physical_nodes(11, etypes=[1])) == []
+    assert list(model.get_physical_nodes(11)) == [1, 2, 3, 4, 5, 6]
+
+
+def test_topology():
+    class Mesh():
+        pass
+
+    msh = Mesh()
+    msh.nodes = {1: [0, 0, 0], 2: [1, 0, 0], 3: [1, 1, 0], 4: [0, 1, 0],
+                 5: [2, 0, 0], 6: [2, 1, 0]}
+    msh.elements = {
+        1: [15, 2, 12, 1, 1],
+        2: [1, 2, 7, 2, 5, 6],
+        3: [1, 2, 5, 4, 4, 1],
+        4: [1, 2, 7, 2, 2, 5],
+        5: [3, 2, 11, 10, 1, 2, 3, 4],
+        6: [3, 2, 11, 10, 2, 5, 6, 3]
+    }
+    material = skmech.Material(E={11: 1000}, nu={11: 0.3})
+    model = skmech.Model(msh, material=material)
+    topo = model.topology
+    assert model.topology is topo
+    assert len(topo.edges) == 7
+    assert len(topo.boundary_edges) == 6
+    # edge 2-3 is side 1 of element 5 and side 3 of element 6
+    edge = topo.find_edges([[3, 2]])[0]
+    assert list(topo.edges[edge]) == [2, 3]
+    assert list(topo.eids[topo.edge_elements[edge]]) == [5, 6]
+    assert list(topo.edge_sides[edge]) == [1, 3]
+    assert topo.element_edges[0, 1] == topo.element_edges[1, 3] == edge
+    assert list(topo.find_edges([[1, 3], [1, 99]])) == [-1, -1]
+    assert sorted(map(tuple, topo.bound_ele.tolist())) == [
+        (5, 3, 5), (6, 0, 7), (6, 1, 7)]
+    ele = skmech.constructor(6, 3, model)
+    assert sorted(zip(ele.side_at_boundary, ele.at_boundary_line)) == [
+        (0, 7), (1, 7)]
+    assert skmech.constructor(5, 3, model).side_at_boundary == [3]
+
+
+def test_adjacency():
+    from skmech.topology import Adjacency
+    # 2x2 elements grid with node 5 at the center
+    adj = Adjacency([10, 20, 30, 40], [[1, 2, 5, 4], [2, 3, 6, 5],
+                                       [4, 5, 8, 7], [5, 6, 9, 8]])
+    assert list(adj.nodes) == list(range(1, 10))
+    assert list(adj.num_node_elements) == [1, 2, 1, 2, 4, 2, 1, 2, 1]
+    assert list(adj.get_node_elements([5])) == [0, 1, 2, 3]
+    assert list(adj.get_node_elements([1, 3, 99])) == [0, 1]
+    i = adj.node_offsets[4]
+    assert list(adj.node_local[i:i + 4]) == [2, 3, 1, 0]
+    assert list(adj.get_element_neighbors(0)) == [1, 2, 3]
+    assert len(adj.element_neighbors) == 12
+
+
 test_xyz()
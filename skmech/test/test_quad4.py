@@ -60,6 +60,52 @@ def test_stiffness():
     assert np.round(np.linalg.norm(K), 2) == 52268.5
 
 
+def test_sparse_stiffness():
+    K = skmech.assembly.sparse_stiffness(model)
+    assert K.shape == (model.num_dof, model.num_dof)
+    assert np.round(np.linalg.norm(K.toarray()), 2) == 52268.5
+
+
+def test_scatter_plan():
+    plan = model.scatter_plan
+    assert model.scatter_plan is plan
+    for i, (eid, [etype, *_]) in enumerate(model.elements.items()):
+        ele = skmech.constructor(eid, etype, model)
+        plan.set_element(i, ele.local_stiffness_matrix())
+    K = plan.assemble()
+    assert K.nnz == plan.nnz
+    assert np.allclose(K.toarray(),
+                       skmech.assembly.sparse_stiffness(model).toarray())
+    # the next assembly writes in the same data array
+    K2 = plan.assemble(2 * plan.values)
+    assert K2 is K and np.shares_memory(K.data, plan.data)
+    assert np.allclose(K2.toarray(),
+                       2 * skmech.assembly.sparse_stiffness(model).toarray())
+
+
+def test_statics_sparse():
+    skmech.statics.solver(model, sparse=False)
+    U_dense = model.dof_displacement
+    skmech.statics.solver(model, sparse=True)
+    assert np.allclose(model.dof_displacement, U_dense, rtol=0, atol=1e-15)
+
+
+def test_statics_linear_solvers():
+    from skmech.solvers.linear import LinearSolver
+    skmech.statics.solver(model)
+    U_direct = model.dof_displacement
+    for method, preconditioner in [('cg', 'jacobi'), ('cg', 'ilu'),
+                                   ('cg', 'amg'), ('minres', 'jacobi'),
+                                   ('cg', None)]:
+        if preconditioner == 'amg':
+            pytest.importorskip('pyamg')
+        linear_solver = LinearSolver(method, preconditioner, tol=1e-12)
+        skmech.statics.solver(model, linear_solver=linear_solver)
+        assert np.allclose(model.dof_displacement, U_direct, rtol=1e-8)
+        assert linear_solver.num_solves == 1
+        assert linear_solver.num_iterations > 0
+
+
 def test_gradient_operator():
     class Mesh():
         pass
@@ -97,6 +143,39 @@ def test_gradient_operator():
     ]
 
 
+def test_geometry_cache():
+    geo = model.geometry
+    assert model.geometry is geo
+    for i, (eid, [etype, *_]) in enumerate(model.elements.items()):
+        ele = skmech.constructor(eid, etype, model)
+        assert np.all(geo.dof[i] == np.asarray(ele.dof) - 1)
+        for gp, xez in enumerate(ele.gauss.points):
+            N, dN_ei = ele.shape_function(xez)
+            dJ, dN_xi, _ = ele.jacobian(ele.xyz, dN_ei)
+            assert np.allclose(geo.N[gp], N)
+            assert np.isclose(geo.dJ[i, gp], dJ)
+            assert np.allclose(geo.B[i, gp], ele.gradient_operator(dN_xi))
+            assert np.allclose(geo.xy[i, gp], N @ ele.xyz)
+
+
+def test_batch_kernel():
+    from skmech.elements.quad4 import (constitutive_matrix, batch_strain,
+                                       batch_stiffness_matrix,
+                                       batch_internal_force)
+    geo = model.geometry
+    C = constitutive_matrix(geo.material(model.material.E),
+                            geo.material(model.material.nu),
+                            model.material.case)
+    k = batch_stiffness_matrix(geo.B, C, geo.dV)
+    u_ele = np.random.RandomState(0).rand(*geo.dof.shape)
+    sig = np.einsum('egij,egj->egi', C, batch_strain(geo.B, u_ele))
+    f = batch_internal_force(geo.B, sig, geo.dV)
+    for i, (eid, [etype, *_]) in enumerate(model.elements.items()):
+        ele = skmech.constructor(eid, etype, model)
+        assert np.allclose(k[i], ele.local_stiffness_matrix())
+        assert np.allclose(f[i], k[i] @ u_ele[i])
+
+
 def test_neumann():
     class Mesh():
         pass
@@ -110,6 +189,14 @@ def test_neumann():
                          num_quad_points=2)
     Pt = skmech.neumann(model)
     assert list(Pt) == [0., 0., 3., 4., 3., 4., 0., 0.]
+    assert np.allclose(skmech.neumann(model, lmbda=.5), Pt / 2)
+
+    # function of the position, linear load on the line from node 2 to 3
+    model.traction = {5: lambda x, y, lmbda: (lmbda * y, 0)}
+    Pt = skmech.neumann(model, lmbda=2)
+    assert np.allclose(Pt, [0, 0, 20, 0, 40, 0, 0, 0])
+    model.traction = {5: lambda x, y, lmbda: (3 / 5, 4 / 5)}
+    assert np.allclose(skmech.neumann(model), [0, 0, 3, 4, 3, 4, 0, 0])
 
 
 def test_dirichlet():
@@ -122,6 +209,47 @@ def test_dirichlet():
     assert Fm[1] == 0
 
 
+def test_dirichlet_sparse():
+    K = skmech.assembly.sparse_stiffness(model)
+    F = skmech.neumann(model)
+    Km_dense, Fm_dense = skmech.dirichlet(K.toarray(), F, model)
+    Km, Fm = skmech.dirichlet(K, F, model)
+    assert Km.format == 'csr'
+    assert np.allclose(Km.toarray(), Km_dense)
+    assert np.allclose(Fm, Fm_dense)
+    skmech.statics.solver(model)
+    assert np.allclose(np.linalg.solve(Km_dense, Fm_dense),
+                       model.dof_displacement)
+    # original matrix is not modified
+    assert np.allclose(K.toarray(),
+                       skmech.assembly.sparse_stiffness(model).toarray())
+
+
+def test_gp_to_node():
+    from skmech.postprocess.stressrecovery import (smooth_fields,
+                                                   extrapolate_gp_smoothed)
+    P = model.gp_to_node
+    assert model.gp_to_node is P
+    num_ele, num_gp = model.geometry.dJ.shape
+    assert P.shape == (len(model.adjacency.nodes), num_ele * num_gp)
+    # rows sum to one, a constant field stays constant
+    assert np.allclose(P.sum(axis=1), 1)
+    # linear field is extrapolated exactly
+    xy = model.geometry.xy
+    fields = np.stack([2 * xy[..., 0] + 1, xy[..., 1]], axis=-1)
+    node = smooth_fields(model, fields)
+    coord = np.array([model.mesh.nodes[nid][:2]
+                      for nid in model.adjacency.nodes.tolist()])
+    assert np.allclose(node, np.stack([2 * coord[:, 0] + 1, coord[:, 1]],
+                                      axis=1))
+    field = {(eid, gp): fields[i, gp, 0]
+             for i, eid in enumerate(model.adjacency.eids.tolist())
+             for gp in range(num_gp)}
+    smooth = extrapolate_gp_smoothed(model, field)
+    assert np.allclose([smooth[nid] for nid in model.adjacency.nodes.tolist()],
+                       node[:, 0])
+
+
 def test_stress_recovery():
     """Test the stress recovery procedure"""
     u = skmech.statics.solver(model)
@@ -135,3 +263,24 @@ def test_stress_recovery():
     # TODO: need to find a way to convert from dof_displ to node_displ
     # sig2 = skmech.postprocess.stress_recovery_smoothed(model)
     # assert pytest.approx(sig2[9][0], 2) == 1.0
+
+
+def test_nodal_material():
+    """nodal material values are interpolated at the gauss points"""
+    material = skmech.Material(E={11: [10000, 20000, 30000, 40000]},
+                               nu={11: [.3, .2, .3, .2]})
+    model = skmech.Model(msh, material=material, num_quad_points=2)
+    geo = model.geometry
+    E = geo.material(model.material.E)
+    assert np.allclose(E[:, 0], geo.N[0] @ [10000, 20000, 30000, 40000])
+    K = skmech.assembly.sparse_stiffness(model).toarray()
+    K_ele = 0
+    for eid, [etype, *_] in model.elements.items():
+        ele = skmech.constructor(eid, etype, model)
+        K_ele += ele.stiffness_matrix()
+    assert np.allclose(K, K_ele)
+
+    material = skmech.Material(E={11: [10000, 20000]}, nu={11: 0.3})
+    model = skmech.Model(msh, material=material, num_quad_points=2)
+    with pytest.raises(Exception):
+        model.geometry.material(model.material.E)
@@ -0,0 +1,269 @@
+"""Edge topology of a mesh with 4-node quad elements
+
+Each undirected edge is identified by the integer key
+min(n1, n2) * (max_node + 1) + max(n1, n2), so the edges of all elements are
+matched by sorting the keys once instead of comparing node sets.
+
+Side s of an element goes from the local node s to the local node s + 1,
+side 0 is the bottom (eta = -1) and side 3 goes from node 3 back to node 0
+(xi = -1), following gmsh convention.
+
+"""
+import numpy as np
+
+# local nodes of each element side
+SIDE_NODES = np.array([[0, 1], [1, 2], [2, 3], [3, 0]])
+
+
+class Topology(object):
+    """Element edges, edge adjacency and boundary sides of a model
+
+    Parameters
+    ----------
+    model : Model object
+        the 4-node quad elements (type 3) of model.elements and the 2-node
+        lines (type 1) of the mesh are used
+
+    Attributes
+    ----------
+    eids : ndarray shape (num_ele,)
+        quad element tags in the order of model.elements
+    edges : ndarray shape (num_edges, 2)
+        node tags of each edge, sorted
+    element_edges : ndarray shape (num_ele, 4)
+        edge of each element side
+    edge_elements : ndarray shape (num_edges, 2)
+        position in eids of the elements that share the edge, the second
+        is -1 for edges with only one element
+    edge_sides : ndarray shape (num_edges, 2)
+        side of the edge in each element of edge_elements, -1 if there is
+        no second element
+    boundary_edges : ndarray
+        edges with only one element
+    bound_ele : ndarray shape (num_lines, 3)
+        [eid, side, physical tag] for each line element of the mesh that
+        is a side of a quad element
+    boundary_sides : dict
+        {eid: (sides, physical tags)} for the elements in bound_ele
+
+    """
+    def __init__(self, model):
+        quads = [(eid, value[-4:]) for eid, value in model.elements.items()
+                 if value[0] == 3]
+        num_ele = len(quads)
+        self.eids = np.array([eid for eid, _ in quads], dtype=int)
+        conn = np.array([nodes for _, nodes in quads],
+                        dtype=int).reshape(num_ele, 4)
+        self._base = int(conn.max()) + 1 if num_ele > 0 else 1
+
+        # one key for each element side, shape (num_ele, 4)
+        keys = self.edge_keys(conn[:, SIDE_NODES])
+        unique, first, self.element_edges, count = np.unique(
+            keys, return_index=True, return_inverse=True, return_counts=True)
+        self.element_edges = self.element_edges.reshape(num_ele, 4)
+        if np.any(count > 2):
+            raise Exception('Edge shared by more than 2 elements, check the '
+                            'mesh')
+        self._keys = unique
+        self.edges = np.stack([unique // self._base, unique % self._base],
+                              axis=1)
+
+        # first and second (element, side) of each edge
+        ele_side = np.arange(keys.size)
+        self.edge_elements = np.full((len(unique), 2), -1, dtype=int)
+        self.edge_sides = np.full((len(unique), 2), -1, dtype=int)
+        self.edge_elements[:, 0], self.edge_sides[:, 0] = divmod(first, 4)
+        second = ele_side != first[self.element_edges.ravel()]
+        edge = self.element_edges.ravel()[second]
+        self.edge_elements[edge, 1], self.edge_sides[edge, 1] = divmod(
+            ele_side[second], 4)
+        self.boundary_edges = np.flatnonzero(count == 1)
+
+        self.bound_ele = self._get_bound_ele(model)
+        self.boundary_sides = {}
+        for eid, side, line in self.bound_ele.tolist():
+            sides, lines = self.boundary_sides.setdefault(eid, ([], []))
+            sides.append(side)
+            lines.append(line)
+
+    def edge_keys(self, nodes):
+        """Integer key of the edges between nodes[..., 0] and nodes[..., 1]"""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return (nodes.min(axis=-1) * self._base + nodes.max(axis=-1))
+
+    def find_edges(self, nodes):
+        """Get the edge index of node pairs
+
+        Parameters
+        ----------
+        nodes : array_like shape (n, 2)
+            node tags of each edge, in any order
+
+        Returns
+        -------
+        ndarray shape (n,)
+            edge index, -1 if the nodes do not form an edge of the mesh
+
+        """
+        nodes = np.reshape(nodes, (-1, 2))
+        keys = self.edge_keys(nodes)
+        if len(self._keys) == 0:
+            return np.full(len(keys), -1)
+        edge = np.searchsorted(self._keys, keys)
+        edge[edge == len(self._keys)] = 0
+        # nodes out of the quad elements can not form an edge
+        found = ((self._keys[edge] == keys) & (nodes.max(axis=1) < self._base)
+                 & (nodes.min(axis=1) >= 0))
+        return np.where(found, edge, -1)
+
+    def _get_bound_ele(self, model):
+        """Match the line elements of each physical tag with the sides"""
+        bound_ele = [np.zeros((0, 3), dtype=int)]
+        for tag, group in model.physical_index.items():
+            lines = group['etypes'] == 1
+            if not np.any(lines) or len(self.eids) == 0:
+                continue
+            # nodes of lines are the last 2
+            end = group['offsets'][1:][lines] - 1
+            nodes = np.stack([group['nodes'][end - 1], group['nodes'][end]],
+                             axis=1)
+            edge = self.find_edges(nodes)
+            edge = edge[edge >= 0]
+            bound_ele.append(np.stack([self.eids[self.edge_elements[edge, 0]],
+                                       self.edge_sides[edge, 0],
+                                       np.full(len(edge), tag)], axis=1))
+        return np.concatenate(bound_ele)
+
+    def get_boundary_sides(self, eid):
+        """Sides of an element that are physical lines
+
+        Returns
+        -------
+        sides : list
+            element sides at a boundary line
+        lines : list
+            physical tag of the line at each side
+
+        """
+        return self.boundary_sides.get(eid, ([], []))
+
+
+class Adjacency(object):
+    """Node to element and element to element adjacency in CSR format
+
+    Parameters
+    ----------
+    eids : array_like shape (num_ele,)
+        element tags
+    conn : list of array_like
+        node tags of each element, elements can have different number of
+        nodes
+
+    Attributes
+    ----------
+    eids : ndarray shape (num_ele,)
+    nodes : ndarray shape (num_nodes,)
+        sorted node tags
+    node_offsets : ndarray shape (num_nodes + 1,)
+    node_elements : ndarray
+        position in eids of the elements of node nodes[i] are
+        node_elements[node_offsets[i]:node_offsets[i + 1]], sorted
+    node_local : ndarray
+        local index of the node in each element of node_elements
+    num_node_elements : ndarray shape (num_nodes,)
+        number of elements sharing each node
+    element_offsets : ndarray shape (num_ele + 1,)
+    element_neighbors : ndarray
+        positions of the elements that share at least one node with the
+        element i are element_neighbors[element_offsets[i]:
+        element_offsets[i + 1]], sorted and without i
+
+    """
+    def __init__(self, eids, conn):
+        self.eids = np.asarray(eids, dtype=int)
+        num_ele = len(self.eids)
+        counts = np.array([len(nodes) for nodes in conn], dtype=int)
+        flat = np.concatenate([np.zeros(0, dtype=int)] +
+                              [np.asarray(nodes, dtype=int)
+                               for nodes in conn])
+        element = np.repeat(np.arange(num_ele), counts)
+        local = np.arange(len(flat)) - np.repeat(np.cumsum(counts) - counts,
+                                                  counts)
+
+        self.nodes, inverse = np.unique(flat, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        self.node_elements = element[order]
+        self.node_local = local[order]
+        self.num_node_elements = np.bincount(inverse,
+                                             minlength=len(self.nodes))
+        self.node_offsets = offsets(self.num_node_elements)
+
+        # every element of each node of the element
+        neighbor = self.node_elements[
+            csr_ranges(self.node_offsets[inverse],
+                       self.num_node_elements[inverse])]
+        owner = np.repeat(element, self.num_node_elements[inverse])
+        keys = np.unique(owner.astype(np.int64) * max(num_ele, 1) + neighbor)
+        owner, neighbor = np.divmod(keys, max(num_ele, 1))
+        not_self = owner != neighbor
+        self.element_neighbors = neighbor[not_self]
+        self.element_offsets = offsets(
+            np.bincount(owner[not_self], minlength=num_ele))
+
+    @classmethod
+    def from_elements(cls, elements):
+        """Create the adjacency from {eid: [type, #tags, tags, nodes]}"""
+        eids = list(elements.keys())
+        conn = [value[2 + value[1]:] for value in elements.values()]
+        return cls(eids, conn)
+
+    def node_position(self, nids):
+        """Position of node tags in nodes, -1 for nodes not in the elements"""
+        nids = np.asarray(nids, dtype=int)
+        if len(self.nodes) == 0:
+            return np.full(nids.shape, -1)
+        position = np.searchsorted(self.nodes, nids)
+        position[position == len(self.nodes)] = 0
+        return np.where(self.nodes[position] == nids, position, -1)
+
+    def get_node_elements(self, nids):
+        """Elements that contain at least one of the nodes
+
+        Parameters
+        ----------
+        nids : array_like
+            node tags
+
+        Returns
+        -------
+        ndarray
+            sorted positions in eids
+
+        """
+        position = self.node_position(np.ravel(nids))
+        position = position[position >= 0]
+        ranges = csr_ranges(self.node_offsets[position],
+                            self.num_node_elements[position])
+        return np.unique(self.node_elements[ranges])
+
+    def get_element_neighbors(self, position):
+        """Positions of the elements sharing a node with an element"""
+        return self.element_neighbors[self.element_offsets[position]:
+                                      self.element_offsets[position + 1]]
+
+
+def offsets(counts):
+    """CSR offsets from the number of entries of each row"""
+    ptr = np.zeros(len(counts) + 1, dtype=int)
+    np.cumsum(counts, out=ptr[1:])
+    return ptr
+
+
+def csr_ranges(starts, counts):
+    """Concatenate the ranges start:start + count of each row"""
+    counts = np.asarray(counts, dtype=int)
+    total = counts.sum()
+    shift = np.repeat(np.asarray(starts, dtype=int) -
+                      (np.cumsum(counts) - counts), counts)
+    return np.arange(total) + shift
@@ -2,6 +2,7 @@
 """
 import numpy as np
 from .distance import distance
+from ..topology import Adjacency
 
 
 class Xfem(object):
@@ -19,6 +20,8 @@ class Xfem(object):
         used in gradient matrix and to numerate new enriched dofs
     enr_elements : ndarray shape
         used to decide if an element is enriched or not
+    adjacency : Adjacency object
+        node to element adjacency of the elements
     zls : dict
         dictionary containing the zero level set object and its attributes,
         namely: phi, enriched_nodes and enriched elements
@@ -30,6 +33,8 @@ class Xfem(object):
         self.elements = elements
         self.material = material
         self.num_dof = len(nodes) * 2
+        # elements of each node, used to find the enriched elements
+        self.adjacency = Adjacency.from_elements(elements)
 
         # if element is in matrix or reinforcement area
         self.element_material = {'matrix': [], 'reinforcement': []}
@@ -110,8 +115,5 @@ class Xfem(object):
         Includes blendind elements
 
         """
-        enr_elements = []
-        for eid, [_, _, _, _, *conn] in self.elements.items():
-            if np.any(np.in1d(enr_nodes, conn)):
-                enr_elements.append(eid)
-        return enr_elements
+        position = self.adjacency.get_node_elements(enr_nodes)
+        return self.adjacency.eids[position].tolist()